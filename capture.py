@@ -0,0 +1,162 @@
+"""
+Frame capture with the encoding done in worker processes.
+
+grab() copies the frame's pixels (pygame.surfarray.pixels2d, transposed to
+rows so the copy reads memory in order) into one of a pool of shared-memory
+buffers and hands the buffer to a process pool. Workers unpack the pixels
+to RGB and encode: a numbered PNG per frame, or raw rgb24 written at the
+frame's offset in one file, so workers can finish out of order. The loop
+pays for the copy only.
+
+When every buffer is still with the encoders the frame is dropped, and the
+capture stride doubles (every 2nd frame, every 4th, ...) up to MAX_STRIDE;
+it halves again once the encoders keep up. index.json in the PNG directory
+(FILE.json beside a raw FILE) gives the frame size and each written frame's
+game tick.
+
+    ffmpeg -f rawvideo -pix_fmt rgb24 -s 1800x1000 -r 60 -i run.rgb run.mp4
+"""
+import json, os, queue, time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pygame
+
+BUFFERS     = 8       # frames in flight; 7.2 MB each at 1800x1000
+WORKERS     = max(1, min(4, (os.cpu_count() or 1)- 1))
+WORKER_NICE = 10      # encoders yield the CPU to the game loop
+MAX_STRIDE  = 8       # capture at least every 8th frame
+CALM_FRAMES = 120     # accepted frames without a drop before the stride halves
+
+
+def _worker_init():
+    try:
+        os.nice(WORKER_NICE)
+    except (AttributeError, OSError):
+        pass
+
+def _unpack(shm_name, shape, shifts):
+    shm= shared_memory.SharedMemory(name=shm_name)
+    px= np.ndarray(shape, np.uint32, shm.buf)
+    rgb= np.empty(shape+ (3,), np.uint8)
+    for c, s in enumerate(shifts):
+        np.right_shift(px, s, out=rgb[..., c], casting='unsafe')
+    del px      # release the buffer before closing the mapping
+    shm.close()
+    return rgb
+
+def _encode_png(shm_name, shape, shifts, path):
+    rgb= _unpack(shm_name, shape, shifts)
+    srf= pygame.image.frombuffer(rgb.tobytes(), (shape[1], shape[0]), "RGB")
+    pygame.image.save(srf, path)
+
+def _encode_raw(shm_name, shape, shifts, path, frame):
+    data= _unpack(shm_name, shape, shifts).tobytes()
+    fd= os.open(path, os.O_WRONLY)
+    try:
+        os.pwrite(fd, data, frame* len(data))
+    finally:
+        os.close(fd)
+
+
+class FrameCapture:
+    def __init__(self, out, size, fmt="png", fps=60, workers=WORKERS, buffers=BUFFERS):
+        """out: a directory for png, a file for raw. size: (w, h) of the frames."""
+        if fmt not in ("png", "raw"):
+            raise ValueError("unknown capture format %r" % fmt)
+        self.out= out
+        self.fmt= fmt
+        self.fps= fps
+        w, h= size
+        self.shape= (h, w)
+        if fmt== "png":
+            os.makedirs(out, exist_ok=True)
+            self.index_path= os.path.join(out, "index.json")
+        else:
+            open(out, "wb").close()
+            self.index_path= out+ ".json"
+        self._shm= [shared_memory.SharedMemory(create=True, size=w*h*4) for _ in range(buffers)]
+        self._bufs= [np.ndarray(self.shape, np.uint32, s.buf) for s in self._shm]
+        for b in self._bufs:
+            b.fill(0)     # fault the pages in now, not on the first grabs
+        self._free= queue.SimpleQueue()
+        for i in range(buffers):
+            self._free.put(i)
+        self._pool= ProcessPoolExecutor(workers, initializer=_worker_init)
+        self._shifts= None
+        self.ticks= []            # game tick of each written frame
+        self.stride= 1
+        self._n= 0                # frames offered
+        self._calm= 0
+        self.dropped= 0
+        self.skipped= 0           # left out by the stride
+        self.errors= 0
+        self.grab_s= 0.0
+        self.paused= False
+
+    def grab(self, screen, tick):
+        """Queues this frame unless paused, strided out or out of buffers."""
+        if self.paused:
+            return False
+        self._n+= 1
+        if self._n% self.stride:
+            self.skipped+= 1
+            return False
+        t0= time.perf_counter()
+        try:
+            b= self._free.get_nowait()
+        except queue.Empty:
+            # encoders are behind: drop this one and capture less often
+            self.dropped+= 1
+            self._calm= 0
+            self.stride= min(MAX_STRIDE, self.stride*2)
+            return False
+        if self._shifts is None:
+            self._shifts= tuple(screen.get_shifts()[:3])
+        view= pygame.surfarray.pixels2d(screen)
+        np.copyto(self._bufs[b], view.T)
+        del view
+        frame= len(self.ticks)
+        self.ticks.append(tick)
+        args= (self._shm[b].name, self.shape, self._shifts)
+        if self.fmt== "png":
+            fut= self._pool.submit(_encode_png, *args, os.path.join(self.out, "frame%06d.png" % frame))
+        else:
+            fut= self._pool.submit(_encode_raw, *args, self.out, frame)
+        fut.add_done_callback(lambda f, b=b: self._done(f, b))
+        self._calm+= 1
+        if self.stride> 1 and self._calm>= CALM_FRAMES:
+            self.stride//= 2
+            self._calm= 0
+        self.grab_s+= time.perf_counter()- t0
+        return True
+
+    def _done(self, fut, b):
+        if fut.exception() is not None:
+            self.errors+= 1
+        self._free.put(b)
+
+    def close(self):
+        if self._pool is None:
+            return
+        self._pool.shutdown(wait=True)
+        self._pool= None
+        self._bufs= None
+        for s in self._shm:
+            s.close()
+            s.unlink()
+        h, w= self.shape
+        with open(self.index_path, "w") as f:
+            json.dump({'format': self.fmt, 'width': w, 'height': h, 'fps': self.fps,
+                       'pix_fmt': 'rgb24', 'ticks': self.ticks}, f)
+
+    def stats(self):
+        n= len(self.ticks)
+        return {
+            'frames': n,
+            'dropped': self.dropped,
+            'skipped': self.skipped,
+            'errors': self.errors,
+            'stride': self.stride,
+            'grab_ms': 1000.0* self.grab_s/ max(1, n),
+        }
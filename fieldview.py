@@ -0,0 +1,170 @@
+"""
+Gravity-field overlay: a heat-map of acceleration magnitude plus a sparse
+arrow field, showing where each attractor's GRAVITY_RANGE ends.
+
+The fields are static, so the overlay is evaluated once on a grid with the
+level's vectorized force_array, colour-mapped and baked into one surface.
+Frames only blit it at the camera offset. It is rebuilt when the level's
+attractor parameters change, and built overlays are kept per parameter set.
+
+An overlay wider than MAX_SIDE (a system whose sources cover the world) is
+clamped to one world and baked at 1/k resolution, without arrows; frames
+then copy the visible part into a small scratch surface and scale that up.
+"""
+import math, time
+import numpy as np
+import pygame
+
+CELL          = 8      # world units per heat-map sample
+ARROW_SPACING = 100    # world units between arrows
+PAD           = 40
+MAX_SIDE      = 2048   # px; bigger overlays are baked coarser
+SCALED_CACHE  = 4      # resized copies kept (render scale x zoom)
+
+# colour map stops over the log-scaled magnitude, 0 = weakest in range
+CMAP_T   = (0.0, 0.33, 0.66, 1.0)
+CMAP_RGB = ((30,60,200), (40,200,220), (240,220,60), (255,40,30))
+
+
+def field_key(lvl):
+    return (type(lvl).__name__, lvl.WORLD_WIDTH, lvl.WORLD_HEIGHT, tuple(lvl.attractors()))
+
+
+def colormap(t):
+    t= np.clip(t, 0.0, 1.0)
+    return np.stack([np.interp(t, CMAP_T, [c[k] for c in CMAP_RGB]) for k in range(3)], axis=-1)
+
+
+class FieldOverlay:
+    def __init__(self):
+        self._cache= {}        # field_key -> (surface, world origin, bake) or None
+        self._key= None
+        self.surface= None
+        self.origin= (0.0, 0.0)
+        self.bake= 1           # world units per overlay pixel
+        self._scratch= None    # coarse overlays: view-sized, in overlay pixels
+        self._view= None       # ... and scaled to the screen
+        self._scaled= {}       # draw scale -> overlay resized for it
+        self.build_ms= 0.0
+
+    def _build(self, lvl):
+        srcs= lvl.attractors()
+        if not srcs:
+            return None
+        x0= min(cx- rng for (cx, _cy, _gm, rng, _l) in srcs)- PAD
+        y0= min(cy- rng for (_cx, cy, _gm, rng, _l) in srcs)- PAD
+        x1= max(cx+ rng for (cx, _cy, _gm, rng, _l) in srcs)+ PAD
+        y1= max(cy+ rng for (_cx, cy, _gm, rng, _l) in srcs)+ PAD
+        # wider than the world: one world is all there is to show
+        if x1- x0>= lvl.WORLD_WIDTH:
+            x0, x1= 0.0, float(lvl.WORLD_WIDTH)
+        if y1- y0>= lvl.WORLD_HEIGHT:
+            y0, y1= 0.0, float(lvl.WORLD_HEIGHT)
+        nx= int(math.ceil((x1- x0)/ CELL))
+        ny= int(math.ceil((y1- y0)/ CELL))
+
+        # heat-map: one force evaluation per cell, (nx, ny) like surfarray
+        gx= x0+ (np.arange(nx)+ 0.5)* CELL
+        gy= y0+ (np.arange(ny)+ 0.5)* CELL
+        X, Y= np.meshgrid(gx, gy, indexing='ij')
+        ax, ay= lvl.force_array(X, Y)
+        mag= np.hypot(ax, ay)
+        on= mag> 0
+        t= np.zeros_like(mag)
+        if on.any():
+            lm= np.log(mag[on])
+            lo, hi= lm.min(), lm.max()
+            t[on]= (lm- lo)/ max(hi- lo, 1e-9)
+        small= pygame.Surface((nx, ny), pygame.SRCALPHA, 32)
+        rgb= pygame.surfarray.pixels3d(small)
+        rgb[...]= colormap(t).astype(np.uint8)
+        del rgb
+        alpha= pygame.surfarray.pixels_alpha(small)
+        alpha[...]= np.where(on, 40+ 90*t, 0).astype(np.uint8)
+        del alpha
+        k= max(1, int(math.ceil(max(nx, ny)* CELL/ MAX_SIDE)))
+        srf= pygame.transform.smoothscale(small, (nx*CELL// k, ny*CELL// k))
+
+        # boundary rings and a sparse arrow field on top
+        for (cx, cy, _gm, rng, _l) in srcs:
+            pygame.draw.circle(srf, (255,255,255,160), (int((cx- x0)/k), int((cy- y0)/k)), int(rng/k), max(1, 2//k))
+        if k> 1:
+            return srf, (x0, y0), k
+        g= np.arange(x0+ ARROW_SPACING/2, x1, ARROW_SPACING)
+        h= np.arange(y0+ ARROW_SPACING/2, y1, ARROW_SPACING)
+        AX, AY= np.meshgrid(g, h, indexing='ij')
+        fx, fy= lvl.force_array(AX, AY)
+        fm= np.hypot(fx, fy)
+        for i, j in zip(*np.nonzero(fm> 0)):
+            px= AX[i,j]- x0
+            py= AY[i,j]- y0
+            ux= fx[i,j]/ fm[i,j]
+            uy= fy[i,j]/ fm[i,j]
+            tt= t[min(int(px// CELL), nx-1), min(int(py// CELL), ny-1)]
+            ln= 12+ 30*tt
+            ex, ey= px+ ux*ln, py+ uy*ln
+            col= (255,255,255,200)
+            pygame.draw.line(srf, col, (px, py), (ex, ey), 1)
+            pygame.draw.line(srf, col, (ex, ey), (ex- 5*ux+ 3*uy, ey- 5*uy- 3*ux), 1)
+            pygame.draw.line(srf, col, (ex, ey), (ex- 5*ux- 3*uy, ey- 5*uy+ 3*ux), 1)
+        return srf, (x0, y0), 1
+
+    def update(self, lvl):
+        key= field_key(lvl)
+        if key== self._key:
+            return
+        if key not in self._cache:
+            t0= time.perf_counter()
+            self._cache[key]= self._build(lvl)
+            self.build_ms= (time.perf_counter()- t0)*1000.0
+        self._key= key
+        self._scaled= {}
+        built= self._cache[key]
+        self.surface, self.origin, self.bake= built if built else (None, (0.0, 0.0), 1)
+        if self.surface is not None and pygame.display.get_surface() is not None:
+            self.surface= self.surface.convert_alpha()
+            self._cache[key]= (self.surface, self.origin, self.bake)
+
+    def _surface_at(self, scale):
+        if scale== 1.0:
+            return self.surface
+        srf= self._scaled.get(scale)
+        if srf is None:
+            if len(self._scaled)>= SCALED_CACHE:
+                self._scaled.clear()
+            ow, oh= self.surface.get_size()
+            srf= pygame.transform.smoothscale(self.surface, (max(1, int(ow*scale)), max(1, int(oh*scale))))
+            self._scaled[scale]= srf
+        return srf
+
+    def draw(self, screen, lvl, cam_x, cam_y, scale=1.0):
+        self.update(lvl)
+        if self.surface is None:
+            return
+        # nearest wrapped copy of the overlay to the camera, in world units
+        w= lvl.WORLD_WIDTH
+        h= lvl.WORLD_HEIGHT
+        sw, sh= screen.get_width()/ scale, screen.get_height()/ scale
+        k= self.bake
+        ow, oh= self.surface.get_width()* k, self.surface.get_height()* k
+        ox= (self.origin[0]+ ow/2- cam_x- sw/2+ w/2) % w- w/2+ sw/2- ow/2
+        oy= (self.origin[1]+ oh/2- cam_y- sh/2+ h/2) % h- h/2+ sh/2- oh/2
+        if k== 1:
+            screen.blit(self._surface_at(scale), (int(ox*scale), int(oy*scale)))
+            return
+        # coarse: the overlay and its wrapped neighbours into the scratch
+        # (a plain copy: the scratch starts transparent), then one upscale
+        size= (int(sw/ k)+ 2, int(sh/ k)+ 2)
+        if self._scratch is None or self._scratch.get_size()!= size:
+            self._scratch= pygame.Surface(size, pygame.SRCALPHA, 32)
+            self._view= None
+        self._scratch.fill((0,0,0,0))
+        for i in (-1, 0, 1):
+            for j in (-1, 0, 1):
+                self._scratch.blit(self.surface, (int((ox+ i*w)/ k), int((oy+ j*h)/ k)),
+                                   special_flags=pygame.BLEND_RGBA_MAX)
+        out= (int(size[0]* k* scale), int(size[1]* k* scale))
+        if self._view is None or self._view.get_size()!= out:
+            self._view= pygame.Surface(out, pygame.SRCALPHA, 32)
+        pygame.transform.scale(self._scratch, out, self._view)
+        screen.blit(self._view, (0, 0))
@@ -0,0 +1,84 @@
+"""
+Heads-up display built from cached text surfaces.
+
+Every HUD line is a fixed label and a value. Labels are rendered once. A
+value is rendered only when its text changes, through a cache of rendered
+strings, and drawn into one panel surface; the panel is blitted once per
+frame. Text and panel are opaque and in the display's format, so every blit
+is a plain copy. (Composing values from per-character glyphs was tried: a
+glyph blit costs about as much as rendering a short string, so a value of
+twenty characters came out several times slower.)
+"""
+import pygame
+
+HUD_MARGIN = 10
+HUD_PAD    = 6
+HUD_BG     = (12,14,22)
+HUD_COLOR  = (200,220,200)
+TEXT_CACHE = 512         # rendered strings kept before the cache is reset
+
+
+def _display_format(srf):
+    return srf.convert() if pygame.display.get_surface() is not None else srf
+
+
+class TextCache:
+    def __init__(self, font, bg=HUD_BG, size=TEXT_CACHE):
+        self.font= font
+        self.bg= bg
+        self.size= size
+        self._texts= {}      # (text, colour) -> surface
+        self.misses= 0
+
+    def text(self, text, color):
+        s= self._texts.get((text, color))
+        if s is None:
+            if len(self._texts)>= self.size:
+                self._texts.clear()
+            s= _display_format(self.font.render(text, True, color, self.bg))
+            self._texts[(text, color)]= s
+            self.misses+= 1
+        return s
+
+
+class Hud:
+    def __init__(self, font, lines, width=260, color=HUD_COLOR):
+        """lines: (key, label) pairs, top to bottom."""
+        self.cache= TextCache(font)
+        self.keys= [k for k, _label in lines]
+        self.color= color
+        self.line_h= font.get_linesize()
+        h= len(self.keys)* self.line_h+ 2*HUD_PAD
+        self.panel= _display_format(pygame.Surface((width, h)))
+        self.panel.fill(HUD_BG)
+        # labels once; values start at a common column after the widest
+        col= 0
+        for row, (_k, label) in enumerate(lines):
+            if label:
+                s= self.cache.text(label, color)
+                self.panel.blit(s, (HUD_PAD, HUD_PAD+ row* self.line_h))
+                col= max(col, s.get_width())
+        self.value_x= HUD_PAD+ col+ (12 if col else 0)
+        self.shown= {k: None for k in self.keys}
+        self.redrawn= 0      # values redrawn by the last update
+
+    def update(self, values):
+        """values: key -> displayed text. Only values whose text changed are redrawn."""
+        self.redrawn= 0
+        w= self.panel.get_width()- self.value_x
+        for row, key in enumerate(self.keys):
+            text= values.get(key, "")
+            if text== self.shown[key]:
+                continue
+            y= HUD_PAD+ row* self.line_h
+            self.panel.fill(HUD_BG, (self.value_x, y, w, self.line_h))
+            if text:
+                self.panel.blit(self.cache.text(text, self.color), (self.value_x, y))
+            self.shown[key]= text
+            self.redrawn+= 1
+
+    def draw(self, screen, pos=None):
+        # bottom-left corner unless told otherwise
+        if pos is None:
+            pos= (HUD_MARGIN, screen.get_height()- self.panel.get_height()- HUD_MARGIN)
+        screen.blit(self.panel, pos)
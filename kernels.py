@@ -0,0 +1,440 @@
+"""
+Per-tick physics kernels over array-backed bodies, with two backends.
+
+"numba": explicit loops compiled with Numba; one pass over the bodies per
+step, no temporaries. Picked when Numba is installed.
+"numpy": the same kernels as whole-array NumPy expressions. Always there.
+
+SPACE_KERNELS=numpy in the environment forces the fallback; SPACE_KERNELS=numba
+without Numba installed warns and runs on numpy. Attractors are an (k, 4)
+float64 table of (cx, cy, G_M, range), as in point_mass_accel. All kernels
+work in place. orbit() is the odd one out: many steps of one
+body, for time warp.
+
+    python kernels.py check          # the backends against each other
+    python kernels.py bench 50000    # steps/s of each backend
+"""
+import math, os, sys, time, warnings
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+CHECK_TOL = 1e-9     # relative; the backends only differ in summation order
+
+
+############################################################
+# NUMPY BACKEND
+############################################################
+
+_SCRATCH= {}
+_GROWN= [0]     # bytes of buffers scratch has ever allocated
+
+def scratch(name, n, dtype=np.float64):
+    """
+    A work array of length n that is reused across calls: the same name
+    hands back the same memory, grown (doubling) only when n outgrows it.
+    The contents are whatever the last user left. Not thread-safe.
+    """
+    buf= _SCRATCH.get(name)
+    if buf is None or len(buf)< n or buf.dtype!= dtype:
+        buf= np.empty(max(n, 2*len(buf) if buf is not None else 0), dtype)
+        _SCRATCH[name]= buf
+        _GROWN[0]+= buf.nbytes
+    return buf[:n]
+
+def scratch_bytes():
+    """(bytes the scratch buffers hold now, bytes scratch has ever allocated)"""
+    return sum(b.nbytes for b in _SCRATCH.values()), _GROWN[0]
+
+def _np_gravity(x, y, attr, ax, ay):
+    # adds each attractor's pull at (x, y) into ax, ay; the temporaries
+    # are scratch arrays, so a step allocates nothing of size n
+    n= len(x)
+    dx= scratch('g_dx', n); dy= scratch('g_dy', n)
+    r2= scratch('g_r2', n); r= scratch('g_r', n); t= scratch('g_t', n)
+    on= scratch('g_on', n, np.bool_); off= scratch('g_off', n, np.bool_)
+    for cx, cy, g_m, g_range in attr:
+        np.subtract(x, cx, out=dx)
+        np.subtract(y, cy, out=dy)
+        np.multiply(dx, dx, out=r2)
+        np.multiply(dy, dy, out=t)
+        r2+= t
+        np.sqrt(r2, out=r)
+        np.less(r, g_range, out=on)
+        np.greater_equal(r, 1e-3, out=off)
+        on&= off
+        np.logical_not(on, out=off)
+        # k = g_m/ r^3 inside the range, 0 outside
+        np.multiply(r2, r, out=t)
+        np.copyto(t, 1.0, where=off)
+        np.divide(g_m, t, out=t)
+        np.copyto(t, 0.0, where=off)
+        dx*= t
+        dy*= t
+        ax-= dx
+        ay-= dy
+
+def _np_limit_speed(vx, vy, cmax):
+    n= len(vx)
+    spd= scratch('ls_spd', n)
+    fast= scratch('ls_fast', n, np.bool_)
+    np.hypot(vx, vy, out=spd)
+    np.greater(spd, cmax, out=fast)
+    if fast.any():
+        vx[fast]*= cmax/ spd[fast]
+        vy[fast]*= cmax/ spd[fast]
+
+def _np_wrap_pos(x, y, w, h):
+    x%= w
+    y%= h
+
+def _np_kick_drift(x, y, vx, vy, ax, ay, dt, cmax, w, h):
+    t= scratch('kd_t', len(x))
+    vx+= np.multiply(ax, dt, out=t)
+    vy+= np.multiply(ay, dt, out=t)
+    _np_limit_speed(vx, vy, cmax)
+    x+= np.multiply(vx, dt, out=t)
+    y+= np.multiply(vy, dt, out=t)
+    _np_wrap_pos(x, y, w, h)
+
+def _np_step(x, y, vx, vy, attr, dt, cmax, w, h):
+    ax= scratch('st_ax', len(x))
+    ay= scratch('st_ay', len(x))
+    ax.fill(0.0)
+    ay.fill(0.0)
+    _np_gravity(x, y, attr, ax, ay)
+    _np_kick_drift(x, y, vx, vy, ax, ay, dt, cmax, w, h)
+
+def _np_bounce_pairs(x, y, vx, vy, m, ii, jj, e):
+    # impulses from the velocities before the call, summed for bodies in
+    # several pairs; mode='clip' as a take into `out` is otherwise buffered
+    n= len(ii)
+    nx= scratch('bp_nx', n); ny= scratch('bp_ny', n)
+    t= scratch('bp_t', n); u= scratch('bp_u', n)
+    m1= np.take(m, ii, out=scratch('bp_m1', n), mode='clip')
+    m2= np.take(m, jj, out=scratch('bp_m2', n), mode='clip')
+    # unit normal i -> j
+    np.subtract(np.take(x, jj, out=nx, mode='clip'), np.take(x, ii, out=t, mode='clip'), out=nx)
+    np.subtract(np.take(y, jj, out=ny, mode='clip'), np.take(y, ii, out=t, mode='clip'), out=ny)
+    dist= scratch('bp_dist', n)
+    np.multiply(nx, nx, out=dist)
+    dist+= np.multiply(ny, ny, out=t)
+    np.sqrt(dist, out=dist)
+    dist+= 1e-12
+    nx/= dist
+    ny/= dist
+    # normal closing speed, then the impulse (0 for separating pairs)
+    vn= dist
+    np.subtract(np.take(vx, jj, out=vn, mode='clip'), np.take(vx, ii, out=t, mode='clip'), out=vn)
+    vn*= nx
+    np.subtract(np.take(vy, jj, out=u, mode='clip'), np.take(vy, ii, out=t, mode='clip'), out=u)
+    u*= ny
+    vn+= u
+    np.divide(1, m1, out=t)
+    t+= np.divide(1, m2, out=u)
+    imp= np.multiply(vn, -(1.0+ e), out=u)
+    imp/= t
+    np.copyto(imp, 0.0, where=np.greater(vn, 0, out=scratch('bp_sep', n, np.bool_)))
+    np.negative(imp, out=t)
+    np.add.at(vx, ii, np.divide(np.multiply(t, nx, out=vn), m1, out=vn))
+    np.add.at(vy, ii, np.divide(np.multiply(t, ny, out=vn), m1, out=vn))
+    np.add.at(vx, jj, np.divide(np.multiply(imp, nx, out=vn), m2, out=vn))
+    np.add.at(vy, jj, np.divide(np.multiply(imp, ny, out=vn), m2, out=vn))
+
+
+def _np_orbit(s, attr, lethal, look, dt, cmax, w, h, n):
+    # one body has nothing to vectorize over: the loop kernel's steps on
+    # Python floats, several times faster than on NumPy scalars
+    x, y, vx, vy= float(s[0]), float(s[1]), float(s[2]), float(s[3])
+    src= [(float(a[0]), float(a[1]), float(a[2]), float(a[3]), float(l)) for a, l in zip(attr, lethal)]
+    for k in range(n):
+        gx= 0.0
+        gy= 0.0
+        for cx, cy, g_m, g_range, _l in src:
+            dx= x- cx
+            dy= y- cy
+            r2= dx*dx+ dy*dy
+            r= math.sqrt(r2)
+            if r< g_range and r>= 1e-3:
+                q= g_m/ (r2*r)
+                gx-= q*dx
+                gy-= q*dy
+        vx= vx+ gx*dt
+        vy= vy+ gy*dt
+        spd= math.sqrt(vx*vx+ vy*vy)
+        if spd> cmax:
+            vx*= cmax/ spd
+            vy*= cmax/ spd
+        x= (x+ vx*dt)% w
+        y= (y+ vy*dt)% h
+        for cx, cy, _g, _r, l in src:
+            dx= x- cx
+            dy= y- cy
+            r= math.sqrt(dx*dx+ dy*dy)
+            closing= -(dx*vx+ dy*vy)/ max(r, 1e-3)
+            if r- l< closing* look:
+                s[0], s[1], s[2], s[3]= x, y, vx, vy
+                return k+ 1
+    s[0], s[1], s[2], s[3]= x, y, vx, vy
+    return n
+
+############################################################
+# LOOP KERNELS (compiled by Numba when it is installed)
+############################################################
+
+def _lp_accel(px, py, attr):
+    gx= 0.0
+    gy= 0.0
+    for a in range(attr.shape[0]):
+        dx= px- attr[a, 0]
+        dy= py- attr[a, 1]
+        r2= dx*dx+ dy*dy
+        r= np.sqrt(r2)
+        if r< attr[a, 3] and r>= 1e-3:
+            k= attr[a, 2]/ (r2*r)
+            gx-= k*dx
+            gy-= k*dy
+    return gx, gy
+
+def _lp_gravity(x, y, attr, ax, ay):
+    for i in range(x.shape[0]):
+        gx, gy= _lp_accel(x[i], y[i], attr)
+        ax[i]+= gx
+        ay[i]+= gy
+
+def _lp_limit_speed(vx, vy, cmax):
+    for i in range(vx.shape[0]):
+        spd= np.sqrt(vx[i]*vx[i]+ vy[i]*vy[i])
+        if spd> cmax:
+            vx[i]*= cmax/ spd
+            vy[i]*= cmax/ spd
+
+def _lp_wrap_pos(x, y, w, h):
+    for i in range(x.shape[0]):
+        x[i]%= w
+        y[i]%= h
+
+def _lp_move(i, x, y, vx, vy, gx, gy, dt, cmax, w, h):
+    ux= vx[i]+ gx*dt
+    uy= vy[i]+ gy*dt
+    spd= np.sqrt(ux*ux+ uy*uy)
+    if spd> cmax:
+        ux*= cmax/ spd
+        uy*= cmax/ spd
+    vx[i]= ux
+    vy[i]= uy
+    x[i]= (x[i]+ ux*dt)% w
+    y[i]= (y[i]+ uy*dt)% h
+
+def _lp_kick_drift(x, y, vx, vy, ax, ay, dt, cmax, w, h):
+    for i in range(x.shape[0]):
+        _lp_move(i, x, y, vx, vy, ax[i], ay[i], dt, cmax, w, h)
+
+def _lp_step(x, y, vx, vy, attr, dt, cmax, w, h):
+    for i in range(x.shape[0]):
+        gx, gy= _lp_accel(x[i], y[i], attr)
+        _lp_move(i, x, y, vx, vy, gx, gy, dt, cmax, w, h)
+
+def _lp_orbit(s, attr, lethal, look, dt, cmax, w, h, n):
+    # steps the body s= [x, y, vx, vy] up to n times; stops after the step
+    # that leaves it closing on attractor a's lethal radius with less than
+    # `look` seconds to go. Returns the steps taken.
+    for k in range(n):
+        gx, gy= _lp_accel(s[0], s[1], attr)
+        _lp_move(0, s[0:1], s[1:2], s[2:3], s[3:4], gx, gy, dt, cmax, w, h)
+        for a in range(attr.shape[0]):
+            dx= s[0]- attr[a, 0]
+            dy= s[1]- attr[a, 1]
+            r= np.sqrt(dx*dx+ dy*dy)
+            closing= -(dx*s[2]+ dy*s[3])/ max(r, 1e-3)
+            if r- lethal[a]< closing* look:
+                return k+ 1
+    return n
+
+def _lp_bounce_pairs(x, y, vx, vy, m, ii, jj, e):
+    n= ii.shape[0]
+    imp= np.empty(n)
+    nx= np.empty(n)
+    ny= np.empty(n)
+    for p in range(n):
+        i= ii[p]
+        j= jj[p]
+        dx= x[j]- x[i]
+        dy= y[j]- y[i]
+        dist= np.sqrt(dx*dx+ dy*dy)+ 1e-12
+        nx[p]= dx/ dist
+        ny[p]= dy/ dist
+        vn= (vx[j]- vx[i])* nx[p]+ (vy[j]- vy[i])* ny[p]
+        imp[p]= 0.0 if vn> 0 else -(1.0+ e)* vn/ (1/m[i]+ 1/m[j])
+    for p in range(n):
+        i= ii[p]
+        j= jj[p]
+        vx[i]-= imp[p]* nx[p]/ m[i]
+        vy[i]-= imp[p]* ny[p]/ m[i]
+        vx[j]+= imp[p]* nx[p]/ m[j]
+        vy[j]+= imp[p]* ny[p]/ m[j]
+
+_LOOP_NAMES= ('accel', 'gravity', 'limit_speed', 'wrap_pos', 'move', 'kick_drift', 'step', 'orbit', 'bounce_pairs')
+
+def _loop_kernels(jit):
+    # jit the helpers first: the outer kernels resolve them as globals
+    g= globals()
+    ks= {}
+    for name in _LOOP_NAMES:
+        f= g['_lp_'+ name]
+        if jit:
+            f= numba.njit(cache=True)(f)
+            g['_lp_'+ name]= f
+        ks[name]= f
+    return ks
+
+
+############################################################
+# BACKEND SELECTION
+############################################################
+
+_NUMPY= {
+    'gravity': _np_gravity, 'limit_speed': _np_limit_speed, 'wrap_pos': _np_wrap_pos,
+    'kick_drift': _np_kick_drift, 'step': _np_step, 'orbit': _np_orbit, 'bounce_pairs': _np_bounce_pairs,
+}
+_NUMBA= None
+
+BACKENDS= ("numba", "numpy") if numba is not None else ("numpy",)
+
+def use(name=None):
+    """Selects the backend by name; None picks numba when it's installed."""
+    global BACKEND, _NUMBA, gravity, limit_speed, wrap_pos, kick_drift, step, orbit, bounce_pairs
+    if name is None:
+        name= os.environ.get("SPACE_KERNELS") or BACKENDS[0]
+        if name== "numba" and numba is None:
+            # asked for by the environment, not the caller: run on, slower
+            warnings.warn("SPACE_KERNELS=numba but Numba is not installed; using numpy", RuntimeWarning, stacklevel=2)
+            name= "numpy"
+    if name not in BACKENDS:
+        raise ValueError("kernel backend %r not available (have %s)" % (name, ", ".join(BACKENDS)))
+    if name== "numba":
+        if _NUMBA is None:
+            _NUMBA= _loop_kernels(jit=True)
+        ks= _NUMBA
+    else:
+        ks= _NUMPY
+    BACKEND= name
+    gravity= ks['gravity']
+    limit_speed= ks['limit_speed']
+    wrap_pos= ks['wrap_pos']
+    kick_drift= ks['kick_drift']
+    step= ks['step']
+    orbit= ks['orbit']
+    bounce_pairs= ks['bounce_pairs']
+    return name
+
+use()
+
+
+############################################################
+# CROSS-CHECK AND BENCHMARK
+############################################################
+
+def _bodies(n, seed=0, w=10000.0, h=10000.0):
+    rng= np.random.default_rng(seed)
+    return {
+        'x': rng.uniform(0, w, n), 'y': rng.uniform(0, h, n),
+        'vx': rng.uniform(-400, 400, n), 'vy': rng.uniform(-400, 400, n),
+        'm': rng.uniform(30, 120, n),
+    }
+
+CHECK_ATTR= np.array([[5000.0, 5000.0, 7.2e6, 4500.0], [2000.0, 7000.0, 2e6, 1500.0]])
+
+def check(n=2000, steps=20, seed=0):
+    """
+    Runs the NumPy kernels and the loop kernels (compiled if Numba is
+    installed, plain Python otherwise) on the same bodies and returns the
+    worst relative difference per kernel. Raises AssertionError past CHECK_TOL.
+    """
+    loops= _NUMBA if _NUMBA is not None else _loop_kernels(jit=numba is not None)
+    w= h= 10000.0
+    dt= 0.1
+    cmax= 300.0      # low enough that the speed limit is exercised
+    worst= {}
+
+    def compare(name, a, b):
+        err= 0.0
+        for k in a:
+            scale= max(1.0, float(np.abs(a[k]).max()))
+            err= max(err, float(np.abs(a[k]- b[k]).max())/ scale)
+        worst[name]= max(worst.get(name, 0.0), err)
+
+    a= _bodies(n, seed); b= {k: v.copy() for k, v in a.items()}
+    ga= {'ax': np.zeros(n), 'ay': np.zeros(n)}; gb= {'ax': np.zeros(n), 'ay': np.zeros(n)}
+    _np_gravity(a['x'], a['y'], CHECK_ATTR, ga['ax'], ga['ay'])
+    loops['gravity'](b['x'], b['y'], CHECK_ATTR, gb['ax'], gb['ay'])
+    compare('gravity', ga, gb)
+
+    _np_limit_speed(a['vx'], a['vy'], cmax); loops['limit_speed'](b['vx'], b['vy'], cmax)
+    compare('limit_speed', a, b)
+    a['x']-= w/2; b['x']-= w/2          # some negative, to exercise the wrap
+    _np_wrap_pos(a['x'], a['y'], w, h); loops['wrap_pos'](b['x'], b['y'], w, h)
+    compare('wrap_pos', a, b)
+
+    for _ in range(steps):
+        _np_step(a['x'], a['y'], a['vx'], a['vy'], CHECK_ATTR, dt, cmax, w, h)
+        loops['step'](b['x'], b['y'], b['vx'], b['vy'], CHECK_ATTR, dt, cmax, w, h)
+    compare('step', a, b)
+
+    # a few bodies through orbit, against step on the same bodies
+    lethal= np.array([300.0, 100.0])
+    for i in range(min(n, 8)):
+        sa= np.array([a['x'][i], a['y'][i], a['vx'][i], a['vy'][i]]); sb= sa.copy()
+        one= {k: v[i:i+1].copy() for k, v in a.items()}
+        k= _np_orbit(sa, CHECK_ATTR, lethal, 0.0, dt, cmax, w, h, steps)
+        loops['orbit'](sb, CHECK_ATTR, lethal, 0.0, dt, cmax, w, h, k)
+        for _ in range(k):
+            _np_step(one['x'], one['y'], one['vx'], one['vy'], CHECK_ATTR, dt, cmax, w, h)
+        compare('orbit', {'s': sa}, {'s': sb})
+        compare('orbit', {'s': sa}, {'s': np.array([one['x'][0], one['y'][0], one['vx'][0], one['vy'][0]])})
+
+    _np_kick_drift(a['x'], a['y'], a['vx'], a['vy'], ga['ax'], ga['ay'], dt, cmax, w, h)
+    loops['kick_drift'](b['x'], b['y'], b['vx'], b['vy'], gb['ax'], gb['ay'], dt, cmax, w, h)
+    compare('kick_drift', a, b)
+
+    # random pairs, bodies repeated across pairs so the impulse sums matter
+    rng= np.random.default_rng(seed+ 1)
+    ii= rng.integers(0, n, n)
+    jj= (ii+ rng.integers(1, n, n))% n
+    _np_bounce_pairs(a['x'], a['y'], a['vx'], a['vy'], a['m'], ii, jj, 1.0)
+    loops['bounce_pairs'](b['x'], b['y'], b['vx'], b['vy'], b['m'], ii, jj, 1.0)
+    compare('bounce_pairs', a, b)
+
+    bad= {k: v for k, v in worst.items() if v> CHECK_TOL}
+    assert not bad, "kernel backends disagree: %r" % bad
+    return worst
+
+def bench(n, steps=200, seed=0):
+    """Fused step ticks per second for each backend."""
+    out= {}
+    for name in BACKENDS:
+        ks= _NUMPY if name== "numpy" else (_NUMBA or _loop_kernels(jit=True))
+        b= _bodies(n, seed)
+        ks['step'](b['x'], b['y'], b['vx'], b['vy'], CHECK_ATTR, 0.1, 3e5, 1e4, 1e4)   # compile
+        t0= time.perf_counter()
+        for _ in range(steps):
+            ks['step'](b['x'], b['y'], b['vx'], b['vy'], CHECK_ATTR, 0.1, 3e5, 1e4, 1e4)
+        out[name]= steps/ (time.perf_counter()- t0)
+    return out
+
+
+if __name__=="__main__":
+    if len(sys.argv)>= 2 and sys.argv[1]== "check":
+        n= int(sys.argv[2]) if len(sys.argv)> 2 else (2000 if numba is not None else 300)
+        for k, v in check(n).items():
+            print("%-12s max rel diff %.2e" % (k, v))
+        print("ok (%s)" % ("numba vs numpy" if numba is not None else "python loops vs numpy; numba not installed"))
+    elif len(sys.argv)>= 3 and sys.argv[1]== "bench":
+        for k, v in bench(int(sys.argv[2])).items():
+            print("%-6s %8.1f steps/s" % (k, v))
+    else:
+        print("usage: kernels.py check [N] | bench N")
+        sys.exit(2)
@@ -0,0 +1,85 @@
+"""
+On-disk cache for generated level assets.
+
+A level's arrays (star fields, asteroid state, pre-rendered surfaces) are
+written into one file: a small JSON header followed by each array's raw bytes
+at an aligned offset. Loading memory-maps the file and returns zero-copy
+views, so a cached level is ready without regenerating or reading it all.
+"""
+import json, os, struct
+import numpy as np
+
+MAGIC     = b"SFLVL001"
+ALIGN     = 64
+_HEAD_LEN = struct.Struct("<I")
+
+
+def _aligned(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def save_arrays(path, arrays):
+    """
+    Writes a dict of name -> ndarray to path. The file is written to a
+    temporary name first and renamed, so a reader never sees half a file.
+    Returns False if the cache could not be written (e.g. read-only disk).
+    """
+    entries= []
+    blobs= []
+    for name, arr in arrays.items():
+        arr= np.ascontiguousarray(arr)
+        entries.append({'name': name, 'dtype': arr.dtype.str, 'shape': list(arr.shape)})
+        blobs.append(arr)
+    # offsets are relative to the data section, which starts at the first
+    # aligned byte after the header
+    off= 0
+    for e, arr in zip(entries, blobs):
+        e['offset']= off
+        off= _aligned(off+ arr.nbytes)
+    header= json.dumps(entries).encode("utf-8")
+    data_start= _aligned(len(MAGIC)+ _HEAD_LEN.size+ len(header))
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp= "%s.%d.tmp" % (path, os.getpid())
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            f.write(_HEAD_LEN.pack(len(header)))
+            f.write(header)
+            for e, arr in zip(entries, blobs):
+                f.seek(data_start+ e['offset'])
+                f.write(arr.tobytes())
+            f.truncate(data_start+ off)
+        os.replace(tmp, path)
+    except OSError:
+        return False
+    return True
+
+
+def load_arrays(path):
+    """
+    Memory-maps a file written by save_arrays and returns name -> read-only
+    array views into it, or None if the file is missing or unreadable.
+    """
+    try:
+        mm= np.memmap(path, dtype=np.uint8, mode="r")
+    except (OSError, ValueError):
+        return None
+    if mm.size< len(MAGIC)+ _HEAD_LEN.size or bytes(mm[:len(MAGIC)])!= MAGIC:
+        return None
+    (hlen,)= _HEAD_LEN.unpack(bytes(mm[len(MAGIC):len(MAGIC)+ _HEAD_LEN.size]))
+    start= len(MAGIC)+ _HEAD_LEN.size
+    try:
+        entries= json.loads(bytes(mm[start:start+ hlen]).decode("utf-8"))
+        data_start= _aligned(start+ hlen)
+        out= {}
+        for e in entries:
+            dt= np.dtype(e['dtype'])
+            shape= tuple(e['shape'])
+            n= dt.itemsize* int(np.prod(shape, dtype=np.int64))
+            off= data_start+ e['offset']
+            if off+ n> mm.size:
+                return None
+            out[e['name']]= mm[off:off+ n].view(dt).reshape(shape)
+    except (ValueError, KeyError, TypeError):
+        return None
+    return out
@@ -0,0 +1,454 @@
+"""
+Light pulses: bundles of photon rays that bend around the level's masses.
+
+Photons fly at PULSE_SPEED and turn under gravity (LIGHT_G times the pull
+on matter, perpendicular to the ray, so the speed stays fixed). Gravity
+acts only inside each attractor's range disc, so a ray is straight until
+it meets a disc and straight again once it leaves.
+
+The path through a disc depends only on where the ray starts (distance r0
+from the mass) and its angle psi to the inward radial: rotating the ray
+rotates the path, and a negative psi mirrors it. So each distinct
+(G_M, range, lethal) gets one table, integrated once over an r0 x psi
+grid: the path sampled every range/PATH_SAMPLES_R units (float16, in units
+of the range), the exit point and direction, the path length and whether
+the ray was captured. Rays entering
+from outside start at r0 = range; r0 < range is for pulses fired inside a
+disc. Per tick a ray in a disc is one lookup and a rotation, however bent
+its path; a free ray is one segment-circle test per attractor.
+
+Where ranges overlap a ray follows the disc it entered first.
+
+Tables are cached on disk next to the level cache (see load_tables).
+
+    python lightpulse.py check    # tables against direct integration
+    python lightpulse.py bench    # rays traced per second
+"""
+import math, os, sys, time, zlib
+import numpy as np
+import pygame
+
+import levelcache
+
+PULSE_SPEED    = 2000.0    # world units per second; C_LIGHT would cross the world 3 times a tick
+LIGHT_G        = 4000.0    # light's pull relative to matter's, so the bending is visible
+PULSE_RAYS     = 512
+PULSE_SPREAD   = math.radians(90)
+PULSE_LIFE     = 6.0       # seconds
+PULSE_MAX      = 16384     # live rays over all pulses
+PULSE_COLOR    = (255,240,170)
+
+TABLE_R        = 24        # start radii per table
+TABLE_PSI      = 256       # start angles per table, 0..pi
+STEPS_R        = 200       # integration steps per range length
+PATH_SAMPLES_R = 10        # path samples kept per range length
+MAX_PATH_R     = 6         # longer paths count as captured (orbiting)
+TABLE_VERSION  = 2
+
+_REC= STEPS_R// PATH_SAMPLES_R
+_P= MAX_PATH_R* PATH_SAMPLES_R+ 1        # path samples per table ray
+
+
+############################################################
+# TABLES
+############################################################
+
+def _curvature(x, y, c, g, R2):
+    # dtheta/ds of a ray heading (cos c, sin c) at (x, y): the pull's
+    # component across the ray over v^2, zero outside the range
+    r2= x*x+ y*y
+    k= np.where(r2< R2, g/ (r2* np.sqrt(r2)), 0.0)
+    return k* (x* np.sin(c)- y* np.cos(c))
+
+def build_table(g_m, radius, lethal):
+    """Integrates the table rays for one attractor. Returns a dict of arrays."""
+    R= float(radius)
+    L= float(lethal)
+    g= LIGHT_G* g_m/ (PULSE_SPEED* PULSE_SPEED)
+    r0= L+ (R- L)* np.arange(1, TABLE_R+ 1)/ TABLE_R
+    psi= np.linspace(0.0, math.pi, TABLE_PSI)
+    n= TABLE_R* TABLE_PSI
+    x= np.repeat(r0, TABLE_PSI)
+    y= np.zeros(n)
+    c= np.tile(psi, TABLE_R)+ math.pi      # heading; psi=0 is straight in
+    ds= R/ STEPS_R
+    path= np.empty((n, _P, 2), np.float32)
+    path[:,0,0]= x; path[:,0,1]= y
+    length= np.zeros(n, np.float32)
+    exit_pos= np.zeros((n, 2), np.float32)
+    exit_dir= np.zeros((n, 2), np.float32)
+    captured= np.zeros(n, bool)
+    # rays on the rim heading out never enter
+    out= (x>= R) & (np.cos(c)> 0)
+    exit_pos[out,0]= x[out]
+    exit_dir[out,0]= np.cos(c[out]); exit_dir[out,1]= np.sin(c[out])
+    path[out,1:,0]= x[out,None]; path[out,1:,1]= 0.0
+    act= np.flatnonzero(~out)
+    x= x[act]; y= y[act]; c= c[act]
+    R2= R*R
+    for step in range(1, MAX_PATH_R* STEPS_R+ 1):
+        # midpoint step
+        k1= _curvature(x, y, c, g, R2)
+        cm= c+ 0.5*ds* k1
+        xm= x+ 0.5*ds* np.cos(c)
+        ym= y+ 0.5*ds* np.sin(c)
+        k2= _curvature(xm, ym, cm, g, R2)
+        px, py= x, y
+        x= x+ ds* np.cos(cm)
+        y= y+ ds* np.sin(cm)
+        c= c+ ds* k2
+        if step% _REC== 0:
+            path[act, step// _REC, 0]= x
+            path[act, step// _REC, 1]= y
+        r2= x*x+ y*y
+        hit= r2<= L*L
+        gone= (r2>= R2) & (x*np.cos(c)+ y*np.sin(c)> 0)
+        done= hit | gone
+        if step== MAX_PATH_R* STEPS_R:
+            hit|= ~gone
+            done[:]= True
+        if done.any():
+            # where the step crossed the rim or the lethal radius
+            rp= np.sqrt(px*px+ py*py)
+            rc= np.sqrt(r2)
+            edge= np.where(gone, R, L)
+            f= np.clip((edge- rp)/ np.where(rc!= rp, rc- rp, 1.0), 0.0, 1.0)[done]
+            i= act[done]
+            ex= px[done]+ f* (x[done]- px[done])
+            ey= py[done]+ f* (y[done]- py[done])
+            exit_pos[i,0]= ex; exit_pos[i,1]= ey
+            exit_dir[i,0]= np.cos(c[done]); exit_dir[i,1]= np.sin(c[done])
+            length[i]= (step- 1+ f)* ds
+            captured[i]= hit[done]
+            # the path holds the exit point from here on
+            j0= (step- 1)// _REC+ 1
+            for row, k in enumerate(i.tolist()):
+                path[k, j0:, 0]= ex[row]
+                path[k, j0:, 1]= ey[row]
+            keep= ~done
+            act= act[keep]; x= x[keep]; y= y[keep]; c= c[keep]
+            if not len(act):
+                break
+    shape= (TABLE_R, TABLE_PSI)
+    # the path only places rays mid-pass for drawing: half precision, relative
+    # to the range, is a fraction of a pixel at 1x and a quarter of the size
+    path/= R
+    return {
+        'path': path.reshape(shape+ (_P, 2)).astype(np.float16),
+        'length': length.reshape(shape),
+        'exit_pos': exit_pos.reshape(shape+ (2,)),
+        'exit_dir': exit_dir.reshape(shape+ (2,)),
+        'captured': captured.reshape(shape),
+    }
+
+def table_key(g_m, radius, lethal):
+    return (float(g_m), float(radius), float(lethal))
+
+def _table_path(cache_dir, key):
+    if not cache_dir:
+        return None
+    params= repr(key+ (LIGHT_G, PULSE_SPEED, TABLE_R, TABLE_PSI, STEPS_R, PATH_SAMPLES_R, MAX_PATH_R))
+    return os.path.join(cache_dir, "light-%08x-v%d.lvl" % (zlib.crc32(params.encode()), TABLE_VERSION))
+
+def load_tables(attractors, cache_dir=None):
+    """
+    Tables for a level's attractors ((cx, cy, G_M, range, lethal) tuples),
+    one per distinct (G_M, range, lethal), from cache_dir when built
+    before. Returns the tables stacked, plus each attractor's table row.
+    """
+    keys= []
+    which= []
+    for (_cx, _cy, g_m, rng, lethal) in attractors:
+        key= table_key(g_m, rng, lethal)
+        if key not in keys:
+            keys.append(key)
+        which.append(keys.index(key))
+    tabs= []
+    for key in keys:
+        path= _table_path(cache_dir, key)
+        t= levelcache.load_arrays(path) if path else None
+        if t is None:
+            t= build_table(*key)
+            if path:
+                levelcache.save_arrays(path, t)
+        tabs.append(t)
+    names= ('path', 'length', 'exit_pos', 'exit_dir', 'captured')
+    out= {k: np.stack([t[k] for t in tabs]) if tabs else None for k in names}
+    out['which']= np.array(which, np.intp)
+    out['params']= np.array([[a[0], a[1], a[3], a[4]] for a in attractors], float).reshape(-1, 4)
+    return out
+
+
+############################################################
+# PULSES
+############################################################
+
+_COLS= (('x', float), ('y', float), ('dx', float), ('dy', float), ('age', float),
+        ('disc', np.intp),      # attractor the ray is inside, -1 when free
+        ('cell', np.intp),      # flat table cell (r0, psi) of that pass
+        ('cos', float), ('sin', float), ('flip', float),   # the pass's frame
+        ('s', float))           # distance travelled in the pass
+
+class PulseField:
+    """All live photons, as parallel arrays. step() advances them one tick."""
+    def __init__(self, tables, w, h, speed=PULSE_SPEED, life=PULSE_LIFE, cap=PULSE_MAX):
+        self.t= tables
+        self.w= w
+        self.h= h
+        self.speed= speed
+        self.life= life
+        self.cap= cap
+        p= tables['params']
+        self.cx, self.cy, self.R, self.L= p[:,0], p[:,1], p[:,2], p[:,3]
+        self.rays= {k: np.empty(0, dt) for k, dt in _COLS}
+        self.captured= 0
+
+    def __len__(self):
+        return len(self.rays['x'])
+
+    def clear(self):
+        self.rays= {k: v[:0] for k, v in self.rays.items()}
+
+    def emit(self, x, y, heading, n=PULSE_RAYS, spread=PULSE_SPREAD):
+        """A bundle of n rays fanned over `spread` radians around heading (radians)."""
+        n= min(n, self.cap- len(self))
+        if n<= 0:
+            return 0
+        a= heading+ spread* (np.arange(n)/ max(1, n- 1)- 0.5) if n> 1 else np.full(1, heading)
+        new= {
+            'x': np.full(n, float(x)), 'y': np.full(n, float(y)),
+            'dx': np.cos(a), 'dy': np.sin(a), 'age': np.zeros(n),
+            'disc': np.full(n, -1, np.intp), 'cell': np.zeros(n, np.intp),
+            'cos': np.ones(n), 'sin': np.zeros(n), 'flip': np.ones(n), 's': np.zeros(n),
+        }
+        # fired inside a range: the pass starts where the rays are
+        for k in range(len(self.cx)):
+            qx, qy= self._rel(new['x'], new['y'], k)
+            r= np.hypot(qx, qy)
+            inside= np.flatnonzero((r< self.R[k]) & (new['disc']< 0))
+            if len(inside):
+                self._enter(new, inside, k, qx[inside], qy[inside])
+        self.rays= {k: np.concatenate((self.rays[k], new[k])) for k, _dt in _COLS}
+        return n
+
+    def _rel(self, x, y, k):
+        # minimum-image offset from attractor k
+        w, h= self.w, self.h
+        return (x- self.cx[k]+ w/2)% w- w/2, (y- self.cy[k]+ h/2)% h- h/2
+
+    def _enter(self, r, i, k, qx, qy):
+        # start a pass through disc k for rays i at offset (qx, qy)
+        R, L= self.R[k], self.L[k]
+        d= np.hypot(qx, qy)
+        d= np.where(d> 0, d, 1e-9)
+        ux= -qx/ d; uy= -qy/ d                  # inward radial
+        dot= ux* r['dx'][i]+ uy* r['dy'][i]
+        crs= ux* r['dy'][i]- uy* r['dx'][i]
+        psi= np.arctan2(np.abs(crs), dot)
+        ir= np.clip(np.rint((d- L)/ (R- L)* TABLE_R).astype(np.intp)- 1, 0, TABLE_R- 1)
+        ip= np.rint(psi* ((TABLE_PSI- 1)/ math.pi)).astype(np.intp)
+        r['disc'][i]= k
+        r['cell'][i]= ir* TABLE_PSI+ ip
+        r['cos'][i]= qx/ d; r['sin'][i]= qy/ d
+        r['flip'][i]= np.where(crs< 0, -1.0, 1.0)
+        r['s'][i]= 0.0
+        # rays starting inside the lethal radius are gone at once
+        dead= d<= L
+        if dead.any():
+            r['age'][i[dead]]= np.inf
+
+    def _to_world(self, r, i, px, py):
+        # canonical table coordinates -> world, for rays i
+        k= r['disc'][i]
+        py= py* r['flip'][i]
+        c, s= r['cos'][i], r['sin'][i]
+        return self.cx[k]+ c*px- s*py, self.cy[k]+ s*px+ c*py
+
+    def advance(self, dt, tick):
+        """
+        step() over dt in pieces of at most tick: one step runs only a few
+        passes between discs, so a long one would carry rays straight through
+        them. Stops once every ray has aged out.
+        """
+        n= max(1, int(math.ceil(dt/ tick- 1e-9)))
+        for _ in range(n):
+            if not len(self):
+                break
+            self.step(dt/ n)
+
+    def step(self, dt):
+        r= self.rays
+        if not len(r['x']):
+            return
+        t= self.t
+        rem= np.full(len(r['x']), self.speed* dt)
+        r['age']+= dt
+        for _ in range(4):
+            # free rays: straight on, unless a range disc is in the way
+            free= np.flatnonzero((r['disc']< 0) & (rem> 0))
+            if len(free):
+                hit_t= np.full(len(free), np.inf)
+                hit_k= np.full(len(free), -1, np.intp)
+                dx= r['dx'][free]; dy= r['dy'][free]
+                for k in range(len(self.cx)):
+                    qx, qy= self._rel(r['x'][free], r['y'][free], k)
+                    b= qx*dx+ qy*dy
+                    cc= qx*qx+ qy*qy- self.R[k]**2
+                    disc= b*b- cc
+                    ok= (b< 0) & (cc> 0) & (disc> 0)
+                    tk= np.where(ok, -b- np.sqrt(np.where(ok, disc, 0.0)), np.inf)
+                    closer= tk< hit_t
+                    hit_t[closer]= tk[closer]; hit_k[closer]= k
+                ent= hit_t<= rem[free]
+                go= np.where(ent, hit_t, rem[free])
+                r['x'][free]= (r['x'][free]+ go*dx)% self.w
+                r['y'][free]= (r['y'][free]+ go*dy)% self.h
+                rem[free]-= go
+                for k in np.unique(hit_k[ent]).tolist():
+                    sel= ent & (hit_k== k)
+                    i= free[sel]
+                    qx, qy= self._rel(r['x'][i], r['y'][i], k)
+                    self._enter(r, i, k, qx, qy)
+            # rays in a disc: look up the pass, leave it when it ends
+            ind= np.flatnonzero((r['disc']>= 0) & (rem> 0))
+            if not len(ind):
+                break
+            tab= t['which'][r['disc'][ind]]
+            cell= r['cell'][ind]
+            ir, ip= np.divmod(cell, TABLE_PSI)
+            R= self.R[r['disc'][ind]]
+            s= r['s'][ind]+ rem[ind]
+            end= t['length'][tab, ir, ip]
+            out= s>= end
+            # still inside: position along the sampled path
+            j= s* (PATH_SAMPLES_R/ R)
+            j0= np.minimum(j.astype(np.intp), _P- 2)
+            f= np.minimum(j- j0, 1.0)
+            p0= t['path'][tab, ir, ip, j0].astype(float)
+            p1= t['path'][tab, ir, ip, j0+ 1].astype(float)
+            px= (p0[:,0]+ f* (p1[:,0]- p0[:,0]))* R
+            py= (p0[:,1]+ f* (p1[:,1]- p0[:,1]))* R
+            # leaving: exit point and heading, rest of the move done free
+            ep= t['exit_pos'][tab, ir, ip]
+            ed= t['exit_dir'][tab, ir, ip]
+            px= np.where(out, ep[:,0], px)
+            py= np.where(out, ep[:,1], py)
+            wx, wy= self._to_world(r, ind, px, py)
+            r['x'][ind]= wx% self.w
+            r['y'][ind]= wy% self.h
+            r['s'][ind]= s
+            rem[ind]= np.where(out, s- end, 0.0)
+            o= ind[out]
+            if len(o):
+                cap= t['captured'][tab[out], ir[out], ip[out]]
+                ex, ey= self._to_world(r, o, ed[out,0], ed[out,1])
+                k= r['disc'][o]
+                r['dx'][o]= ex- self.cx[k]; r['dy'][o]= ey- self.cy[k]
+                r['disc'][o]= -1
+                r['age'][o[cap]]= np.inf
+                rem[o[cap]]= 0.0
+                self.captured+= int(cap.sum())
+        alive= r['age']< self.life
+        if not alive.all():
+            self.rays= {k: v[alive] for k, v in r.items()}
+
+    def draw(self, screen, cam_x, cam_y, scale=1.0):
+        r= self.rays
+        if not len(r['x']):
+            return
+        sw, sh= screen.get_size()
+        sx= (((r['x']- cam_x)% self.w)* scale).astype(np.intp)
+        sy= (((r['y']- cam_y)% self.h)* scale).astype(np.intp)
+        vis= np.flatnonzero((sx< sw- 1) & (sy< sh- 1))
+        if not len(vis):
+            return
+        sx= sx[vis]; sy= sy[vis]
+        fade= np.clip(1.0- r['age'][vis]/ self.life, 0.2, 1.0)[:,None]
+        rgb= (fade* np.array(PULSE_COLOR, float)).astype(np.uint8)
+        px= pygame.surfarray.pixels3d(screen)
+        for ox, oy in ((0,0),(1,0),(0,1),(1,1)):
+            px[sx+ ox, sy+ oy]= rgb
+        del px
+
+
+############################################################
+# CHECK AND BENCHMARK
+############################################################
+
+def trace_direct(g_m, radius, lethal, x, y, dx, dy, length, ds=None):
+    """One ray integrated step by step through one attractor at the origin (no wrap)."""
+    R= float(radius)
+    g= LIGHT_G* g_m/ (PULSE_SPEED* PULSE_SPEED)
+    ds= ds or R/ (4*STEPS_R)
+    c= math.atan2(dy, dx)
+    x= np.array([float(x)]); y= np.array([float(y)]); c= np.array([c])
+    s= 0.0
+    while s< length:
+        k1= _curvature(x, y, c, g, R*R)
+        cm= c+ 0.5*ds* k1
+        k2= _curvature(x+ 0.5*ds*np.cos(c), y+ 0.5*ds*np.sin(c), cm, g, R*R)
+        x= x+ ds* np.cos(cm)
+        y= y+ ds* np.sin(cm)
+        c= c+ ds* k2
+        s+= ds
+        if x[0]*x[0]+ y[0]*y[0]<= lethal*lethal:
+            return None
+    return float(x[0]), float(y[0])
+
+def check(n=200, seed=0, g_m=150000.0, radius=800.0, lethal=200.0, ticks=30):
+    """
+    Fires n random rays at one attractor, each through a PulseField and by
+    direct integration at a finer step, and returns the median and 90th
+    percentile distance between where they end up (rays neither captured),
+    and how many rays the two disagree on capturing.
+    """
+    w= h= 20000.0      # big enough that nothing wraps
+    tabs= {k: v[None] for k, v in build_table(g_m, radius, lethal).items()}
+    tabs['which']= np.zeros(1, np.intp)
+    tabs['params']= np.array([[w/2, h/2, radius, lethal]])
+    rng= np.random.default_rng(seed)
+    a= rng.uniform(0, 2*math.pi, n)
+    d= rng.uniform(lethal+ 50, 2*radius, n)
+    heading= a+ math.pi+ rng.uniform(-0.6, 0.6, n)
+    T= 3*radius/ PULSE_SPEED
+    errs= []
+    disagree= 0
+    for i in range(n):
+        x0= d[i]* math.cos(a[i]); y0= d[i]* math.sin(a[i])
+        field= PulseField(tabs, w, h)
+        field.emit(x0+ w/2, y0+ h/2, heading[i], 1)
+        for _ in range(ticks):
+            field.step(T/ ticks)
+        ref= trace_direct(g_m, radius, lethal, x0, y0, math.cos(heading[i]), math.sin(heading[i]),
+                          PULSE_SPEED* T)
+        if (ref is None)!= (len(field)== 0):
+            disagree+= 1
+        elif ref is not None:
+            errs.append(math.hypot(field.rays['x'][0]- w/2- ref[0], field.rays['y'][0]- h/2- ref[1]))
+    errs= np.array(errs)
+    return float(np.median(errs)), float(np.percentile(errs, 90)), disagree
+
+def bench(n=PULSE_MAX, ticks=200):
+    tabs= load_tables([(5000.0, 5000.0, 150000.0, 800.0, 200.0)])
+    field= PulseField(tabs, 10000.0, 10000.0, life=1e9, cap=n)
+    while len(field)< n:
+        field.emit(5000.0, 3500.0, math.radians(90), 1024, math.radians(120))
+    t0= time.perf_counter()
+    for _ in range(ticks):
+        field.step(0.1)
+    return n* ticks/ (time.perf_counter()- t0)
+
+
+if __name__=="__main__":
+    if len(sys.argv)>= 2 and sys.argv[1]== "check":
+        med, p90, bad= check()
+        print("table vs direct integration: end points %.1f apart (median), %.1f (p90); %d rays captured by one only"
+              % (med, p90, bad))
+    elif len(sys.argv)>= 2 and sys.argv[1]== "bench":
+        t0= time.perf_counter()
+        build_table(150000.0, 800.0, 200.0)
+        print("table build %.2f s" % (time.perf_counter()- t0))
+        print("%.0f ray ticks/s" % bench())
+    else:
+        print("usage: lightpulse.py check | bench")
+        sys.exit(2)
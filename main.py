@@ -1,6 +1,21 @@
-import math, random, sys
+import argparse, asyncio, math, os, random, sys, time, zlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pygame
 
+import capture
+import kernels
+import levelcache
+import lightpulse
+import net
+from lensing import GravLens, LENS_RADIUS
+from fieldview import FieldOverlay
+from minimap import Minimap
+from trails import Trails
+from hud import Hud
+from quality import QUALITY_TIERS, QualityController, tier_by_name
+import telemetry
+
 ############################################################
 # GLOBAL CONSTANTS
 ############################################################
@@ -18,25 +33,230 @@ WORLD_HEIGHT  = 10000
 TOOLS         = ["Gun","LightPulse","Bomb","ForceField"]
 ROCKET_RAD    = 20
 
+LEVEL_SEED    = 1          # default seed: same stars every launch, so the cache hits
+LEVEL_CACHE_DIR = os.environ.get(
+    "SPACE_FORCE_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "space-force"))
+LEVEL_CACHE_VERSION = 1    # bump when generation changes
+
+############################################################
+# ASTEROID FIELD
+############################################################
+
+class AsteroidField:
+    """
+    All asteroids of a level as parallel NumPy arrays (struct of arrays).
+    Spots are stored flat; asteroid i owns spots
+    spot_start[i] .. spot_start[i]+spot_count[i].
+    """
+    STATE = ('x','y','vx','vy')
+    ARRAYS= ('x','y','vx','vy','radius','grey',
+             'spot_start','spot_count','spot_ox','spot_oy','spot_r','spot_c')
+
+    def __init__(self, **arrays):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.mass= self.radius
+        # collision category and mask per body (see COLLISION_RULES)
+        n= len(self.x)
+        self.cat= np.full(n, CAT_ASTEROID, np.uint8)
+        self.mask= np.full(n, COLLISION_MASK[CAT_ASTEROID], np.uint8)
+        # the broadphase's last cell grid (nx, ny, order, ends), see field_near
+        self.grid= None
+
+    def __len__(self):
+        return len(self.x)
+
+    def layers(self):
+        """(cat, mask) shared by every body, or None if they differ."""
+        if not len(self.x):
+            return (CAT_ASTEROID, COLLISION_MASK[CAT_ASTEROID])
+        c= self.cat
+        m= self.mask
+        if c.min()== c.max() and m.min()== m.max():
+            return (int(c[0]), int(m[0]))
+        return None
+
+    @classmethod
+    def generate(cls, rng, n, w, h, r_lo, r_hi, v=50.0):
+        radius= rng.uniform(r_lo, r_hi, n)
+        grey= rng.integers(100, 201, n).astype(np.uint8)
+        x= rng.uniform(0, w, n)
+        y= rng.uniform(0, h, n)
+        vx= rng.uniform(-v, v, n)
+        vy= rng.uniform(-v, v, n)
+        # add random 'spots'
+        spot_count= rng.integers(2, 6, n).astype(np.int32)
+        spot_start= np.zeros(n, np.int32)
+        if n:
+            np.cumsum(spot_count[:-1], out=spot_start[1:])
+        owner_r= np.repeat(radius, spot_count)
+        m= len(owner_r)
+        spot_r= (owner_r* rng.uniform(0.1, 0.3, m)).astype(np.float32)
+        off_angle= rng.random(m)* 2*math.pi
+        off_dist= owner_r* 0.5* rng.random(m)
+        return cls(
+            x=x, y=y, vx=vx, vy=vy, radius=radius, grey=grey,
+            spot_start=spot_start, spot_count=spot_count,
+            spot_ox=(off_dist*np.cos(off_angle)).astype(np.float32),
+            spot_oy=(off_dist*np.sin(off_angle)).astype(np.float32),
+            spot_r=spot_r,
+            spot_c=rng.integers(50, 101, m).astype(np.uint8),
+        )
+
+    @classmethod
+    def empty(cls):
+        return cls.generate(np.random.default_rng(0), 0, 1, 1, 1, 1)
+
+    def to_arrays(self, prefix="ast_"):
+        return {prefix+ name: getattr(self, name) for name in self.ARRAYS}
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix="ast_"):
+        # the motion state is mutated every tick, so it must not stay a
+        # read-only view into a memory-mapped cache file
+        out= {}
+        for name in cls.ARRAYS:
+            a= arrays[prefix+ name]
+            # plain ndarray views: indexing a memmap subclass is slow
+            out[name]= np.array(a) if name in cls.STATE else a.view(np.ndarray)
+        return cls(**out)
+
 ############################################################
 # LEVEL BASE CLASSES
 ############################################################
 
+def make_stars(rng, n, w, h):
+    return {
+        'x': rng.uniform(0, w, n),
+        'y': rng.uniform(0, h, n),
+        'bri': rng.integers(100, 221, n).astype(np.uint8),
+    }
+
+def point_mass_accel(x, y, cx, cy, g_m, g_range):
+    """force_func of a single attractor, over arrays of positions."""
+    dx= x- cx
+    dy= y- cy
+    r2= dx*dx+ dy*dy
+    r= np.sqrt(r2)
+    on= (r< g_range) & (r>= 1e-3)
+    # a_mag*(dx/r) = G_M*dx/r^3
+    k= np.where(on, g_m/ np.where(on, r2*r, 1.0), 0.0)
+    return -k*dx, -k*dy
+
 class LevelBase:
-    def __init__(self):
+    MAP_COLOR= (255,200,120)
+    DRIFT= False    # asteroids move under gravity each tick (advance_field)
+    AUTOPILOT_GOAL= "orbit"    # what P flies to (Autopilot)...
+    AUTOPILOT_ORBIT= None      # ...and the orbit's radius, if not the Autopilot default
+
+    def __init__(self, seed=None):
         self.WORLD_WIDTH  = WORLD_WIDTH
         self.WORLD_HEIGHT = WORLD_HEIGHT
-        self.asteroids    = []
+        self.seed         = LEVEL_SEED if seed is None else seed
+        self.asteroids    = AsteroidField.empty()
+        self.quality      = QUALITY_TIERS[0]
+
+    def set_quality(self, tier):
+        # a QUALITY_TIERS entry; read by draw_background
+        self.quality= tier
 
     def force_func(self, x, y, vx, vy):
         return (0.0, 0.0)
 
+    def force_array(self, x, y):
+        # force_func for arrays of positions; the fields here ignore velocity
+        return np.zeros(np.shape(x)), np.zeros(np.shape(y))
+
+    def force_into(self, x, y, ax, ay):
+        # force_array written into ax, ay
+        ax[:], ay[:]= self.force_array(x, y)
+
+    def attractors(self):
+        # fixed masses as (cx, cy, G_M, GRAVITY_RANGE, lethal radius)
+        return []
+
+    def attractor_table(self):
+        # attractors() as the (k, 4) array the kernels take, or None if
+        # force_array is something other than their summed pull
+        t= self.__dict__.get('_attr_table')
+        if t is None:
+            t= np.array([a[:4] for a in self.attractors()], float).reshape(-1, 4)
+            self._attr_table= t
+        return t
+
+    def field_schedule(self):
+        # the FieldSchedule of the current asteroids; a reset makes new ones
+        s= self.__dict__.get('_schedule')
+        if s is None or s.field is not self.asteroids:
+            s= FieldSchedule(self.asteroids)
+            self._schedule= s
+        return s
+
+    def light_tables(self):
+        # LightPulse deflection tables for attractors(), cached beside the level
+        t= self.__dict__.get('_light_tables')
+        if t is None:
+            t= lightpulse.load_tables(self.attractors(), LEVEL_CACHE_DIR)
+            self._light_tables= t
+        return t
+
     def lethal_check(self, x, y):
         return False
 
-    def draw_background(self, screen, rocket, cam_x, cam_y):
+    def lethal_array(self, x, y):
+        # lethal_check for arrays of positions
+        out= np.zeros(np.shape(x), bool)
+        for (cx, cy, _gm, _rng, lethal) in self.attractors():
+            dx= x- cx
+            dy= y- cy
+            out|= dx*dx+ dy*dy< lethal*lethal
+        return out
+
+    def spawn_point(self):
+        return (self.WORLD_WIDTH/2, self.WORLD_HEIGHT/2)
+
+    def draw_background(self, screen, rocket, cam_x, cam_y, scale=1.0, zoom=1.0):
+        # scale: screen pixels per world unit, below 1 when rendering small
+        # or zoomed out; zoom: the camera's part of it, for parallax
         screen.fill((0,0,0))
 
+    def prewarm(self, screen):
+        # build the render caches the first frame would, at full quality;
+        # called off the main thread by LevelPreloader
+        pass
+
+    # generated assets: built once per seed with NumPy, then cached on
+    # disk and memory-mapped on later launches
+
+    def _build_assets(self, rng):
+        return {}
+
+    def _use_assets(self, assets):
+        pass
+
+    def _cache_stem(self):
+        return type(self).__name__
+
+    def _cache_path(self):
+        if not LEVEL_CACHE_DIR:
+            return None
+        name= "%s-%d-%dx%d-v%d.lvl" % (
+            self._cache_stem(), self.seed, self.WORLD_WIDTH, self.WORLD_HEIGHT, LEVEL_CACHE_VERSION)
+        return os.path.join(LEVEL_CACHE_DIR, name)
+
+    def _init_assets(self):
+        path= self._cache_path()
+        assets= levelcache.load_arrays(path) if path else None
+        if assets is None:
+            assets= self._build_assets(np.random.default_rng(self.seed))
+            if path:
+                levelcache.save_arrays(path, assets)
+        self._use_assets(assets)
+
+    def reset_asteroids(self):
+        # a restart gets fresh asteroids; the stars stay
+        self.asteroids= self._create_asteroids(np.random.default_rng())
+
 ############################################################
 # LEVEL FLAT
 ############################################################
@@ -45,115 +265,109 @@ class LevelFlat(LevelBase):
     """
     A simple level with no gravity and multiple star-layers.
     """
-    def __init__(self):
-        super().__init__()
-        self.star_layers = self._create_star_layers()
-        self.asteroids   = self._create_asteroids()
-
-    def _create_star_layers(self):
+    STAR_LAYERS= [(7000,0.1),(6000,0.2),(5500,0.6),(5000,0.9)]
+
+    def __init__(self, seed=None):
+        super().__init__(seed)
+        self._init_assets()
+
+    def _build_assets(self, rng):
+        assets= {}
+        for i, layer in enumerate(self._create_star_layers(rng)):
+            for k in ('x','y','bri'):
+                assets["layer%d_%s" % (i,k)]= layer['stars'][k]
+        assets.update(self._create_asteroids(rng).to_arrays())
+        return assets
+
+    def _use_assets(self, assets):
+        self.star_layers= [
+            {'stars': {k: assets["layer%d_%s" % (i,k)] for k in ('x','y','bri')}, 'parallax': px}
+            for i, (_n, px) in enumerate(self.STAR_LAYERS)
+        ]
+        self.asteroids= AsteroidField.from_arrays(assets)
+
+    def _create_star_layers(self, rng):
         layers = []
-        for (n,px) in [(7000,0.1),(6000,0.2),(5500,0.6),(5000,0.9)]:
-            stars = []
-            for _ in range(n):
-                sx  = random.uniform(0,self.WORLD_WIDTH)
-                sy  = random.uniform(0,self.WORLD_HEIGHT)
-                bri = random.randint(100,220)
-                stars.append({'x':sx,'y':sy,'color':(bri,bri,bri)})
+        for (n,px) in self.STAR_LAYERS:
+            stars= make_stars(rng, n, self.WORLD_WIDTH, self.WORLD_HEIGHT)
             layers.append({'stars': stars, 'parallax': px})
         return layers
 
-    def _create_asteroids(self):
-        asts=[]
-        for _ in range(0):
-            r = random.uniform(15,35)
-            grey= random.randint(100,200)
-            asteroid = {
-                'x': random.uniform(0,self.WORLD_WIDTH),
-                'y': random.uniform(0,self.WORLD_HEIGHT),
-                'vx': random.uniform(-50,50),
-                'vy': random.uniform(-50,50),
-                'radius':r,
-                'mass':r,
-                'color':(grey,grey,grey)
-            }
-            # add random 'spots'
-            spots = []
-            num_spots = random.randint(2,5)
-            for _s in range(num_spots):
-                spot_rad = r*random.uniform(0.1,0.3)
-                off_angle = random.random()*2*math.pi
-                off_dist = r*0.5*random.random()
-                offx = off_dist*math.cos(off_angle)
-                offy = off_dist*math.sin(off_angle)
-                cvar = random.randint(50,100)
-                c = (cvar,cvar,cvar)
-                spots.append({'ox':offx,'oy':offy,'r':spot_rad,'c':c})
-            asteroid['spots'] = spots
-            asts.append(asteroid)
-        return asts
-
-    def draw_background(self, screen, rocket, cam_x, cam_y):
+    def _create_asteroids(self, rng):
+        return AsteroidField.generate(rng, 0, self.WORLD_WIDTH, self.WORLD_HEIGHT, 15, 35)
+
+    def draw_background(self, screen, rocket, cam_x, cam_y, scale=1.0, zoom=1.0):
         screen.fill((0,0,0))
-        for layer in self.star_layers:
+        # lower tiers drop the far layers first
+        q= self.quality
+        base= scale/ zoom
+        for layer in self.star_layers[-q['star_layers']:]:
             px= layer['parallax']
-            for st in layer['stars']:
-                draw_object_tiled(
-                    screen, st['x'], st['y'], cam_x*px, cam_y*px,
-                    st['color'], "star", 1
-                )
+            if zoom== 1.0:
+                draw_stars(screen, layer['stars'], cam_x*px, cam_y*px, q['star_frac'], scale)
+                continue
+            # a layer zooms by zoom**parallax, about the view centre
+            ls= base* zoom**px
+            cx= cam_x+ screen.get_width()/ (2*scale)
+            cy= cam_y+ screen.get_height()/ (2*scale)
+            lx= cx*px- screen.get_width()/ (2*ls)
+            ly= cy*px- screen.get_height()/ (2*ls)
+            draw_stars(screen, layer['stars'], lx, ly, q['star_frac'], ls)
 
 ############################################################
 # LEVEL STAR
 ############################################################
 
+CORONA_CACHE= 8    # scaled coronas kept; zoom snaps, so only a few are in use
+
 class LevelStar(LevelBase):
     STAR_RADIUS_LETHAL=200
     GRAVITY_RANGE=800
     G_M=30000
-    def __init__(self):
-        super().__init__()
+    CORONA_RADIUS=600
+    def __init__(self, seed=None):
+        super().__init__(seed)
         self.STAR_CX= self.WORLD_WIDTH/2
         self.STAR_CY= self.WORLD_HEIGHT/2
-        self.star_list = self._create_far_stars()
-        self.asteroids = self._create_asteroids()
-
-    def _create_far_stars(self):
-        s_list=[]
-        for _ in range(800):
-            sx= random.uniform(0,self.WORLD_WIDTH)
-            sy= random.uniform(0,self.WORLD_HEIGHT)
-            bri= random.randint(100,220)
-            s_list.append({'x':sx,'y':sy,'color':(bri,bri,bri)})
-        return s_list
-
-    def _create_asteroids(self):
-        asts=[]
-        for _ in range(20):
-            r = random.uniform(10,25)
-            grey= random.randint(100,200)
-            asteroid = {
-                'x': random.uniform(0,self.WORLD_WIDTH),
-                'y': random.uniform(0,self.WORLD_HEIGHT),
-                'vx': random.uniform(-50,50),
-                'vy': random.uniform(-50,50),
-                'radius':r,
-                'mass':r,
-                'color':(grey,grey,grey)
-            }
-            spots = []
-            num_spots = random.randint(2,5)
-            for _s in range(num_spots):
-                spot_rad = r*random.uniform(0.1,0.3)
-                off_angle = random.random()*2*math.pi
-                off_dist = r*0.5*random.random()
-                offx = off_dist*math.cos(off_angle)
-                offy = off_dist*math.sin(off_angle)
-                cvar = random.randint(50,100)
-                c = (cvar,cvar,cvar)
-                spots.append({'ox':offx,'oy':offy,'r':spot_rad,'c':c})
-            asteroid['spots'] = spots
-            asts.append(asteroid)
-        return asts
+        self._init_assets()
+
+    def _build_assets(self, rng):
+        assets= {}
+        for k, v in self._create_far_stars(rng).items():
+            assets["stars_"+ k]= v
+        assets.update(self._create_asteroids(rng).to_arrays())
+        assets['corona']= self._render_corona()
+        return assets
+
+    def _use_assets(self, assets):
+        self.star_list= {k: assets["stars_"+ k] for k in ('x','y','bri')}
+        self.asteroids= AsteroidField.from_arrays(assets)
+        h, w, _c= assets['corona'].shape
+        self.corona= pygame.image.frombuffer(assets['corona'], (w, h), "RGB")
+        self._coronas= {}          # (radius, scale) -> display-format surface
+
+    def _create_far_stars(self, rng):
+        return make_stars(rng, 800, self.WORLD_WIDTH, self.WORLD_HEIGHT)
+
+    def _create_asteroids(self, rng):
+        return AsteroidField.generate(rng, 20, self.WORLD_WIDTH, self.WORLD_HEIGHT, 10, 25)
+
+    def _render_corona(self, max_r=None, step=10):
+        # the concentric corona circles, drawn once; rows x cols x RGB
+        if max_r is None:
+            max_r= self.CORONA_RADIUS
+        srf= pygame.Surface((2*max_r, 2*max_r))
+        srf.fill((0,0,0))
+        c= (max_r, max_r)
+        for rr in range(int(max_r), self.STAR_RADIUS_LETHAL, -step):
+            frac= (rr- self.STAR_RADIUS_LETHAL)/(max_r- self.STAR_RADIUS_LETHAL)
+            frac= max(0,min(1,frac))
+            rred= int(255*(1-frac))
+            ggrn= int(255*((1-frac)**2))
+            bblu= int(255*((1-frac)**2))
+            pygame.draw.circle(srf,(rred,ggrn,bblu),c, rr)
+        pygame.draw.circle(srf,(255,255,255),c, self.STAR_RADIUS_LETHAL)
+        return np.ascontiguousarray(pygame.surfarray.array3d(srf).transpose(1,0,2))
 
     def force_func(self, x, y, vx, vy):
         dx= x- self.STAR_CX
@@ -167,83 +381,116 @@ class LevelStar(LevelBase):
         ay= -a_mag*(dy/r)
         return (ax,ay)
 
+    def force_array(self, x, y):
+        return point_mass_accel(x, y, self.STAR_CX, self.STAR_CY, self.G_M, self.GRAVITY_RANGE)
+
+    def attractors(self):
+        return [(self.STAR_CX, self.STAR_CY, self.G_M, self.GRAVITY_RANGE, self.STAR_RADIUS_LETHAL)]
+
     def lethal_check(self, x, y):
         dx= x- self.STAR_CX
         dy= y- self.STAR_CY
         return (dx*dx+ dy*dy) < (self.STAR_RADIUS_LETHAL*self.STAR_RADIUS_LETHAL)
 
-    def draw_background(self, screen, rocket, cam_x, cam_y):
+    def spawn_point(self):
+        return (self.WORLD_WIDTH/2, self.WORLD_HEIGHT/2+2000)
+
+    def _corona_for(self, max_r, scale=1.0):
+        srf= self._coronas.get((max_r, scale))
+        if srf is None:
+            if len(self._coronas)>= CORONA_CACHE:
+                self._coronas.clear()
+            if max_r== self.CORONA_RADIUS:
+                srf= self.corona
+            else:
+                # a smaller glow with fewer rings for the lower tiers
+                arr= self._render_corona(max_r, step=20)
+                srf= pygame.image.frombuffer(arr.tobytes(), (2*max_r, 2*max_r), "RGB")
+            if scale!= 1.0:
+                d= max(1, int(round(2*max_r*scale)))
+                srf= pygame.transform.smoothscale(srf, (d, d))
+            # match the display format once, so the blit is a plain copy
+            if pygame.display.get_surface():
+                srf= srf.convert()
+            self._coronas[(max_r, scale)]= srf
+        return srf
+
+    def prewarm(self, screen):
+        self._corona_for(max(self.quality['corona'], self.STAR_RADIUS_LETHAL))
+
+    def draw_background(self, screen, rocket, cam_x, cam_y, scale=1.0, zoom=1.0):
         screen.fill((0,0,0))
-        sx= self.STAR_CX- cam_x
-        sy= self.STAR_CY- cam_y
-        max_r=600
-        step=10
-        for rr in range(int(max_r), self.STAR_RADIUS_LETHAL, -step):
-            frac= (rr- self.STAR_RADIUS_LETHAL)/(max_r- self.STAR_RADIUS_LETHAL)
-            frac= max(0,min(1,frac))
-            rred= int(255*(1-frac))
-            ggrn= int(255*((1-frac)**2))
-            bblu= int(255*((1-frac)**2))
-            pygame.draw.circle(screen,(rred,ggrn,bblu),(int(sx),int(sy)), rr)
-        pygame.draw.circle(screen,(255,255,255),(int(sx),int(sy)), self.STAR_RADIUS_LETHAL)
-        for st in self.star_list:
-            draw_object_tiled(
-                screen, st['x'], st['y'], cam_x*0, cam_y*0,
-                st['color'], "star", 1
-            )
+        sx= (self.STAR_CX- cam_x)*scale
+        sy= (self.STAR_CY- cam_y)*scale
+        q= self.quality
+        max_r= max(q['corona'], self.STAR_RADIUS_LETHAL)
+        if max_r> self.STAR_RADIUS_LETHAL:
+            srf= self._corona_for(max_r, scale)
+            half= srf.get_width()//2
+            screen.blit(srf,(int(sx)-half,int(sy)-half))
+        else:
+            pygame.draw.circle(screen,(255,255,255),(int(sx),int(sy)), int(self.STAR_RADIUS_LETHAL*scale))
+        # far stars: fixed to the screen, so not zoomed
+        draw_stars(screen, self.star_list, cam_x*0, cam_y*0, q['star_frac'], scale/ zoom)
 
 ############################################################
 # LEVEL BLACK HOLE
 ############################################################
 
+LENS_CACHE= 2      # lenses kept; a lens is several MB and 5-70 ms to build
+
 class LevelBlackHole(LevelBase):
+    MAP_COLOR=(150,80,200)
+    AUTOPILOT_GOAL= "escape"
     STAR_RADIUS_LETHAL=200
     GRAVITY_RANGE=800
     G_M=150000
-    def __init__(self):
-        super().__init__()
+    def __init__(self, seed=None):
+        super().__init__(seed)
         self.HOLE_CX= self.WORLD_WIDTH/2
         self.HOLE_CY= self.WORLD_HEIGHT/2
-        self.star_list= self._create_far_stars()
-        self.asteroids= self._create_asteroids()
-
-    def _create_far_stars(self):
-        s_list=[]
-        for _ in range(800):
-            sx= random.uniform(0,self.WORLD_WIDTH)
-            sy= random.uniform(0,self.WORLD_HEIGHT)
-            bri= random.randint(100,220)
-            s_list.append({'x':sx,'y':sy,'color':(bri,bri,bri)})
-        return s_list
-
-    def _create_asteroids(self):
-        asts=[]
-        for _ in range(20):
-            r = random.uniform(10,25)
-            grey= random.randint(100,200)
-            asteroid = {
-                'x': random.uniform(0,self.WORLD_WIDTH),
-                'y': random.uniform(0,self.WORLD_HEIGHT),
-                'vx': random.uniform(-50,50),
-                'vy': random.uniform(-50,50),
-                'radius':r,
-                'mass':r,
-                'color':(grey,grey,grey)
-            }
-            spots = []
-            num_spots = random.randint(2,5)
-            for _s in range(num_spots):
-                spot_rad = r*random.uniform(0.1,0.3)
-                off_angle = random.random()*2*math.pi
-                off_dist = r*0.5*random.random()
-                offx = off_dist*math.cos(off_angle)
-                offy = off_dist*math.sin(off_angle)
-                cvar = random.randint(50,100)
-                c = (cvar,cvar,cvar)
-                spots.append({'ox':offx,'oy':offy,'r':spot_rad,'c':c})
-            asteroid['spots'] = spots
-            asts.append(asteroid)
-        return asts
+        self._init_assets()
+
+    def _build_assets(self, rng):
+        assets= {}
+        for k, v in self._create_far_stars(rng).items():
+            assets["stars_"+ k]= v
+        assets.update(self._create_asteroids(rng).to_arrays())
+        return assets
+
+    def _use_assets(self, assets):
+        self.star_list= {k: assets["stars_"+ k] for k in ('x','y','bri')}
+        self.asteroids= AsteroidField.from_arrays(assets)
+        self._lenses= {}           # (size, scale, star scale) -> GravLens
+
+    def _create_far_stars(self, rng):
+        return make_stars(rng, 800, self.WORLD_WIDTH, self.WORLD_HEIGHT)
+
+    def _create_asteroids(self, rng):
+        return AsteroidField.generate(rng, 20, self.WORLD_WIDTH, self.WORLD_HEIGHT, 10, 25)
+
+    def _lens_for(self, screen, scale=1.0, star_scale=None):
+        # the stars sit at fixed screen positions (parallax 0), so the
+        # unlensed background is drawn once into the lens's padded surface;
+        # at a smaller render scale every length in the lens shrinks with it
+        if star_scale is None:
+            star_scale= scale
+        key= (screen.get_size(), scale, star_scale)
+        lens= self._lenses.get(key)
+        if lens is None:
+            if len(self._lenses)>= LENS_CACHE:
+                self._lenses.pop(next(iter(self._lenses)))
+            lens= GravLens(screen, self.G_M*scale*scale, self.STAR_RADIUS_LETHAL*scale, LENS_RADIUS*scale)
+            lens.bg.fill((0,0,0))
+            m= lens.margin/ star_scale
+            draw_stars(lens.bg, self.star_list, -m, -m, 1.0, star_scale)
+            lens.refresh()
+            self._lenses[key]= lens
+        return lens
+
+    def prewarm(self, screen):
+        if self.quality['lensing']:
+            self._lens_for(screen)
 
     def force_func(self, x, y, vx, vy):
         dx= x- self.HOLE_CX
@@ -257,21 +504,430 @@ class LevelBlackHole(LevelBase):
         ay= -a_mag*(dy/r)
         return (ax,ay)
 
+    def force_array(self, x, y):
+        return point_mass_accel(x, y, self.HOLE_CX, self.HOLE_CY, self.G_M, self.GRAVITY_RANGE)
+
+    def attractors(self):
+        return [(self.HOLE_CX, self.HOLE_CY, self.G_M, self.GRAVITY_RANGE, self.STAR_RADIUS_LETHAL)]
+
     def lethal_check(self, x, y):
         dx= x- self.HOLE_CX
         dy= y- self.HOLE_CY
         return (dx*dx+ dy*dy) < (self.STAR_RADIUS_LETHAL*self.STAR_RADIUS_LETHAL)
 
-    def draw_background(self, screen, rocket, cam_x, cam_y):
+    def spawn_point(self):
+        return (self.WORLD_WIDTH/2, self.WORLD_HEIGHT/2+2000)
+
+    def draw_background(self, screen, rocket, cam_x, cam_y, scale=1.0, zoom=1.0):
+        sx= (self.HOLE_CX- cam_x)*scale
+        sy= (self.HOLE_CY- cam_y)*scale
+        base= scale/ zoom
+        if self.quality['lensing']:
+            # zoomed, the lens is built for the nearest half octave: close
+            # enough for the eye, and only a handful of lenses ever get built
+            band= 2.0** (round(2* math.log2(zoom))/ 2)
+            self._lens_for(screen, base* band, base).draw(screen, sx, sy)
+        else:
+            screen.fill((0,0,0))
+            draw_stars(screen, self.star_list, 0, 0, self.quality['star_frac'], base)
+        pygame.draw.circle(screen,(0,0,0),(int(sx),int(sy)), int(self.STAR_RADIUS_LETHAL*scale))
+
+############################################################
+# LEVEL BELT
+############################################################
+
+BELT_COUNT= 5000
+BELT_MIN  = 1000     # --belt-count range; asteroid ids (ASTEROID_ID_BASE up)
+BELT_MAX  = 50000    # must also fit net.ENTITY_ID_MAX
+
+class LevelBelt(LevelBase):
+    """
+    A dense asteroid belt orbiting a planet: the stress level for the
+    collision, gravity and asteroid drawing paths. The asteroids start on
+    near-circular orbits and drift under gravity every tick.
+
+    Target times on one core (physics tick = gravity + rocket and asteroid
+    collisions, frame = tick + drawing at 1800x1000, high quality):
+        1,000 asteroids    tick < 1.5 ms   frame < 8 ms
+        5,000 asteroids    tick < 5 ms     frame < 16.7 ms (60 FPS)
+       20,000 asteroids    tick < 16 ms    frame < 33 ms (30 FPS)
+       50,000 asteroids    tick < 40 ms    frame < 66 ms (15 FPS)
+    --headless TICKS --belt-count N reports the tick times.
+    """
+    MAP_COLOR=(120,170,255)
+    DRIFT= True
+    PLANET_RADIUS_LETHAL=250
+    GRAVITY_RANGE=4500
+    G_M=7.2e6            # circular speed ~60 at r=2000
+    BELT_INNER=1300
+    BELT_OUTER=2700
+    AUTOPILOT_ORBIT=3300    # clear of the belt, through the spawn point
+    def __init__(self, seed=None, count=BELT_COUNT):
+        super().__init__(seed)
+        self.count= int(count)
+        self.CX= self.WORLD_WIDTH/2
+        self.CY= self.WORLD_HEIGHT/2
+        self._init_assets()
+
+    def _cache_stem(self):
+        return "%s%d" % (type(self).__name__, self.count)
+
+    def _build_assets(self, rng):
+        assets= {}
+        for k, v in self._create_far_stars(rng).items():
+            assets["stars_"+ k]= v
+        assets.update(self._create_asteroids(rng).to_arrays())
+        return assets
+
+    def _use_assets(self, assets):
+        self.star_list= {k: assets["stars_"+ k] for k in ('x','y','bri')}
+        self.asteroids= AsteroidField.from_arrays(assets)
+
+    def _create_far_stars(self, rng):
+        return make_stars(rng, 800, self.WORLD_WIDTH, self.WORLD_HEIGHT)
+
+    def _create_asteroids(self, rng):
+        n= self.count
+        f= AsteroidField.generate(rng, n, self.WORLD_WIDTH, self.WORLD_HEIGHT, 4, 10)
+        # uniform over the annulus area, prograde circular speed with a
+        # little scatter so the belt isn't a rigid ring
+        r= np.sqrt(rng.uniform(self.BELT_INNER**2, self.BELT_OUTER**2, n))
+        a= rng.uniform(0, 2*math.pi, n)
+        v= np.sqrt(self.G_M/ r)* rng.normal(1.0, 0.02, n)
+        f.x[:]= self.CX+ r*np.cos(a)
+        f.y[:]= self.CY+ r*np.sin(a)
+        f.vx[:]= -v*np.sin(a)+ rng.normal(0, 1.5, n)
+        f.vy[:]=  v*np.cos(a)+ rng.normal(0, 1.5, n)
+        return f
+
+    def force_func(self, x, y, vx, vy):
+        dx= x- self.CX
+        dy= y- self.CY
+        r2= dx*dx+ dy*dy
+        r = math.sqrt(r2)
+        if r>= self.GRAVITY_RANGE or r< 1e-3:
+            return (0.0,0.0)
+        a_mag= self.G_M/r2
+        return (-a_mag*(dx/r), -a_mag*(dy/r))
+
+    def force_array(self, x, y):
+        return point_mass_accel(x, y, self.CX, self.CY, self.G_M, self.GRAVITY_RANGE)
+
+    def attractors(self):
+        return [(self.CX, self.CY, self.G_M, self.GRAVITY_RANGE, self.PLANET_RADIUS_LETHAL)]
+
+    def lethal_check(self, x, y):
+        dx= x- self.CX
+        dy= y- self.CY
+        return (dx*dx+ dy*dy) < (self.PLANET_RADIUS_LETHAL*self.PLANET_RADIUS_LETHAL)
+
+    def spawn_point(self):
+        return (self.CX, self.CY+ self.BELT_OUTER+ 600)
+
+    def draw_background(self, screen, rocket, cam_x, cam_y, scale=1.0, zoom=1.0):
         screen.fill((0,0,0))
-        sx= self.HOLE_CX- cam_x
-        sy= self.HOLE_CY- cam_y
-        pygame.draw.circle(screen,(0,0,0),(int(sx),int(sy)), self.STAR_RADIUS_LETHAL)
-        for st in self.star_list:
-            draw_object_tiled(
-                screen, st['x'], st['y'], cam_x*0.0, cam_y*0.0,
-                st['color'], "star", 1
-            )
+        draw_stars(screen, self.star_list, 0, 0, self.quality['star_frac'], scale/ zoom)
+        c= (int((self.CX- cam_x)*scale), int((self.CY- cam_y)*scale))
+        pygame.draw.circle(screen,(40,70,140), c, int(self.PLANET_RADIUS_LETHAL*scale))
+        pygame.draw.circle(screen,(90,140,220), c, int(self.PLANET_RADIUS_LETHAL*scale), max(1, int(6*scale)))
+
+############################################################
+# LEVEL SYSTEM
+############################################################
+
+SYSTEM_BODIES = 12       # fixed masses in a generated system
+GRID_CELL     = 25       # world units between acceleration grid nodes
+EXACT_FACTOR  = 3.0      # exact gravity within this many lethal radii of a source
+
+class LevelSystem(LevelBase):
+    """
+    A star system of many fixed masses, as (cx, cy, G_M, range, lethal)
+    tuples; by default a star and planets drawn from the seed.
+
+    Gravity comes from an acceleration grid over the wrapping world (each
+    source acts through its nearest image), built once per layout, cached
+    with the level, and sampled bilinearly. Near a source the 1/r^2 pull
+    is too steep for the grid, so each node within EXACT_FACTOR lethal radii
+    (plus two cells) of a source is tagged with it and also stores the pull
+    of every other source. A body in a cell whose four nodes share an owner
+    gets that grid plus the owner's exact pull. Either way the cost per
+    body is one grid lookup and at most one exact source, whatever the
+    number of sources.
+    """
+    MAP_COLOR=(255,220,150)
+    DRIFT= True
+    def __init__(self, seed=None, attractors=None):
+        super().__init__(seed)
+        if attractors is None:
+            attractors= self._generate_system(np.random.default_rng(self.seed))
+        half= min(self.WORLD_WIDTH, self.WORLD_HEIGHT)/2
+        self.sources= [(float(cx)% self.WORLD_WIDTH, float(cy)% self.WORLD_HEIGHT,
+                        float(gm), min(float(rng), half), float(lethal))
+                       for (cx, cy, gm, rng, lethal) in attractors]
+        self._src= np.array(self.sources, float).reshape(-1, 5)
+        self.nx= max(1, int(round(self.WORLD_WIDTH/ GRID_CELL)))
+        self.ny= max(1, int(round(self.WORLD_HEIGHT/ GRID_CELL)))
+        self.cell_w= self.WORLD_WIDTH/ self.nx
+        self.cell_h= self.WORLD_HEIGHT/ self.ny
+        # overlapping exact zones: a cell has one owner, so lethal checks
+        # go back to testing every source
+        pad= 2* math.hypot(self.cell_w, self.cell_h)
+        self._zones_apart= all(
+            math.hypot(*self._wrapped(a[0], a[1], b[0], b[1]))> EXACT_FACTOR*(a[4]+ b[4])+ 2*pad
+            for n, a in enumerate(self.sources) for b in self.sources[n+1:])
+        self._init_assets()
+
+    def _cache_stem(self):
+        # the layout is part of the key: custom attractors get their own file
+        return "%s-%08x-g%g-e%g" % (type(self).__name__, zlib.crc32(self._src.tobytes()), GRID_CELL, EXACT_FACTOR)
+
+    def _generate_system(self, rng):
+        w, h= self.WORLD_WIDTH, self.WORLD_HEIGHT
+        out= [(w/2, h/2, 4.0e6, 3500, 220)]
+        while len(out)< SYSTEM_BODIES:
+            cx, cy= rng.uniform(0, w), rng.uniform(0, h)
+            lethal= rng.uniform(50, 120)
+            # keep the planets' lethal zones well apart
+            if any(math.hypot(cx- x, cy- y)< 6*(lethal+ l) for (x, y, _g, _r, l) in out):
+                continue
+            out.append((cx, cy, lethal**2* rng.uniform(20, 45), lethal* rng.uniform(10, 15), lethal))
+        return out
+
+    # gravity
+
+    def _wrapped(self, x, y, cx, cy):
+        # offset from the nearest image of (cx, cy)
+        w, h= self.WORLD_WIDTH, self.WORLD_HEIGHT
+        return (x- cx+ w/2)% w- w/2, (y- cy+ h/2)% h- h/2
+
+    def _exact(self, x, y, s):
+        cx, cy, g_m, g_range, _lethal= self._src[s]
+        dx, dy= self._wrapped(x, y, cx, cy)
+        return point_mass_accel(dx, dy, 0.0, 0.0, g_m, g_range)
+
+    def _build_grid(self):
+        gx, gy= np.meshgrid(np.arange(self.nx)* self.cell_w, np.arange(self.ny)* self.cell_h)
+        full_x= np.zeros(gx.shape); full_y= np.zeros(gx.shape)
+        owner= np.full(gx.shape, -1, np.int16)
+        own_x= np.zeros(gx.shape); own_y= np.zeros(gx.shape)
+        pad= 2* math.hypot(self.cell_w, self.cell_h)
+        for s, (cx, cy, _gm, _rng, lethal) in enumerate(self.sources):
+            ax, ay= self._exact(gx, gy, s)
+            full_x+= ax; full_y+= ay
+            dx, dy= self._wrapped(gx, gy, cx, cy)
+            near= dx*dx+ dy*dy< (EXACT_FACTOR* lethal+ pad)**2
+            owner[near]= s
+            own_x[near]= ax[near]; own_y[near]= ay[near]
+        return {
+            'grav_x': full_x.astype(np.float32), 'grav_y': full_y.astype(np.float32),
+            # the grid without the owner's own pull, for the tagged nodes
+            'near_x': (full_x- own_x).astype(np.float32), 'near_y': (full_y- own_y).astype(np.float32),
+            'node_owner': owner,
+        }
+
+    def _build_assets(self, rng):
+        assets= {}
+        for k, v in self._create_far_stars(rng).items():
+            assets["stars_"+ k]= v
+        assets.update(self._create_asteroids(rng).to_arrays())
+        assets.update(self._build_grid())
+        return assets
+
+    def _use_assets(self, assets):
+        self.star_list= {k: assets["stars_"+ k] for k in ('x','y','bri')}
+        self.asteroids= AsteroidField.from_arrays(assets)
+        for k in ('grav_x','grav_y','near_x','near_y'):
+            setattr(self, k, assets[k].view(np.ndarray))
+        # both grids per axis, each padded with a copy of its first row
+        # and column so the +1 neighbour of a node needs no wrap
+        def padded(full, near):
+            g= np.stack([full, near]).astype(np.float64)
+            g= np.concatenate([g, g[:, :, :1]], 2)
+            return np.concatenate([g, g[:, :1]], 1).ravel()
+        self._gx= padded(self.grav_x, self.near_x)
+        self._gy= padded(self.grav_y, self.near_y)
+        o= assets['node_owner'].view(np.ndarray)
+        # a cell is owned only if its four corner nodes agree
+        r= np.roll(o, -1, 1)
+        d= np.roll(o, -1, 0)
+        dr= np.roll(r, -1, 0)
+        self.cell_owner= np.where((o== r) & (o== d) & (o== dr), o, -1).astype(np.int16)
+        self._owner_list= self.cell_owner.ravel().tolist()
+        self._gx_list= self._gx.tolist()
+        self._gy_list= self._gy.tolist()
+
+    def _create_far_stars(self, rng):
+        return make_stars(rng, 800, self.WORLD_WIDTH, self.WORLD_HEIGHT)
+
+    def _create_asteroids(self, rng):
+        return AsteroidField.generate(rng, 300, self.WORLD_WIDTH, self.WORLD_HEIGHT, 8, 20)
+
+    def _cells(self, x, y):
+        # cell coordinates in the world, wrapped only if something is outside
+        x= np.asarray(x, float)
+        y= np.asarray(y, float)
+        if x.size and (x.min()< 0 or x.max()>= self.WORLD_WIDTH):
+            x= x% self.WORLD_WIDTH
+        if y.size and (y.min()< 0 or y.max()>= self.WORLD_HEIGHT):
+            y= y% self.WORLD_HEIGHT
+        fx= x* (1.0/ self.cell_w)
+        fy= y* (1.0/ self.cell_h)
+        i0= fx.astype(np.intp)
+        j0= fy.astype(np.intp)
+        tx= fx- i0
+        ty= fy- j0
+        return x, y, np.minimum(i0, self.nx- 1), np.minimum(j0, self.ny- 1), tx, ty
+
+    def force_array(self, x, y):
+        x= np.asarray(x, float)
+        y= np.asarray(y, float)
+        ax= np.empty(x.shape); ay= np.empty(x.shape)
+        self.force_into(x.ravel(), y.ravel(), ax.reshape(-1), ay.reshape(-1))
+        return ax, ay
+
+    def force_into(self, x, y, ax, ay):
+        # force_array on flat arrays into ax, ay; the per-body work arrays
+        # are kernels.scratch buffers, so a tick's lookups allocate nothing
+        # but for the bodies in an owned cell
+        n= len(x)
+        w, h= self.WORLD_WIDTH, self.WORLD_HEIGHT
+        if n and (x.min()< 0 or x.max()>= w):
+            x= np.remainder(x, w, out=kernels.scratch('ls_x', n))
+        if n and (y.min()< 0 or y.max()>= h):
+            y= np.remainder(y, h, out=kernels.scratch('ls_y', n))
+        tx= np.multiply(x, 1.0/ self.cell_w, out=kernels.scratch('ls_tx', n))
+        ty= np.multiply(y, 1.0/ self.cell_h, out=kernels.scratch('ls_ty', n))
+        t= kernels.scratch('ls_t', n)
+        i0= kernels.scratch('ls_i', n, np.intp); j0= kernels.scratch('ls_j', n, np.intp)
+        i0[:]= np.trunc(tx, out=t); tx-= t
+        j0[:]= np.trunc(ty, out=t); ty-= t
+        np.minimum(i0, self.nx- 1, out=i0)
+        np.minimum(j0, self.ny- 1, out=j0)
+        c= np.multiply(j0, self.nx, out=kernels.scratch('ls_c', n, np.intp))
+        c+= i0
+        owner= np.take(self.cell_owner, c, out=kernels.scratch('ls_owner', n, np.int16), mode='clip')
+        near= np.greater_equal(owner, 0, out=kernels.scratch('ls_near', n, np.bool_))
+        W= self.nx+ 1
+        np.multiply(j0, W, out=c)
+        c+= i0
+        # an owned cell reads the grid without its owner's pull
+        np.add(c, (self.ny+ 1)* W, out=i0)
+        np.copyto(c, i0, where=near)
+        w11= np.multiply(tx, ty, out=kernels.scratch('ls_w11', n))
+        w10= np.subtract(tx, w11, out=kernels.scratch('ls_w10', n))
+        w01= np.subtract(ty, w11, out=kernels.scratch('ls_w01', n))
+        w00= np.subtract(1.0, tx, out=tx)
+        w00-= w01
+        for g, a in ((self._gx, ax), (self._gy, ay)):
+            np.take(g, c, out=a, mode='clip')
+            a*= w00
+            for k, wk in ((1, w10), (W, w01), (W+ 1, w11)):
+                np.add(c, k, out=j0)
+                np.take(g, j0, out=t, mode='clip')
+                t*= wk
+                a+= t
+        if near.any():
+            idx= np.flatnonzero(near)
+            src= self._src[owner[idx]]
+            dx, dy= self._wrapped(x[idx], y[idx], src[:,0], src[:,1])
+            ex, ey= point_mass_accel(dx, dy, 0.0, 0.0, src[:,2], src[:,3])
+            ax[idx]+= ex
+            ay[idx]+= ey
+
+    def force_func(self, x, y, vx, vy):
+        # force_array for one body, on plain lists: numpy scalar indexing
+        # would cost more than the whole lookup
+        fx= (x% self.WORLD_WIDTH)/ self.cell_w
+        fy= (y% self.WORLD_HEIGHT)/ self.cell_h
+        i0= min(int(fx), self.nx- 1)
+        j0= min(int(fy), self.ny- 1)
+        tx= fx- i0
+        ty= fy- j0
+        s= self._owner_list[j0* self.nx+ i0]
+        W= self.nx+ 1
+        c= j0* W+ i0+ (s>= 0)* (self.ny+ 1)* W
+        w11= tx*ty; w10= tx- w11; w01= ty- w11; w00= 1.0- tx- w01
+        gx= self._gx_list; gy= self._gy_list
+        ax= gx[c]*w00+ gx[c+1]*w10+ gx[c+W]*w01+ gx[c+W+1]*w11
+        ay= gy[c]*w00+ gy[c+1]*w10+ gy[c+W]*w01+ gy[c+W+1]*w11
+        if s>= 0:
+            cx, cy, g_m, g_range, _lethal= self.sources[s]
+            dx, dy= self._wrapped(x, y, cx, cy)
+            r2= dx*dx+ dy*dy
+            r= math.sqrt(r2)
+            if 1e-3<= r< g_range:
+                k= g_m/ (r2*r)
+                ax-= k*dx
+                ay-= k*dy
+        return (ax, ay)
+
+    def attractors(self):
+        return list(self.sources)
+
+    def attractor_table(self):
+        # gravity is the grid, not the summed pull of attractors()
+        return None
+
+    def lethal_check(self, x, y):
+        # lethal zones lie inside owned cells, so one source to test
+        if not self._zones_apart:
+            return bool(LevelBase.lethal_array(self, np.array([x]), np.array([y]))[0])
+        i0= min(int((x% self.WORLD_WIDTH)/ self.cell_w), self.nx- 1)
+        j0= min(int((y% self.WORLD_HEIGHT)/ self.cell_h), self.ny- 1)
+        s= self._owner_list[j0* self.nx+ i0]
+        if s< 0:
+            return False
+        cx, cy, _gm, _rng, lethal= self.sources[s]
+        dx, dy= self._wrapped(x, y, cx, cy)
+        return dx*dx+ dy*dy< lethal*lethal
+
+    def lethal_array(self, x, y):
+        if not self._zones_apart:
+            return LevelBase.lethal_array(self, x, y)
+        x, y, i0, j0, _tx, _ty= self._cells(x, y)
+        owner= np.take(self.cell_owner, j0* self.nx+ i0)
+        out= np.zeros(np.shape(x), bool)
+        idx= np.flatnonzero(owner>= 0)
+        if len(idx):
+            src= self._src[owner.ravel()[idx]]
+            dx, dy= self._wrapped(x.ravel()[idx], y.ravel()[idx], src[:,0], src[:,1])
+            out.ravel()[idx]= dx*dx+ dy*dy< src[:,4]**2
+        return out
+
+    def spawn_point(self):
+        # the first grid node well clear of every source, scanning from
+        # below the centre
+        w, h= self.WORLD_WIDTH, self.WORLD_HEIGHT
+        for k in range(200):
+            x, y= w/2+ 37.0*k, h/2+ 0.4*h+ 53.0*k
+            if all(math.hypot(*self._wrapped(x, y, cx, cy))> max(3*lethal, 0.5*rng)
+                   for (cx, cy, _gm, rng, lethal) in self.sources):
+                return (x% w, y% h)
+        return (w/2, (h/2+ 0.4*h)% h)
+
+    def draw_background(self, screen, rocket, cam_x, cam_y, scale=1.0, zoom=1.0):
+        screen.fill((0,0,0))
+        draw_stars(screen, self.star_list, 0, 0, self.quality['star_frac'], scale/ zoom)
+        sw, sh= screen.get_size()
+        for (cx, cy, _gm, _rng, lethal) in self.sources:
+            # nearest image of the source relative to the view centre
+            dx, dy= self._wrapped(cx, cy, cam_x+ sw/(2*scale), cam_y+ sh/(2*scale))
+            sx= int(sw/2+ dx*scale)
+            sy= int(sh/2+ dy*scale)
+            r= int(lethal*scale)
+            if -r<= sx< sw+ r and -r<= sy< sh+ r:
+                pygame.draw.circle(screen,(200,160,90), (sx, sy), r)
+                pygame.draw.circle(screen,(255,220,150), (sx, sy), r, max(1, int(4*scale)))
+
+LEVELS= {"flat": LevelFlat, "star": LevelStar, "hole": LevelBlackHole, "belt": LevelBelt,
+        "system": LevelSystem}
+
+def make_level(level_name, seed=None, **kw):
+    # extra keywords go to the level (e.g. count= for the belt)
+    return LEVELS.get(level_name, LevelFlat)(seed, **kw)
+
+def level_options(level_name, belt_count=BELT_COUNT):
+    return {'count': belt_count} if level_name== "belt" else {}
 
 ############################################################
 # UTILITY
@@ -315,58 +971,1605 @@ def elastic_bounce(m1, m2, x1,y1, vx1,vy1, x2,y2, vx2,vy2, e=1.0):
         vy2 + impy/m2
     )
 
+# collision categories, one bit each; a body also carries a mask of the
+# categories it collides with, and a pair interacts only if each side's
+# category is in the other's mask
+CAT_ROCKET   = 1     # rocket, shield down
+CAT_SHIELD   = 2     # rocket, shield up
+CAT_ASTEROID = 4
+CAT_BULLET   = 8
+CAT_PULSE    = 16
+CAT_DEBRIS   = 32
+N_CATS       = 6
+
+# what happens when two categories touch
+ACT_NONE, ACT_BOUNCE, ACT_DAMAGE, ACT_GAME_OVER, ACT_TRIGGER = range(5)
+
+COLLISION_RULES= {
+    (CAT_ROCKET,   CAT_ROCKET):   ACT_GAME_OVER,
+    (CAT_ROCKET,   CAT_SHIELD):   ACT_GAME_OVER,
+    (CAT_ROCKET,   CAT_ASTEROID): ACT_GAME_OVER,
+    (CAT_ROCKET,   CAT_BULLET):   ACT_GAME_OVER,
+    (CAT_ROCKET,   CAT_DEBRIS):   ACT_GAME_OVER,
+    (CAT_SHIELD,   CAT_SHIELD):   ACT_BOUNCE,
+    (CAT_SHIELD,   CAT_ASTEROID): ACT_BOUNCE,
+    (CAT_SHIELD,   CAT_BULLET):   ACT_BOUNCE,
+    (CAT_SHIELD,   CAT_DEBRIS):   ACT_BOUNCE,
+    (CAT_ASTEROID, CAT_ASTEROID): ACT_BOUNCE,
+    (CAT_ASTEROID, CAT_BULLET):   ACT_DAMAGE,
+    (CAT_ASTEROID, CAT_PULSE):    ACT_TRIGGER,
+}
+
+def _cat_index(cat):
+    return cat.bit_length()- 1
+
+# the rules as a symmetric (N_CATS, N_CATS) table, for array lookups
+RULE_TABLE= np.zeros((N_CATS, N_CATS), np.uint8)
+for (_a, _b), _act in COLLISION_RULES.items():
+    RULE_TABLE[_cat_index(_a), _cat_index(_b)]= _act
+    RULE_TABLE[_cat_index(_b), _cat_index(_a)]= _act
+# default mask of each category: everything it has a rule with
+COLLISION_MASK= {1 << c: sum(1 << d for d in range(N_CATS) if RULE_TABLE[c, d]) for c in range(N_CATS)}
+
+def collision_rule(cat_a, cat_b):
+    return int(RULE_TABLE[_cat_index(cat_a), _cat_index(cat_b)])
+
+def interacts(cat_a, mask_a, cat_b, mask_b):
+    return bool(cat_a & mask_b) and bool(cat_b & mask_a)
+
+def _act_bounce(objA, objB, game_state):
+    (vx1,vy1, vx2,vy2)= elastic_bounce(
+        objA.get('mass',1.0), objB.get('mass',1.0),
+        objA['x'], objA['y'], objA['vx'], objA['vy'],
+        objB['x'], objB['y'], objB['vx'], objB['vy'],
+        e=1.0
+    )
+    objA['vx'], objA['vy']= vx1, vy1
+    objB['vx'], objB['vy']= vx2, vy2
+
+def _act_damage(objA, objB, game_state):
+    # bodies with hit points lose the other's damage; at 0 they're marked dead
+    for obj, other in ((objA, objB), (objB, objA)):
+        if 'hp' in obj:
+            obj['hp']-= other.get('damage', 1)
+            if obj['hp']<= 0:
+                obj['dead']= True
+
+def _act_game_over(objA, objB, game_state):
+    game_state['game_over']= True
+
+def _act_trigger(objA, objB, game_state):
+    # no physics; whoever owns the trigger reads the pairs afterwards
+    game_state.setdefault('triggers', []).append((objA, objB))
+
+COLLISION_HANDLERS= {
+    ACT_BOUNCE:    _act_bounce,
+    ACT_DAMAGE:    _act_damage,
+    ACT_GAME_OVER: _act_game_over,
+    ACT_TRIGGER:   _act_trigger,
+}
+
 def handle_collision(objA, objB, rocket_data, game_state):
     # game_state is a dict with 'game_over' and possibly other flags
+    cat_a= objA.get('cat', CAT_ASTEROID)
+    cat_b= objB.get('cat', CAT_ASTEROID)
+    # filter on the masks before any distance math
+    if not interacts(cat_a, objA.get('mask', COLLISION_MASK[cat_a]),
+                     cat_b, objB.get('mask', COLLISION_MASK[cat_b])):
+        return
     dx= objB['x']- objA['x']
     dy= objB['y']- objA['y']
     r_sum= objA['radius']+ objB['radius']
-    dist2= dx*dx+ dy*dy
-    if dist2<= r_sum*r_sum:
-        # they overlap => do bounce if possible
-        # but if rocket is involved and not shielded => game_over
-        # let's define mass for rocket if shield is ON
-        # if rocket is OFF => game_over
-        # if bullet & bullet => bounce, bullet & asteroid => bounce, etc.
-        # unify approach
-
-        # find masses
-        mA= objA.get('mass',1.0)
-        mB= objB.get('mass',1.0)
-
-        # is rocket?
-        typeA= objA.get('type', '')
-        typeB= objB.get('type', '')
-        rocketA= (typeA=='rocket')
-        rocketB= (typeB=='rocket')
-        shield_onA= objA.get('shield_on',False)
-        shield_onB= objB.get('shield_on',False)
-
-        # if rocket not shield => game over
-        if rocketA and (not shield_onA):
-            game_state['game_over']= True
+    if dx*dx+ dy*dy<= r_sum*r_sum:
+        act= collision_rule(cat_a, cat_b)
+        if act:
+            COLLISION_HANDLERS[act](objA, objB, game_state)
+
+def _field_act_bounce(body, field, i, game_state):
+    body['vx'], body['vy']= _bounce_into(
+        field, i, body.get('mass',1.0), body['x'], body['y'], body['vx'], body['vy'])
+
+def _field_act_damage(body, field, i, game_state):
+    # field bodies have no hit points; only the dict side takes damage
+    if 'hp' in body:
+        body['hp']-= 1
+        if body['hp']<= 0:
+            body['dead']= True
+
+def _field_act_trigger(body, field, i, game_state):
+    game_state.setdefault('triggers', []).append((body, int(i)))
+
+# the same actions for a dict body against field body i
+FIELD_HANDLERS= {
+    ACT_BOUNCE:    _field_act_bounce,
+    ACT_DAMAGE:    _field_act_damage,
+    ACT_GAME_OVER: lambda body, field, i, game_state: _act_game_over(body, None, game_state),
+    ACT_TRIGGER:   _field_act_trigger,
+}
+
+_CAT_INDEX= np.zeros(1 << N_CATS, np.intp)
+for _c in range(N_CATS):
+    _CAT_INDEX[1 << _c]= _c
+
+def _mask_candidates(field, cat, mask):
+    """Field bodies that interact with a body of (cat, mask): None for all of them, else indices."""
+    shared= field.layers()
+    if shared is not None:
+        return None if interacts(cat, mask, *shared) else np.empty(0, np.intp)
+    return np.flatnonzero(((field.cat & mask)!= 0) & ((field.mask & cat)!= 0))
+
+def _bounce_into(field, i, m1, x1, y1, vx1, vy1):
+    # bounce a body (given by value) off asteroid i; writes the asteroid's
+    # new velocity back and returns the body's
+    (vx1,vy1, vx2,vy2)= elastic_bounce(
+        m1, float(field.mass[i]),
+        x1, y1, vx1, vy1,
+        float(field.x[i]), float(field.y[i]), float(field.vx[i]), float(field.vy[i]),
+        e=1.0
+    )
+    field.vx[i]= vx2
+    field.vy[i]= vy2
+    return vx1, vy1
+
+def collide_rocket_field(rocket, field, game_state):
+    """
+    The rocket against every asteroid: one vectorized overlap test, then the
+    same rules as handle_collision for the asteroids it actually touches.
+    Returns the indices of the asteroids it hit.
+    """
+    hits=[]
+    if not len(field):
+        return hits
+    cat= rocket.get('cat', CAT_ROCKET)
+    cand= _mask_candidates(field, cat, rocket.get('mask', COLLISION_MASK[cat]))
+    x, y, r= field.x, field.y, field.radius
+    if cand is not None:
+        if not len(cand):
+            return hits
+        x, y, r= x[cand], y[cand], r[cand]
+    # overlap test in scratch arrays: nothing of the field's size is allocated
+    n= len(x)
+    dx= np.subtract(x, rocket['x'], out=kernels.scratch('rc_dx', n))
+    dy= np.subtract(y, rocket['y'], out=kernels.scratch('rc_dy', n))
+    r_sum= np.add(r, rocket['radius'], out=kernels.scratch('rc_r', n))
+    dx*= dx
+    dy*= dy
+    dx+= dy
+    r_sum*= r_sum
+    touching= np.flatnonzero(np.less_equal(dx, r_sum, out=kernels.scratch('rc_hit', n, np.bool_)))
+    if cand is not None:
+        touching= cand[touching]
+    for i in touching:
+        hits.append(int(i))
+        act= collision_rule(cat, int(field.cat[i]))
+        if act:
+            FIELD_HANDLERS[act](rocket, field, i, game_state)
+        if game_state['game_over']:
+            return hits
+    return hits
+
+GRID_MIN_BODIES = 256    # field_pairs switches to the grid broadphase here
+PAIR_LOOP_MAX   = 32     # more overlapping pairs than this bounce vectorized
+
+# the cell itself (first) plus half its neighbours, so each cell pair is
+# seen once; all nine for bodies that look around alone (a `due` mask)
+_HALF_STENCIL= np.array(((0,0),(1,-1),(1,0),(1,1),(0,1)), np.int64)
+_FULL_STENCIL= np.array([(ox, oy) for ox in (-1,0,1) for oy in (-1,0,1)], np.int64)
+
+_INDEX= np.arange(0, dtype=np.intp)
+
+def _index(n):
+    # 0..n-1, kept between ticks
+    global _INDEX
+    if len(_INDEX)< n:
+        _INDEX= np.arange(2*n, dtype=np.intp)
+    return _INDEX[:n]
+
+def _nonzero(mask, name):
+    # np.flatnonzero into kernels.scratch buffers: the running count of set
+    # entries puts each one's index at its rank, the rest go to a spare slot
+    n= len(mask)
+    pos= kernels.scratch(name+ '_pos', n, np.intp)
+    np.copyto(pos, mask)
+    np.cumsum(pos, out=pos)
+    m= int(pos[-1]) if n else 0
+    np.copyto(pos, 0, where=np.logical_not(mask, out=kernels.scratch(name+ '_off', n, np.bool_)))
+    out= kernels.scratch(name, m+ 1, np.intp)
+    np.put(out, pos, _index(n))
+    return out[1:]
+
+def _runs(start, cnt, tot, name):
+    # the positions start[q] .. start[q]+cnt[q]-1 of every run q back to
+    # back, and src, the run each comes from: np.repeat without the new
+    # arrays, a mark at each run's first slot summed up. Overwrites start.
+    first= np.cumsum(cnt, out=kernels.scratch(name+ '_first', len(cnt), np.intp))
+    first-= cnt
+    src= kernels.scratch(name+ '_src', tot+ 1, np.intp)
+    src.fill(0)
+    np.add.at(src, first, 1)
+    src= src[:tot]
+    np.cumsum(src, out=src)
+    src-= 1
+    off= np.subtract(start, first, out=start)
+    pos= np.take(off, src, out=kernels.scratch(name+ '_pos', tot, np.intp), mode='clip')
+    pos+= _index(tot)
+    return pos, src
+
+def _grid_pairs(field, w, h, due=None):
+    # bucket bodies into cells at least one max diameter wide, so any
+    # overlapping pair shares a cell or sits in neighbouring ones; cells
+    # are also sized so there are about 4 per body, keeping the table small.
+    # All work arrays, the pairs returned too, are kernels.scratch buffers
+    # reused every tick. With a `due` mask only due bodies look around
+    # them, in all 9 cells.
+    n= len(field)
+    cs= max(2.0* float(field.radius.max()), math.sqrt(w*h/ (4.0*n)))
+    nx= int(w// cs)
+    ny= int(h// cs)
+    f= kernels.scratch('gp_f', n)
+    cx= kernels.scratch('gp_cx', n, np.intp)
+    cy= kernels.scratch('gp_cy', n, np.intp)
+    cx[:]= np.multiply(field.x, nx/ w, out=f)
+    cx%= nx
+    cy[:]= np.multiply(field.y, ny/ h, out=f)
+    cy%= ny
+    key= np.multiply(cx, ny, out=kernels.scratch('gp_key', n, np.intp))
+    key+= cy
+    # each body's cell above its index: sorting those in place is a stable
+    # sort by cell that allocates nothing
+    pk= np.left_shift(key, 32, out=kernels.scratch('gp_pk', n, np.int64))
+    pk|= _index(n)
+    pk.sort()
+    # cell c holds order[ends[c]:ends[c+1]]; both kept on the field for field_near
+    if field.grid is None or field.grid[:2]!= (nx, ny):
+        field.grid= (nx, ny, np.empty(n, np.intp), np.empty(nx*ny+ 1, np.intp))
+    order= field.grid[2]
+    np.bitwise_and(pk, 0xffffffff, out=order)
+    ends= field.grid[3]
+    ends.fill(0)
+    np.add.at(ends[1:], key, 1)
+    np.cumsum(ends, out=ends)
+    if due is None:
+        body= _index(n)
+        groups= [_HALF_STENCIL[g:g+1] for g in range(len(_HALF_STENCIL))]
+    else:
+        # few bodies: all nine offsets in one pass, fewer calls
+        body= _nonzero(due, 'gp_body')
+        cx= np.take(cx, body, out=kernels.scratch('gp_qx', len(body), np.intp), mode='clip')
+        cy= np.take(cy, body, out=kernels.scratch('gp_qy', len(body), np.intp), mode='clip')
+        groups= [_FULL_STENCIL]
+    q= len(body)
+    x, y, r= field.x, field.y, field.radius
+    cat, mask= field.cat, field.mask
+    mixed= field.layers() is None
+    # the pairs found so far, each as min(i, j) above max(i, j)
+    pp= kernels.scratch('gp_pp', 0, np.int64)
+    m= 0
+    for stencil in groups:
+        k= len(stencil)
+        nq= q* k
+        nkey= kernels.scratch('gp_nkey', nq, np.intp).reshape(q, k)
+        t= kernels.scratch('gp_t', nq, np.intp).reshape(q, k)
+        for c, (ox, oy) in enumerate(stencil.tolist()):
+            # a column at a time: broadcasting the stencil would buffer
+            np.add(cx, ox, out=nkey[:,c])
+            np.add(cy, oy, out=t[:,c])
+        nkey%= nx
+        nkey*= ny
+        t%= ny
+        nkey+= t
+        nkey= nkey.reshape(nq)
+        start= np.take(ends, nkey, out=kernels.scratch('gp_start', nq, np.intp), mode='clip')
+        nkey+= 1
+        cnt= np.take(ends, nkey, out=kernels.scratch('gp_cnt', nq, np.intp), mode='clip')
+        cnt-= start
+        tot= int(cnt.sum())
+        if not tot:
+            continue
+        # every body against every member of its neighbour cells, then the
+        # exact overlap test, so only hits are kept
+        j, src= _runs(start, cnt, tot, 'gp')
+        j= np.take(order, j, out=kernels.scratch('gp_j', tot, np.intp), mode='clip')
+        if k> 1:
+            src//= k
+        i= np.take(body, src, out=kernels.scratch('gp_i', tot, np.intp), mode='clip')
+        a= kernels.scratch('gp_a', tot)
+        dx= np.take(x, j, out=kernels.scratch('gp_dx', tot), mode='clip')
+        dx-= np.take(x, i, out=a, mode='clip')
+        dy= np.take(y, j, out=kernels.scratch('gp_dy', tot), mode='clip')
+        dy-= np.take(y, i, out=a, mode='clip')
+        r_sum= np.take(r, i, out=kernels.scratch('gp_r', tot), mode='clip')
+        r_sum+= np.take(r, j, out=a, mode='clip')
+        dx*= dx
+        dy*= dy
+        dx+= dy
+        r_sum*= r_sum
+        hit= np.less_equal(dx, r_sum, out=kernels.scratch('gp_hit', tot, np.bool_))
+        keep= kernels.scratch('gp_keep', tot, np.bool_)
+        if due is not None:
+            # a pair of due bodies is seen from both ends: keep one
+            np.take(due, j, out=keep, mode='clip')
+            np.logical_not(keep, out=keep)
+            keep|= np.less(i, j, out=kernels.scratch('gp_lt', tot, np.bool_))
+            hit&= keep
+            hit&= np.not_equal(i, j, out=keep)
+        elif not stencil.any():
+            hit&= np.less(i, j, out=keep)
+        if mixed:
+            ci= np.take(cat, i, out=kernels.scratch('gp_ci', tot, np.uint8), mode='clip')
+            mj= np.take(mask, j, out=kernels.scratch('gp_mj', tot, np.uint8), mode='clip')
+            mj&= ci
+            hit&= np.not_equal(mj, 0, out=keep)
+            np.take(cat, j, out=ci, mode='clip')
+            np.take(mask, i, out=mj, mode='clip')
+            mj&= ci
+            hit&= np.not_equal(mj, 0, out=keep)
+        hits= _nonzero(hit, 'gp_hits')
+        nh= len(hits)
+        if not nh:
+            continue
+        grown= kernels.scratch('gp_pp', m+ nh, np.int64)
+        if grown.base is not pp.base:
+            # the buffer doubled: carry over the earlier groups' pairs
+            grown[:m]= pp[:m]
+        pp= grown
+        a= np.take(i, hits, out=kernels.scratch('gp_hi', nh, np.intp), mode='clip')
+        b= np.take(j, hits, out=kernels.scratch('gp_hj', nh, np.intp), mode='clip')
+        seg= pp[m:]
+        np.minimum(a, b, out=seg)
+        seg<<= 32
+        seg|= np.maximum(a, b, out=a)
+        m+= nh
+    # same order as the dense test, by i then j: one sort of i above j
+    pp.sort()
+    i= np.right_shift(pp, 32, out=kernels.scratch('gp_pi', m, np.intp))
+    j= np.bitwise_and(pp, 0xffffffff, out=kernels.scratch('gp_pj', m, np.intp))
+    return i, j
+
+def field_pairs(field, w=WORLD_WIDTH, h=WORLD_HEIGHT, due=None):
+    """
+    Index arrays (i, j), i<j, of overlapping asteroid pairs; only pairs
+    with a body in the `due` mask when one is given (FieldSchedule). On
+    the grid they are scratch buffers, good until the next call.
+    """
+    n= len(field)
+    none= (np.empty(0, np.intp), np.empty(0, np.intp))
+    if n< 2:
+        return none
+    shared= field.layers()
+    if shared is not None and not interacts(*shared, *shared):
+        # e.g. debris with debris: no pair can interact
+        return none
+    if n>= GRID_MIN_BODIES and min(w, h)>= 6* float(field.radius.max()):
+        return _grid_pairs(field, w, h, due)
+    if due is not None:
+        i, j= field_pairs(field, w, h)
+        keep= due[i] | due[j]
+        return i[keep], j[keep]
+    if shared is None:
+        # mixed layers: mask the pairs first, distances only for the rest
+        c, m= field.cat, field.mask
+        ok= ((c[:,None] & m[None,:])!= 0) & ((c[None,:] & m[:,None])!= 0)
+        i, j= np.nonzero(np.triu(ok, 1))
+        dx= field.x[j]- field.x[i]
+        dy= field.y[j]- field.y[i]
+        r_sum= field.radius[i]+ field.radius[j]
+        hit= dx*dx+ dy*dy<= r_sum*r_sum
+        return i[hit], j[hit]
+    dx= field.x[None,:]- field.x[:,None]
+    dy= field.y[None,:]- field.y[:,None]
+    r_sum= field.radius[None,:]+ field.radius[:,None]
+    return np.nonzero(np.triu(dx*dx+ dy*dy<= r_sum*r_sum, 1))
+
+def _bounce_pairs(field, ii, jj):
+    # elastic_bounce for many pairs at once: impulses come from the
+    # velocities before this tick and are summed for bodies in several pairs
+    kernels.bounce_pairs(field.x, field.y, field.vx, field.vy, field.mass, ii, jj, 1.0)
+
+def collide_field(field, game_state=None, due=None):
+    # returns the number of overlapping pairs; only pairs whose rule is a
+    # bounce move, trigger pairs are listed in game_state['triggers']
+    ii, jj= field_pairs(field, due=due)
+    return _collide_pairs(field, ii, jj, game_state)
+
+def _collide_pairs(field, ii, jj, game_state=None):
+    if field.layers() is None and len(ii):
+        act= RULE_TABLE[_CAT_INDEX[field.cat[ii]], _CAT_INDEX[field.cat[jj]]]
+        if game_state is not None:
+            trig= act== ACT_TRIGGER
+            game_state.setdefault('triggers', []).extend(zip(ii[trig].tolist(), jj[trig].tolist()))
+        ii= ii[act== ACT_BOUNCE]; jj= jj[act== ACT_BOUNCE]
+    if len(ii)> PAIR_LOOP_MAX:
+        _bounce_pairs(field, ii, jj)
+        return len(ii)
+    for i, j in zip(ii.tolist(), jj.tolist()):
+        field.vx[i], field.vy[i]= _bounce_into(
+            field, j, float(field.mass[i]),
+            float(field.x[i]), float(field.y[i]), float(field.vx[i]), float(field.vy[i]))
+    return len(ii)
+
+############################################################
+# FORCE FIELD
+############################################################
+
+FORCEFIELD_RADIUS = 300.0     # world units the field reaches from the rocket
+FORCEFIELD_PUSH   = 3000.0    # outward acceleration is this over the distance
+
+def shield_sources(rockets):
+    # (x, y) of every rocket with its force field up
+    return [(r['x'], r['y']) for r in rockets if r['forcefield_on']]
+
+def field_near(field, x, y, radius, w=WORLD_WIDTH, h=WORLD_HEIGHT):
+    """
+    Indices of the asteroids within radius of (x, y), wrapped. Looks only in
+    the cells of the broadphase's last grid that the disc covers, so the cost
+    goes with the bodies near it; a field without a grid is scanned whole.
+    On the grid the indices are a scratch buffer, good until the next call.
+    """
+    g= field.grid
+    if g is not None:
+        nx, ny, order, ends= g
+        # the disc's cells, and one more each way in case the grid is a tick old
+        kx= int(math.ceil(radius* nx/ w))+ 1
+        ky= int(math.ceil(radius* ny/ h))+ 1
+        if 2*kx< nx and 2*ky< ny:
+            cx= int((x% w)* nx/ w)% nx
+            cy= int((y% h)* ny/ h)% ny
+            nc= 2*kx+ 1; mc= 2*ky+ 1
+            # the work arrays go with the cells covered, which go with the
+            # grid: kernels.scratch buffers, as in _grid_pairs
+            row= np.add(_index(nc), cx- kx, out=kernels.scratch('fn_row', nc, np.intp))
+            row%= nx
+            row*= ny
+            col= np.add(_index(mc), cy- ky, out=kernels.scratch('fn_col', mc, np.intp))
+            col%= ny
+            # row+ col over the block; an add that broadcasts is buffered,
+            # copyto is not
+            cells= kernels.scratch('fn_cells', nc* mc, np.intp)
+            start= kernels.scratch('fn_start', nc* mc, np.intp)
+            np.copyto(cells.reshape(nc, mc), col)
+            np.copyto(start.reshape(nc, mc), row[:,None])
+            cells+= start
+            np.take(ends, cells, out=start, mode='clip')
+            cells+= 1
+            cnt= np.take(ends, cells, out=cells, mode='clip')
+            cnt-= start
+            tot= int(cnt.sum())
+            if not tot:
+                return np.empty(0, np.intp)
+            cand, _src= _runs(start, cnt, tot, 'fn')
+            cand= np.take(order, cand, out=kernels.scratch('fn_cand', tot, np.intp), mode='clip')
+            dx= np.take(field.x, cand, out=kernels.scratch('fn_dx', tot), mode='clip')
+            dy= np.take(field.y, cand, out=kernels.scratch('fn_dy', tot), mode='clip')
+            for d, c, span in ((dx, x, w), (dy, y, h)):
+                d-= c
+                d+= span/2
+                d%= span
+                d-= span/2
+                d*= d
+            dx+= dy
+            hit= np.less(dx, radius*radius, out=kernels.scratch('fn_hit', tot, np.bool_))
+            near= _nonzero(hit, 'fn_hits')
+            return np.take(cand, near, out=kernels.scratch('fn_near', len(near), np.intp), mode='clip')
+    dx= (field.x- x+ w/2)% w- w/2
+    dy= (field.y- y+ h/2)% h- h/2
+    return np.flatnonzero(dx*dx+ dy*dy< radius*radius)
+
+def forcefield_kick(field, shields, dt=BASE_DT, w=WORLD_WIDTH, h=WORLD_HEIGHT):
+    """
+    One tick of the force fields at shields ((x, y) each) on the asteroids:
+    FORCEFIELD_PUSH/r straight out from each, within FORCEFIELD_RADIUS.
+    Each field's bodies are kicked in turn, in scratch buffers. Returns
+    their indices.
+    """
+    several= len(shields)> 1
+    if several:
+        kicked= kernels.scratch('ff_kicked', len(field), np.bool_)
+        kicked.fill(False)
+    i= np.empty(0, np.intp)
+    for sx, sy in shields:
+        i= field_near(field, sx, sy, FORCEFIELD_RADIUS, w, h)
+        m= len(i)
+        if not m:
+            continue
+        dx= np.take(field.x, i, out=kernels.scratch('ff_dx', m), mode='clip')
+        dy= np.take(field.y, i, out=kernels.scratch('ff_dy', m), mode='clip')
+        for d, c, span in ((dx, sx, w), (dy, sy, h)):
+            d-= c
+            d+= span/2
+            d%= span
+            d-= span/2
+        # a/r along (dx, dy): FORCEFIELD_PUSH/r^2, held at the hull
+        k= np.multiply(dx, dx, out=kernels.scratch('ff_k', m))
+        k+= np.multiply(dy, dy, out=kernels.scratch('ff_t', m))
+        np.maximum(k, ROCKET_RAD*ROCKET_RAD, out=k)
+        np.divide(FORCEFIELD_PUSH* dt, k, out=k)
+        # i holds each body once: take, add and put back, not np.add.at
+        for v, d in ((field.vx, dx), (field.vy, dy)):
+            d*= k
+            d+= np.take(v, i, out=kernels.scratch('ff_v', m), mode='clip')
+            np.put(v, i, d)
+        if several:
+            np.put(kicked, i, True)
+    if several:
+        return _nonzero(kicked, 'ff_idx')
+    return i
+
+############################################################
+# WORLD STEP
+############################################################
+
+# input bits, shared by the local loop and the network protocol
+IN_FORWARD = 1
+IN_REVERSE = 2
+IN_LEFT    = 4
+IN_RIGHT   = 8
+# extra rocket flags in snapshots
+FLAG_SHIELD= 16
+FLAG_DEAD  = 32
+
+def new_rocket(x, y):
+    return {
+        'type':'rocket',
+        'x':x,'y':y,
+        'vx':0,'vy':0,
+        'radius':ROCKET_RAD,
+        'mass':10.0,  # rocket mass
+        'heading':0,
+        'angvel':0,
+        'forcefield_on':False,  # or shield_on
+        'shield_on':False,      # for collision logic
+        'cat':CAT_ROCKET,       # CAT_SHIELD while the shield is up
+        'mask':COLLISION_MASK[CAT_ROCKET],
+    }
+
+def read_input_bits(keys):
+    bits= 0
+    if keys[pygame.K_w]: bits|= IN_FORWARD
+    if keys[pygame.K_s]: bits|= IN_REVERSE
+    if keys[pygame.K_a]: bits|= IN_LEFT
+    if keys[pygame.K_d]: bits|= IN_RIGHT
+    return bits
+
+def apply_input(rocket, bits, dt_real, torque=50.0, thrust=100.0):
+    """
+    Applies torque/thrust for one frame and returns the bits that actually
+    fired (thrusters are off while the force field is up).
+    """
+    active= 0
+    if bits & IN_LEFT:
+        rocket['angvel']-= torque*dt_real
+        active|= IN_LEFT
+    if bits & IN_RIGHT:
+        rocket['angvel']+= torque*dt_real
+        active|= IN_RIGHT
+    if bits & IN_FORWARD and not rocket['forcefield_on']:
+        h_rad= math.radians(rocket['heading'])
+        rocket['vx']+= thrust* math.cos(h_rad)* dt_real
+        rocket['vy']+= thrust* math.sin(h_rad)* dt_real
+        rocket['vx'], rocket['vy']= limit_speed(rocket['vx'], rocket['vy'])
+        active|= IN_FORWARD
+    if bits & IN_REVERSE and not rocket['forcefield_on']:
+        h_rad= math.radians(rocket['heading'])
+        rocket['vx']-= thrust* math.cos(h_rad)* dt_real
+        rocket['vy']-= thrust* math.sin(h_rad)* dt_real
+        rocket['vx'], rocket['vy']= limit_speed(rocket['vx'], rocket['vy'])
+        active|= IN_REVERSE
+    rocket['shield_on']= rocket['forcefield_on'] # unify naming
+    rocket['cat']= CAT_SHIELD if rocket['shield_on'] else CAT_ROCKET
+    return active
+
+def advance_body(lvl, x, y, vx, vy, dt=BASE_DT):
+    # one integration step: gravity, speed limit, drift, wrap
+    ax, ay= lvl.force_func(x, y, vx, vy)
+    vx, vy= limit_speed(vx+ ax*dt, vy+ ay*dt)
+    x, y= wrap_pos(x+ vx*dt, y+ vy*dt)
+    return x, y, vx, vy
+
+def advance_field(lvl, field, dt=BASE_DT, shields=()):
+    # advance_body for every asteroid at once, on the kernels backend;
+    # force fields at shields kick their bodies first
+    if shields:
+        forcefield_kick(field, shields, dt, lvl.WORLD_WIDTH, lvl.WORLD_HEIGHT)
+    attr= lvl.attractor_table()
+    if attr is not None:
+        kernels.step(field.x, field.y, field.vx, field.vy, attr,
+                     dt, C_MAX, lvl.WORLD_WIDTH, lvl.WORLD_HEIGHT)
+        return
+    ax, ay= lvl.force_array(field.x, field.y)
+    kernels.kick_drift(field.x, field.y, field.vx, field.vy, ax, ay,
+                       dt, C_MAX, lvl.WORLD_WIDTH, lvl.WORLD_HEIGHT)
+
+def integrate_rocket(lvl, rocket, dt=BASE_DT):
+    """Gravity, rotation, drift and wrap. Returns True if the rocket hit a lethal region."""
+    rocket['x'], rocket['y'], rocket['vx'], rocket['vy']= advance_body(
+        lvl, rocket['x'], rocket['y'], rocket['vx'], rocket['vy'], dt)
+    rocket['heading']+= rocket['angvel']*dt
+    return lvl.lethal_check(rocket['x'], rocket['y'])
+
+def collide_all(all_objects, rocket, game_state):
+    # pairwise collisions, stopping at the first game over
+    for i in range(len(all_objects)):
+        for j in range(i+1,len(all_objects)):
+            handle_collision(all_objects[i],all_objects[j],rocket, game_state)
+            if game_state['game_over']:
+                return
+
+############################################################
+# MULTI-RATE SCHEDULING
+############################################################
+
+RATE_TIERS   = ((1000.0, 1), (3000.0, 4), (math.inf, 16))  # (distance to a rocket, ticks per kick)
+RATE_ACCEL   = 32.0     # most force x ticks per kick a body may take: stronger fields run faster...
+RATE_TIDE    = 0.1      # ...as do steeper ones, by sqrt(gradient) x seconds per kick
+RATE_PROBE   = 1.0      # world units; step of the gradient's difference
+RATE_ERR     = 100.0    # world units an untouched slow body may end from full rate in --rate-check
+RETIER_TICKS = 16       # tiers are redrawn this often...
+RETIER_MOVE  = 300.0    # ...or once a rocket has moved this far
+CROWD_CELL   = 50.0     # world units; a cell holding...
+CROWD        = 4        # ...this many bodies runs them one tier faster, as do recent contacts
+SLEEP_SPEED  = 0.5
+SLEEP_CHECKS = 2        # slow, force-free retiers in a row before a body sleeps
+
+class FieldSchedule:
+    """
+    Multi-rate stepping for a drifting AsteroidField, in place of
+    advance_field and collide_field.
+
+    Every body drifts every tick, but only the bodies due feel gravity:
+    a body in a tier of period p is kicked every p-th tick with the
+    velocity change of the ticks since its last kick, half before and half
+    after (impulse multiple time stepping), staggered by index so each tick
+    does 1/p of the tier. Bodies in a crowded cell or with a contact since
+    the last retier run one tier faster, as do bodies where the force or
+    its gradient is strong: RATE_ACCEL and RATE_TIDE, checked at each
+    retier and at each kick. Within the first tier's distance of a rocket
+    bodies are due every tick, which is advance_field's step to the bit.
+    Only due bodies look for asteroid pairs (against every body), so a far
+    pair is found within its period.
+
+    A body sleeps after SLEEP_CHECKS retiers slow and outside every force:
+    it is frozen, neither moved, kicked nor queried, and keeps its velocity
+    for when it wakes. A contact with a due body, a force where it lies, or
+    wake() wakes it.
+    """
+    def __init__(self, field):
+        n= len(field)
+        self.field= field
+        self.tick= 0
+        self.period= np.ones(n, np.int64)
+        self.last= np.zeros(n, np.int64)     # tick of each body's last kick
+        self.ahead= np.full(n, 0.5)          # ticks of kick that one gave in advance
+        self.still= np.zeros(n, np.int8)     # quiet retiers in a row
+        self.asleep= np.zeros(n, bool)
+        self.touched= np.zeros(n, bool)      # in a pair since the last retier
+        self.due= np.ones(n, bool)
+        self.phase= np.arange(n, dtype=np.int64)
+        self._retiered= None                 # (tick, focus) at the last retier
+
+    def wake(self, idx):
+        # from now on kicked again; the time asleep is not owed
+        self.asleep[idx]= False
+        self.still[idx]= 0
+        self.period[idx]= 1
+        self.last[idx]= self.tick
+        self.ahead[idx]= 0.5
+
+    def _retier(self, lvl, focus, dt):
+        f= self.field
+        w, h= lvl.WORLD_WIDTH, lvl.WORLD_HEIGHT
+        n= len(f)
+        d2= kernels.scratch('fs_d2', n); t= kernels.scratch('fs_t', n); u= kernels.scratch('fs_u', n)
+        d2.fill(np.inf)
+        for fx, fy in focus:
+            np.subtract(f.x, fx- w/2, out=t); t%= w; t-= w/2; t*= t
+            np.subtract(f.y, fy- h/2, out=u); u%= h; u-= h/2; u*= u
+            t+= u
+            np.minimum(d2, t, out=d2)
+        b= kernels.scratch('fs_b', n, np.bool_); c= kernels.scratch('fs_c', n, np.bool_)
+        period= self.period
+        period.fill(RATE_TIERS[-1][1])
+        for dist, p in reversed(RATE_TIERS[:-1]):
+            np.copyto(period, p, where=np.less(d2, dist*dist, out=b))
+        # a strong or steep force where it lies: a slower tier would owe a
+        # kick too big, or aimed at where the body no longer is
+        ax, ay= self._force(lvl, f.x, f.y, 'fs_f')
+        lim= kernels.scratch('fs_lim', n)
+        np.hypot(ax, ay, out=lim)
+        np.maximum(lim, 1e-12, out=lim)
+        np.divide(RATE_ACCEL, lim, out=lim)
+        for dx, dy in ((RATE_PROBE, 0.0), (0.0, RATE_PROBE)):
+            np.add(f.x, dx, out=t); np.add(f.y, dy, out=u)
+            bx, by= self._force(lvl, t, u, 'fs_g')
+            bx-= ax; by-= ay
+            np.hypot(bx, by, out=t)
+            t/= RATE_PROBE
+            np.sqrt(t, out=t)
+            np.maximum(t, 1e-12, out=t)
+            np.divide(RATE_TIDE/ dt, t, out=t)
+            np.minimum(lim, t, out=lim)
+        tiers= [p for _, p in RATE_TIERS]
+        for slow, fast in zip(tiers[:0:-1], tiers[-2::-1]):
+            np.equal(period, slow, out=b)
+            b&= np.less(lim, slow, out=c)
+            np.copyto(period, fast, where=b)
+        # crowded cells: one tier faster
+        nx= max(1, int(w// CROWD_CELL)); ny= max(1, int(h// CROWD_CELL))
+        key= kernels.scratch('fs_key', n, np.int64)
+        key[:]= np.multiply(f.x, nx/ w, out=t); key%= nx; key*= ny
+        cell= kernels.scratch('fs_cell', n, np.int64)
+        cell[:]= np.multiply(f.y, ny/ h, out=t); cell%= ny
+        key+= cell
+        # bodies per occupied cell from the keys sorted with each body's index
+        # below (a count per cell of the grid would be far bigger than the
+        # field): a body is crowded if it is in a run of CROWD equal keys
+        key<<= 32
+        key|= _index(n)
+        key.sort()
+        np.bitwise_and(key, 0xffffffff, out=cell)
+        key>>= 32
+        m= max(n- CROWD+ 1, 0)
+        b[m:]= False
+        np.equal(key[:m], key[CROWD- 1:], out=b[:m])
+        np.copyto(c, b)
+        for k in range(1, min(CROWD, n)):
+            c[k:]|= b[:-k]
+        np.put(b, cell, c)
+        b|= self.touched
+        self.touched.fill(False)
+        faster= np.floor_divide(period, 4, out=kernels.scratch('fs_p4', n, np.int64))
+        np.copyto(period, faster, where=b)
+        np.maximum(period, 1, out=period)
+        # sleep: slow and no force where it lies
+        np.multiply(f.vx, f.vx, out=t); np.multiply(f.vy, f.vy, out=u); t+= u
+        quiet= np.less(t, SLEEP_SPEED*SLEEP_SPEED, out=b)
+        quiet&= np.equal(ax, 0.0, out=c)
+        quiet&= np.equal(ay, 0.0, out=c)
+        still= self.still
+        still+= 1
+        np.minimum(still, SLEEP_CHECKS, out=still)
+        np.copyto(still, 0, where=np.logical_not(quiet, out=c))
+        sleep= np.greater_equal(still, SLEEP_CHECKS, out=b)
+        woke= np.logical_not(sleep, out=c)
+        woke&= self.asleep
+        np.copyto(self.last, self.tick, where=woke)
+        np.copyto(self.ahead, 0.5, where=woke)
+        np.copyto(self.asleep, sleep)
+        self._retiered= (self.tick, [tuple(p) for p in focus])
+
+    def _stale(self, focus):
+        if self._retiered is None or self.tick- self._retiered[0]>= RETIER_TICKS:
+            return True
+        if len(focus)!= len(self._retiered[1]):
+            return True
+        for (x, y), (x0, y0) in zip(focus, self._retiered[1]):
+            if abs(x- x0)> RETIER_MOVE or abs(y- y0)> RETIER_MOVE:
+                return True
+        return False
+
+    def _force(self, lvl, x, y, name):
+        ax= kernels.scratch(name+ 'x', len(x)); ay= kernels.scratch(name+ 'y', len(x))
+        attr= lvl.attractor_table()
+        if attr is None:
+            lvl.force_into(x, y, ax, ay)
+            return ax, ay
+        ax.fill(0.0); ay.fill(0.0)
+        kernels.gravity(x, y, attr, ax, ay)
+        return ax, ay
+
+    def advance(self, lvl, focus, dt=BASE_DT, shields=()):
+        """
+        One tick. focus: (x, y) of each rocket; tiers are by distance to the
+        nearest. Force fields at shields kick their bodies, waking sleepers.
+        """
+        f= self.field
+        if self._stale(focus):
+            self._retier(lvl, focus, dt)
+        if shields:
+            hit= forcefield_kick(f, shields, dt, lvl.WORLD_WIDTH, lvl.WORLD_HEIGHT)
+            hit= hit[self.asleep[hit]]
+            if len(hit):
+                self.wake(hit)
+        self.tick+= 1
+        n= len(f)
+        # due: awake, and this tick is in its period's slot
+        ph= np.add(self.phase, self.tick, out=kernels.scratch('fs_ph', n, np.int64))
+        # periods are powers of two: the slot is a mask, not a modulo
+        ph&= np.subtract(self.period, 1, out=kernels.scratch('fs_pm', n, np.int64))
+        due= np.equal(ph, 0, out=self.due)
+        due&= np.logical_not(self.asleep, out=kernels.scratch('fs_awake', n, np.bool_))
+        idx= _nonzero(due, 'fs_idx')
+        m= len(idx)
+        if m:
+            # mode='clip': with the default a take into `out` is buffered
+            x= np.take(f.x, idx, out=kernels.scratch('fs_x', m), mode='clip')
+            y= np.take(f.y, idx, out=kernels.scratch('fs_y', m), mode='clip')
+            vx= np.take(f.vx, idx, out=kernels.scratch('fs_vx', m), mode='clip')
+            vy= np.take(f.vy, idx, out=kernels.scratch('fs_vy', m), mode='clip')
+            ax, ay= self._force(lvl, x, y, 'fs_a')
+            # fallen into a strong field since the last retier: due every tick
+            # from here on
+            p= np.take(self.period, idx, out=kernels.scratch('fs_p', m, np.int64), mode='clip')
+            a= kernels.scratch('fs_a', m)
+            np.copyto(a, p)
+            a*= np.hypot(ax, ay, out=kernels.scratch('fs_kdt', m))
+            np.copyto(p, 1, where=np.greater(a, RATE_ACCEL, out=kernels.scratch('fs_up', m, np.bool_)))
+            np.put(self.period, idx, p)
+            # the kick owed since the last one, less what that one gave ahead,
+            # and half the next period's ahead: centred in time like a leapfrog
+            # rather than always late. Due every tick it is 1 - 1/2 + 1/2.
+            k= np.take(self.last, idx, out=kernels.scratch('fs_k', m, np.int64), mode='clip')
+            np.subtract(self.tick, k, out=k)
+            kdt= kernels.scratch('fs_kdt', m)
+            np.copyto(kdt, k)
+            kdt-= np.take(self.ahead, idx, out=a, mode='clip')
+            half= a
+            np.copyto(half, p)
+            half*= 0.5
+            kdt+= half
+            np.put(self.ahead, idx, half)
+            kdt*= dt
+            ax*= kdt; ay*= kdt
+            vx+= ax; vy+= ay
+            kernels.limit_speed(vx, vy, C_MAX)
+            np.put(f.vx, idx, vx); np.put(f.vy, idx, vy)
+            np.put(self.last, idx, self.tick)
+        # everyone awake drifts; a sleeper moves by exactly 0
+        t= kernels.scratch('fs_t', n)
+        np.multiply(f.vx, dt, out=t)
+        np.copyto(t, 0.0, where=self.asleep)
+        f.x+= t
+        np.multiply(f.vy, dt, out=t)
+        np.copyto(t, 0.0, where=self.asleep)
+        f.y+= t
+        kernels.wrap_pos(f.x, f.y, lvl.WORLD_WIDTH, lvl.WORLD_HEIGHT)
+
+    def collide(self, lvl, game_state=None):
+        """collide_field for the pairs with a due body; sleepers touched wake."""
+        f= self.field
+        ii, jj= field_pairs(f, lvl.WORLD_WIDTH, lvl.WORLD_HEIGHT, self.due)
+        self.touched[ii]= True
+        self.touched[jj]= True
+        if len(ii) and self.asleep.any():
+            hit= np.concatenate((ii, jj))
+            hit= hit[self.asleep[hit]]
+            if len(hit):
+                self.wake(hit)
+        return _collide_pairs(f, ii, jj, game_state)
+
+############################################################
+# TRAJECTORY PREDICTION
+############################################################
+
+PREDICT_STEPS  = 3000   # horizon, in BASE_DT steps
+PREDICT_BUDGET = 400    # integration steps allowed per frame
+PREDICT_STRIDE = 4      # draw every n-th predicted point
+
+class TrajectoryPredictor:
+    """
+    Predicts the rocket's coasting path with the same step as
+    integrate_rocket. The prediction lives in a ring buffer of future states:
+    each frame without thrust or collisions the rocket lands exactly on the
+    head, which is dropped, and the tail is extended. Any other change
+    restarts it. Either way at most PREDICT_BUDGET steps run per frame.
+    """
+    def __init__(self, horizon=PREDICT_STEPS, budget=PREDICT_BUDGET):
+        self.cap= horizon
+        self.budget= budget
+        self.x = np.empty(horizon)
+        self.y = np.empty(horizon)
+        self.vx= np.empty(horizon)
+        self.vy= np.empty(horizon)
+        self.head= 0
+        self.count= 0
+        self.start= None     # state the prediction grows from when empty
+        self.lethal= False   # the last predicted point is in a lethal region
+        self.steps_last= 0
+
+    def invalidate(self):
+        self.count= 0
+        self.start= None
+        self.lethal= False
+
+    def _restart(self, state):
+        self.head= 0
+        self.count= 0
+        self.start= state
+        self.lethal= False
+
+    def update(self, lvl, rocket, dirty=False):
+        state= (rocket['x'], rocket['y'], rocket['vx'], rocket['vy'])
+        h= self.head
+        if dirty or self.start is None:
+            self._restart(state)
+        elif self.count:
+            if (self.x[h], self.y[h], self.vx[h], self.vy[h])== state:
+                # coasted onto the prediction: drop the state we reached
+                self.head= (h+1) % self.cap
+                self.count-= 1
+                self.start= state
+            else:
+                self._restart(state)
+        elif state!= self.start:
+            self._restart(state)
+        self.steps_last= self._extend(lvl)
+
+    def _extend(self, lvl):
+        if self.lethal or self.count>= self.cap:
+            return 0
+        if self.count:
+            i= (self.head+ self.count- 1) % self.cap
+            x, y, vx, vy= self.x[i], self.y[i], self.vx[i], self.vy[i]
+            x, y, vx, vy= float(x), float(y), float(vx), float(vy)
+        else:
+            x, y, vx, vy= self.start
+        n= min(self.budget, self.cap- self.count)
+        for k in range(n):
+            x, y, vx, vy= advance_body(lvl, x, y, vx, vy)
+            i= (self.head+ self.count) % self.cap
+            self.x[i]= x; self.y[i]= y; self.vx[i]= vx; self.vy[i]= vy
+            self.count+= 1
+            if lvl.lethal_check(x, y):
+                self.lethal= True
+                return k+1
+        return n
+
+    def draw(self, screen, cam_x, cam_y, w=WORLD_WIDTH, h=WORLD_HEIGHT, color=(110,190,255), scale=1.0):
+        if not self.count:
             return
-        if rocketB and (not shield_onB):
-            game_state['game_over']= True
+        # the view's size in world units
+        sw, sh= screen.get_width()/ scale, screen.get_height()/ scale
+        steps= np.arange(0, self.count, PREDICT_STRIDE)
+        if steps[-1]!= self.count- 1:
+            steps= np.append(steps, self.count- 1)
+        idx= (self.head+ steps) % self.cap
+        # nearest wrapped image around the screen centre, split where the
+        # path crosses the world edge
+        sx= (self.x[idx]- cam_x- sw/2+ w/2) % w- w/2+ sw/2
+        sy= (self.y[idx]- cam_y- sh/2+ h/2) % h- h/2+ sh/2
+        cuts= np.flatnonzero((np.abs(np.diff(sx))> w/2) | (np.abs(np.diff(sy))> h/2))+ 1
+        sx*= scale
+        sy*= scale
+        for seg_x, seg_y in zip(np.split(sx, cuts), np.split(sy, cuts)):
+            if len(seg_x)> 1:
+                pygame.draw.lines(screen, color, False, np.column_stack((seg_x, seg_y)).tolist(), 1)
+        if self.lethal:
+            ex, ey= int(sx[-1]), int(sy[-1])
+            pygame.draw.line(screen, (255,40,40), (ex-8, ey-8), (ex+8, ey+8), 3)
+            pygame.draw.line(screen, (255,40,40), (ex-8, ey+8), (ex+8, ey-8), 3)
+
+############################################################
+# TIME WARP
+############################################################
+
+WARP_FACTORS = (1, 10, 100, 1000)    # ticks per frame
+WARP_FILL    = 0.85     # of a frame's time the ticks and drawing may take together
+WARP_CHUNK   = 200      # ticks between warp's asteroid checks
+WARP_LOOK    = 10.0     # game seconds: warp stops when closing on a lethal radius sooner
+WARP_SLACK   = 2.0      # on the closing speed bound, for gravity within a chunk
+
+def _warp_clear(rocket, field, w, h):
+    # ticks before the rocket could reach any asteroid, at WARP_SLACK times
+    # the fastest closing speed there is now
+    if not len(field):
+        return WARP_CHUNK
+    dx= (field.x- rocket['x']+ w/2)% w- w/2
+    dy= (field.y- rocket['y']+ h/2)% h- h/2
+    gap= np.sqrt(dx*dx+ dy*dy)- field.radius- ROCKET_RAD
+    vmax= math.hypot(rocket['vx'], rocket['vy'])+ math.sqrt(float((field.vx**2+ field.vy**2).max()))
+    if vmax<= 0.0:
+        return WARP_CHUNK
+    return int(gap.min()/ (WARP_SLACK* vmax* BASE_DT))
+
+def _warp_closing(lvl, rocket):
+    # the rocket is closing on a lethal radius with under WARP_LOOK to go
+    x, y, vx, vy= rocket['x'], rocket['y'], rocket['vx'], rocket['vy']
+    for (cx, cy, _gm, _rng, lethal) in lvl.attractors():
+        dx= x- cx
+        dy= y- cy
+        r= max(math.hypot(dx, dy), 1e-3)
+        if r- lethal< -(dx*vx+ dy*vy)/ r* WARP_LOOK:
+            return True
+    return False
+
+def warp_ticks(lvl, rocket, game_state, n, deadline):
+    """
+    Runs up to n more physics ticks with nothing drawn, until they are done
+    or time.perf_counter() passes deadline. Returns (ticks run, stopped):
+    stopped when warp had to end because the rocket is closing on a lethal
+    radius or could reach an asteroid within a tick.
+
+    Without drifting asteroids the rocket is the only thing moving, and
+    runs in chunks of kernels.orbit with an asteroid check between them;
+    otherwise it is the ordinary tick, one at a time.
+    """
+    w, h= lvl.WORLD_WIDTH, lvl.WORLD_HEIGHT
+    field= lvl.asteroids
+    attr= lvl.attractor_table()
+    batched= attr is not None and not lvl.DRIFT
+    if batched:
+        lethal= np.array([a[4] for a in lvl.attractors()], float)
+        s= np.empty(4)
+    done= 0
+    t_tick= 0.0    # the last single tick's time, so one isn't started too late
+    while done< n and time.perf_counter()< deadline:
+        m= min(WARP_CHUNK, n- done, _warp_clear(rocket, field, w, h))
+        if m< 1:
+            return done, True
+        if batched:
+            s[:]= rocket['x'], rocket['y'], rocket['vx'], rocket['vy']
+            k= kernels.orbit(s, attr, lethal, WARP_LOOK, BASE_DT, C_MAX, w, h, m)
+            rocket['x'], rocket['y'], rocket['vx'], rocket['vy']= (float(v) for v in s)
+            rocket['heading']+= rocket['angvel']* BASE_DT* k
+            done+= k
+            # no asteroid is in reach yet (_warp_clear); the next tick collides
+            if lvl.lethal_check(rocket['x'], rocket['y']):
+                game_state['game_over']= True
+            if k< m or game_state['game_over']:
+                return done, True
+            continue
+        for _ in range(m):
+            t0= time.perf_counter()
+            if t0+ t_tick> deadline:
+                return done, False
+            if integrate_rocket(lvl, rocket):
+                game_state['game_over']= True
+            if lvl.DRIFT:
+                lvl.field_schedule().advance(lvl, [(rocket['x'], rocket['y'])], shields=shield_sources([rocket]))
+            collide_rocket_field(rocket, field, game_state)
+            if not game_state['game_over']:
+                if lvl.DRIFT:
+                    lvl.field_schedule().collide(lvl)
+                else:
+                    collide_field(field)
+            done+= 1
+            if game_state['game_over'] or _warp_closing(lvl, rocket):
+                return done, True
+            t_tick= time.perf_counter()- t0
+    return done, False
+
+############################################################
+# MULTIPLAYER WORLD
+############################################################
+
+MAX_PLAYERS      = 32
+ASTEROID_ID_BASE = 1024
+STALE_SNAPSHOTS  = 5       # a client hides asteroids not sent for this many snapshots
+assert ASTEROID_ID_BASE+ BELT_MAX- 1<= net.ENTITY_ID_MAX
+RESPAWN_TIME     = 3.0
+
+class MultiplayerWorld:
+    """
+    The authoritative world run by the server: one level, one rocket per
+    connected player. Implements the interface net.GameServer expects.
+    """
+    def __init__(self, level_name, seed, count=BELT_COUNT):
+        self.level_name= level_name
+        self.seed= seed
+        self.count= count  # sent to clients, which build the same level
+        self.lvl= make_level(level_name, seed, **level_options(level_name, count))
+        self._ast_ids= None
+        self.WORLD_WIDTH = self.lvl.WORLD_WIDTH
+        self.WORLD_HEIGHT= self.lvl.WORLD_HEIGHT
+        self.rockets= {}   # entity id -> rocket
+        self.inputs= {}    # entity id -> input bits
+        self.active= {}    # entity id -> bits that fired last tick
+        self.dead= {}      # entity id -> seconds until respawn
+
+    def _spawn(self, eid):
+        # fan players out along the spawn row so they don't collide on entry
+        x, y= self.lvl.spawn_point()
+        off= ((eid+1)//2)* 120.0* (1 if eid % 2 else -1)
+        x, y= wrap_pos(x+ off, y, self.WORLD_WIDTH, self.WORLD_HEIGHT)
+        self.rockets[eid]= new_rocket(x, y)
+        self.dead.pop(eid, None)
+
+    def add_player(self):
+        for eid in range(MAX_PLAYERS):
+            if eid not in self.rockets:
+                self._spawn(eid)
+                self.inputs[eid]= 0
+                self.active[eid]= 0
+                return eid
+        return None
+
+    def remove_player(self, eid):
+        self.rockets.pop(eid, None)
+        self.inputs.pop(eid, None)
+        self.active.pop(eid, None)
+        self.dead.pop(eid, None)
+
+    def set_input(self, eid, bits):
+        if eid in self.inputs:
+            self.inputs[eid]= bits
+
+    def step(self, dt):
+        for eid in list(self.dead):
+            self.dead[eid]-= dt
+            if self.dead[eid]<= 0:
+                self._spawn(eid)
+        alive= [eid for eid in self.rockets if eid not in self.dead]
+        for eid in alive:
+            rocket= self.rockets[eid]
+            self.active[eid]= apply_input(rocket, self.inputs[eid], dt)
+            # the local game advances BASE_DT per frame at FPS; keep that pace
+            if integrate_rocket(self.lvl, rocket, BASE_DT*FPS*dt):
+                self.dead[eid]= RESPAWN_TIME
+        if self.lvl.DRIFT:
+            shields= shield_sources(self.rockets[eid] for eid in alive if eid not in self.dead)
+            advance_field(self.lvl, self.lvl.asteroids, BASE_DT*FPS*dt, shields)
+        # each live rocket against the other rockets and the asteroids,
+        # then asteroid pairs
+        field= self.lvl.asteroids
+        for eid in alive:
+            if eid in self.dead:
+                continue
+            rocket= self.rockets[eid]
+            gs= {'game_over':False}
+            for o in alive:
+                if o!= eid and o not in self.dead:
+                    handle_collision(rocket, self.rockets[o], rocket, gs)
+                    if gs['game_over']:
+                        break
+            if not gs['game_over']:
+                collide_rocket_field(rocket, field, gs)
+            if gs['game_over']:
+                self.dead[eid]= RESPAWN_TIME
+        collide_field(field)
+
+    def entity_arrays(self):
+        # the rockets, then the asteroid field's own arrays behind them
+        rows= []
+        for eid, r in self.rockets.items():
+            flags= self.active.get(eid, 0)
+            if r['forcefield_on']:
+                flags|= FLAG_SHIELD
+            if eid in self.dead:
+                flags|= FLAG_DEAD
+            rows.append((eid, r['x'], r['y'], r['vx'], r['vy'], r['heading'], flags))
+        rk= np.array(rows, float).reshape(-1, 7)
+        f= self.lvl.asteroids
+        n= len(f)
+        if self._ast_ids is None or len(self._ast_ids)!= n:
+            self._ast_ids= ASTEROID_ID_BASE+ np.arange(n, dtype=np.int64)
+            self._ast_zero= np.zeros(n)
+        ids= np.concatenate((rk[:,0].astype(np.int64), self._ast_ids))
+        flags= np.concatenate((rk[:,6], self._ast_zero)).astype(np.int64)
+        return (ids, np.concatenate((rk[:,1], f.x)), np.concatenate((rk[:,2], f.y)),
+                np.concatenate((rk[:,3], f.vx)), np.concatenate((rk[:,4], f.vy)),
+                np.concatenate((rk[:,5], self._ast_zero)), flags)
+
+############################################################
+# VECTORIZED ENVIRONMENTS
+############################################################
+
+VEC_MAX_STEPS = 3000     # episode length, in BASE_DT steps
+VEC_POOL      = 64       # asteroid layouts drawn from on reset
+
+def _limit_speeds(vx, vy):
+    # limit_speed for arrays, in place
+    spd= np.hypot(vx, vy)
+    scl= np.where(spd> C_MAX, C_MAX/ np.maximum(spd, 1e-12), 1.0)
+    vx*= scl
+    vy*= scl
+
+def step_rockets(lvl, x, y, vx, vy, heading, angvel, bits, torque=50.0, thrust=100.0, w=WORLD_WIDTH, h=WORLD_HEIGHT):
+    """
+    One frame of main() for arrays of rockets, in place: apply_input at
+    dt_real=1/FPS with input bits (FLAG_SHIELD for the force field up),
+    then integrate_rocket. Returns the lethal mask.
+    """
+    dt_real= 1.0/ FPS
+    shield= (bits & FLAG_SHIELD)!= 0
+    turn= ((bits & IN_RIGHT)!= 0).astype(float)- ((bits & IN_LEFT)!= 0)
+    push= (((bits & IN_FORWARD)!= 0).astype(float)- ((bits & IN_REVERSE)!= 0))* ~shield
+    angvel+= torque* dt_real* turn
+    hd= np.radians(heading)
+    vx+= thrust* np.cos(hd)* dt_real* push
+    vy+= thrust* np.sin(hd)* dt_real* push
+    _limit_speeds(vx, vy)
+    gx, gy= lvl.force_array(x, y)
+    vx+= gx* BASE_DT
+    vy+= gy* BASE_DT
+    _limit_speeds(vx, vy)
+    x+= vx* BASE_DT; x%= w
+    y+= vy* BASE_DT; y%= h
+    heading+= angvel* BASE_DT
+    return lvl.lethal_array(x, y)
+
+class VecEnv:
+    """
+    N independent single-player games of one level, stepped together as
+    stacked arrays for training controllers. Each step follows a frame of
+    main(): apply_input at dt_real=1/FPS, then integrate_rocket, the lethal
+    check and the rocket-asteroid collisions. Actions are input bits
+    (IN_* plus FLAG_SHIELD to raise the force field), one per env.
+
+    Asteroids drift only on DRIFT levels, as in main(). Asteroid pairs
+    aren't bounced: off the belt that would only change velocities nothing
+    integrates, and on it the rocket's view of the belt barely depends on
+    it. A finished env (crash, lethal region or VEC_MAX_STEPS) is reset in
+    the same step, with an asteroid layout from a pool generated like
+    reset_asteroids does.
+    """
+    def __init__(self, level_name, n, seed=None, max_steps=VEC_MAX_STEPS, spawn_jitter=0.0, **level_kw):
+        self.lvl= make_level(level_name, seed, **level_kw)
+        self.n= n
+        self.max_steps= max_steps
+        self.spawn_jitter= spawn_jitter
+        self.rng= np.random.default_rng(seed)
+        self.W= float(self.lvl.WORLD_WIDTH)
+        self.H= float(self.lvl.WORLD_HEIGHT)
+        self.x= np.empty(n); self.y= np.empty(n)
+        self.vx= np.empty(n); self.vy= np.empty(n)
+        self.heading= np.empty(n); self.angvel= np.empty(n)
+        self.steps= np.zeros(n, np.int32)
+        # asteroid layouts: (pool, M) arrays, copied per env on reset
+        pool= [self.lvl._create_asteroids(self.rng) for _ in range(VEC_POOL)]
+        self.m= len(pool[0])
+        self._pool= {k: np.stack([getattr(f, k) for f in pool]) for k in ('x','y','vx','vy','radius')}
+        self.ax= np.empty((n, self.m)); self.ay= np.empty((n, self.m))
+        self.avx= np.empty((n, self.m)); self.avy= np.empty((n, self.m))
+        self.ar= np.empty((n, self.m))
+        self._reset(np.arange(n))
+
+    def _reset(self, idx):
+        sx, sy= self.lvl.spawn_point()
+        k= len(idx)
+        j= self.spawn_jitter
+        self.x[idx]= (sx+ self.rng.uniform(-j, j, k)) % self.W
+        self.y[idx]= (sy+ self.rng.uniform(-j, j, k)) % self.H
+        self.vx[idx]= 0; self.vy[idx]= 0
+        self.heading[idx]= 0; self.angvel[idx]= 0
+        self.steps[idx]= 0
+        if self.m:
+            p= self.rng.integers(0, VEC_POOL, k)
+            self.ax[idx]= self._pool['x'][p]; self.ay[idx]= self._pool['y'][p]
+            self.avx[idx]= self._pool['vx'][p]; self.avy[idx]= self._pool['vy'][p]
+            self.ar[idx]= self._pool['radius'][p]
+
+    def reset(self):
+        self._reset(np.arange(self.n))
+        return self.obs()
+
+    def obs(self):
+        return np.stack((self.x, self.y, self.vx, self.vy, self.heading, self.angvel), axis=1)
+
+    def step(self, actions, torque=50.0, thrust=100.0):
+        """
+        Advances every env one frame. Returns (obs, reward, done, info):
+        reward is 1 for every step survived, done marks envs that finished
+        (and were reset), info holds 'crashed', 'lethal' and 'timeout' masks.
+        """
+        a= np.asarray(actions)
+        shield= (a & FLAG_SHIELD)!= 0
+        lethal= step_rockets(self.lvl, self.x, self.y, self.vx, self.vy, self.heading, self.angvel,
+                             a, torque, thrust, self.W, self.H)
+        if self.lvl.DRIFT and self.m:
+            gx, gy= self.lvl.force_array(self.ax, self.ay)
+            self.avx+= gx* BASE_DT
+            self.avy+= gy* BASE_DT
+            self.ax= (self.ax+ self.avx* BASE_DT) % self.W
+            self.ay= (self.ay+ self.avy* BASE_DT) % self.H
+
+        crashed= np.zeros(self.n, bool)
+        if self.m:
+            dx= self.ax- self.x[:,None]
+            dy= self.ay- self.y[:,None]
+            d2= dx*dx+ dy*dy
+            r_sum= self.ar+ ROCKET_RAD
+            touch= d2<= r_sum*r_sum
+            hit= touch.any(axis=1)
+            crashed= hit & ~shield & ~lethal
+            bounce= np.flatnonzero(hit & shield & ~lethal)
+            if len(bounce):
+                self._bounce(bounce, touch[bounce], dx[bounce], dy[bounce], d2[bounce])
+
+        self.steps+= 1
+        timeout= self.steps>= self.max_steps
+        done= lethal | crashed | timeout
+        reward= (~(lethal | crashed)).astype(np.float32)
+        info= {'crashed': crashed, 'lethal': lethal, 'timeout': timeout & ~lethal & ~crashed}
+        if done.any():
+            self._reset(np.flatnonzero(done))
+        return self.obs(), reward, done, info
+
+    def _bounce(self, rows, touch, dx, dy, d2):
+        # elastic_bounce of the rocket (mass 10) off the first asteroid it
+        # touches, for every shielded env that hit one at once
+        j= touch.argmax(axis=1)
+        k= np.arange(len(rows))
+        dist= np.sqrt(d2[k, j])+ 1e-12
+        nx= dx[k, j]/ dist
+        ny= dy[k, j]/ dist
+        m1= 10.0
+        m2= self.ar[rows, j]
+        vn= (self.avx[rows, j]- self.vx[rows])* nx+ (self.avy[rows, j]- self.vy[rows])* ny
+        imp= np.where(vn> 0, 0.0, -2.0* vn/ (1/m1+ 1/m2))
+        self.vx[rows]-= imp* nx/ m1
+        self.vy[rows]-= imp* ny/ m1
+        self.avx[rows, j]+= imp* nx/ m2
+        self.avy[rows, j]+= imp* ny/ m2
+
+def bench_vecenv(level_name, n, steps=2000, seed=0):
+    """Steps n envs with random inputs; returns env steps per second."""
+    env= VecEnv(level_name, n, seed)
+    rng= np.random.default_rng(seed)
+    acts= rng.integers(0, 16, (steps, n))
+    t0= time.perf_counter()
+    for a in acts:
+        env.step(a)
+    return n* steps/ (time.perf_counter()- t0)
+
+############################################################
+# AUTOPILOT
+############################################################
+
+AUTOPILOT_PLANS    = 256    # candidate burn sequences per plan
+AUTOPILOT_SEGMENTS = 10     # burns in a sequence...
+AUTOPILOT_SEGMENT  = 30     # ...each held this many frames
+AUTOPILOT_ROCKS    = 32     # nearest asteroids the rollouts steer clear of
+AUTOPILOT_FUEL     = 0.05   # cost of a frame of thrust
+AUTOPILOT_DEATH    = 100.0  # cost of each frame left after a crash
+AUTOPILOT_GOALS    = ("orbit", "escape")
+
+AUTOPILOT_HOLDS    = (1, 5, AUTOPILOT_SEGMENT)   # frames a burn fires before coasting
+
+# a burn: input bits (turn left / none / right with forward / none / reverse)
+# held for the first AUTOPILOT_HOLDS frames of its segment; burn 0 coasts
+_BURN_BITS= [t| p for t in (IN_LEFT, 0, IN_RIGHT) for p in (IN_FORWARD, 0, IN_REVERSE) if t| p]
+AUTOPILOT_INPUTS= np.array([0]+ [b for b in _BURN_BITS for _ in AUTOPILOT_HOLDS], np.int64)
+AUTOPILOT_HOLD= np.array([0]+ [n for _ in _BURN_BITS for n in AUTOPILOT_HOLDS], np.int64)
+_COAST= 0
+
+class Autopilot:
+    """
+    Flies the rocket to a goal around the attractor nearest the spawn
+    point: "orbit" a circle (the level's AUTOPILOT_ORBIT, or halfway
+    between the lethal radius and the edge of its gravity) or "escape"
+    past that edge. update() gives the input bits for a frame.
+
+    Receding horizon: a plan is AUTOPILOT_SEGMENTS burns of
+    AUTOPILOT_SEGMENT frames. While the rocket flies the plan's first burn,
+    AUTOPILOT_PLANS candidate plans for after it are rolled out together
+    with step_rockets (the level's force_array and lethal_array), the same
+    number of frames every frame, and the cheapest is taken at the end of
+    the burn. Candidates are the last plan, mutations of it, and random
+    sequences. Cost per frame is the distance from the goal's orbit or
+    edge and, for orbit, from its circular velocity, plus thrust, with a
+    crash (lethal region, or an asteroid while the shield is down) costing
+    every frame it leaves.
+    """
+    def __init__(self, lvl, goal="orbit", plans=AUTOPILOT_PLANS, segments=AUTOPILOT_SEGMENTS,
+                 segment=AUTOPILOT_SEGMENT, seed=0):
+        self.goal= goal
+        self.k= plans
+        self.segments= segments
+        self.segment= segment
+        self.rng= np.random.default_rng(seed)
+        self.plan= np.full(segments, _COAST, np.int64)   # AUTOPILOT_INPUTS indices
+        self.frame= 0       # into the plan's first burn
+        self.job= None
+        self.cost= None     # of the plan taken last
+        self.plan_s= 0.0    # rollout time of the last frame
+        cx, cy, g_m, g_range, lethal= self._attractor(lvl)
+        self.center= (cx, cy)
+        if goal== "orbit":
+            self.radius= lvl.AUTOPILOT_ORBIT or 0.5* (lethal+ g_range)
+        else:
+            self.radius= g_range
+        self.v_circ= math.sqrt(g_m/ self.radius)
+        s= (plans,)
+        self.x= np.empty(s); self.y= np.empty(s); self.vx= np.empty(s); self.vy= np.empty(s)
+        self.hd= np.empty(s); self.av= np.empty(s)
+        self.acc= np.empty(s); self.alive= np.empty(s, bool)
+
+    @staticmethod
+    def _attractor(lvl):
+        # the one nearest the spawn point: its centre, G_M, range and lethal radius
+        sx, sy= lvl.spawn_point()
+        return min(lvl.attractors(), key=lambda a: math.hypot(a[0]- sx, a[1]- sy))
+
+    @staticmethod
+    def available(lvl):
+        return bool(lvl.attractors())
+
+    def update(self, lvl, rocket):
+        """The input bits for this frame; also advances the planning by one frame's share."""
+        if self.frame== 0:
+            if self.job is not None:
+                self.plan[:]= self._best()
+            self._start(lvl, rocket)
+        t0= time.perf_counter()
+        # the rollouts are (segments+ 1)* segment frames, done by the burn's end
+        for _ in range(self.segments+ 1):
+            self._rollout(lvl)
+        self.plan_s= time.perf_counter()- t0
+        b= self.plan[0]
+        bits= int(AUTOPILOT_INPUTS[b]) if self.frame< AUTOPILOT_HOLD[b] else 0
+        self.frame+= 1
+        if self.frame== self.segment:
+            self.frame= 0
+        return bits
+
+    def _start(self, lvl, rocket):
+        k, n= self.k, self.segments
+        cand= self.rng.integers(0, len(AUTOPILOT_INPUTS), (k, n))
+        # the plan that will be left after this burn, coasting, and mutations of the first
+        cand[0, :-1]= self.plan[1:]; cand[0, -1]= _COAST
+        cand[1]= _COAST
+        m= k// 2
+        cand[2:m]= cand[0]
+        flip= self.rng.random((m- 2, n))< 2.0/ n
+        cand[2:m][flip]= self.rng.integers(0, len(AUTOPILOT_INPUTS), flip.sum())
+        self.x.fill(rocket['x']); self.y.fill(rocket['y'])
+        self.vx.fill(rocket['vx']); self.vy.fill(rocket['vy'])
+        self.hd.fill(rocket['heading']); self.av.fill(rocket['angvel'])
+        self.acc.fill(0.0); self.alive.fill(True)
+        shield= FLAG_SHIELD if rocket['forcefield_on'] else 0
+        # the asteroids that pass closest if nothing changed course, stepped
+        # along with the rollouts if they drift
+        f= lvl.asteroids
+        rocks= None
+        if len(f) and not shield:
+            w, h= lvl.WORLD_WIDTH, lvl.WORLD_HEIGHT
+            dx= (f.x- rocket['x']+ w/2)% w- w/2
+            dy= (f.y- rocket['y']+ h/2)% h- h/2
+            dvx= (f.vx- rocket['vx']) if lvl.DRIFT else np.full(len(f), -rocket['vx'])
+            dvy= (f.vy- rocket['vy']) if lvl.DRIFT else np.full(len(f), -rocket['vy'])
+            t= -(dx*dvx+ dy*dvy)/ np.maximum(dvx*dvx+ dvy*dvy, 1e-9)
+            np.clip(t, 0.0, (n+ 1)* self.segment* BASE_DT, out=t)
+            dx+= dvx* t; dy+= dvy* t
+            d= dx*dx+ dy*dy
+            i= np.argpartition(d, AUTOPILOT_ROCKS)[:AUTOPILOT_ROCKS] if len(f)> AUTOPILOT_ROCKS else np.arange(len(f))
+            rocks= [f.x[i], f.y[i], f.vx[i], f.vy[i], (f.radius[i]+ ROCKET_RAD)**2]
+        self.job= {'cand': cand, 'lead': self.plan[0], 'shield': shield, 'rocks': rocks,
+                   'x0': rocket['x'], 'y0': rocket['y'], 'f': 0, 'len': (n+ 1)* self.segment}
+
+    def _rollout(self, lvl):
+        job= self.job
+        f= job['f']
+        if f>= job['len']:
             return
+        seg, o= divmod(f, self.segment)
+        b= job['lead'] if seg== 0 else job['cand'][:, seg- 1]
+        bits= np.where(AUTOPILOT_HOLD[b]> o, AUTOPILOT_INPUTS[b], 0)| job['shield']
+        w, h= lvl.WORLD_WIDTH, lvl.WORLD_HEIGHT
+        x, y, vx, vy= self.x, self.y, self.vx, self.vy
+        dead= step_rockets(lvl, x, y, vx, vy, self.hd, self.av, bits, w=w, h=h)
+        f+= 1
+        job['f']= f
+        if job['rocks'] is not None:
+            rocks= job['rocks']
+            rx, ry, rvx, rvy, r2= rocks
+            if lvl.DRIFT:
+                kernels.kick_drift(rx, ry, rvx, rvy, *lvl.force_array(rx, ry), BASE_DT, C_MAX, w, h)
+            # all relative to where the rocket started, so only the small arrays wrap
+            x0, y0= job['x0'], job['y0']
+            dx= np.subtract.outer((x- x0+ w/2)% w- w/2, (rx- x0+ w/2)% w- w/2)
+            dy= np.subtract.outer((y- y0+ h/2)% h- h/2, (ry- y0+ h/2)% h- h/2)
+            dx*= dx; dy*= dy; dx+= dy
+            dead|= (dx<= r2).any(axis=1)
+        cx, cy= self.center
+        dx= x- cx; dy= y- cy
+        r= np.maximum(np.hypot(dx, dy), 1e-3)
+        if self.goal== "orbit":
+            vr= (dx*vx+ dy*vy)/ r
+            vt= (dx*vy- dy*vx)/ r
+            e= (r- self.radius)/ self.radius
+            # the velocity matters once near the orbit; far off, only getting closer does
+            near= 1.0/ (1.0+ 16.0* e* e)
+            c= e* e+ near* (vr*vr+ (np.abs(vt)- self.v_circ)**2)/ (self.v_circ* self.v_circ)
+        else:
+            c= (np.maximum(self.radius- r, 0.0)/ self.radius)**2
+        if seg:
+            c+= AUTOPILOT_FUEL* ((bits & (IN_FORWARD| IN_REVERSE))!= 0)
+        dead&= self.alive
+        c+= dead* (AUTOPILOT_DEATH* (job['len']- f+ 1))
+        self.acc+= c* self.alive
+        self.alive&= ~dead
+
+    def _best(self):
+        # the rollouts are complete: update() ran them all during the burn
+        i= int(np.argmin(self.acc))
+        self.cost= float(self.acc[i])
+        return self.job['cand'][i]
 
-        # else do bounce => unify
-        (vx1,vy1, vx2,vy2)= elastic_bounce(
-            mA, mB,
-            objA['x'], objA['y'], objA['vx'], objA['vy'],
-            objB['x'], objB['y'], objB['vx'], objB['vy'],
-            e=1.0
-        )
-        objA['vx'], objA['vy']= vx1, vy1
-        objB['vx'], objB['vy']= vx2, vy2
+############################################################
+# CAMERA
+############################################################
+
+ZOOM_MIN   = max(SCREEN_WIDTH/ WORLD_WIDTH, SCREEN_HEIGHT/ WORLD_HEIGHT)  # one world fills the view
+ZOOM_MAX   = 1.0
+ZOOM_RATE  = 2.0        # zoom factor per second while -/= is held
+ZOOM_WHEEL = 2**0.25    # per mouse-wheel notch
+ZOOM_EASE  = 10.0       # 1/s; how quickly the view follows the target
+ZOOM_STEPS = 16         # the drawn zoom snaps to 1/16 octave, so scaled caches stay few
+ROCKET_MIN_ZOOM = 0.4   # the rocket stops shrinking here
+
+def snap_zoom(z):
+    z= 2.0** (round(math.log2(z)* ZOOM_STEPS)/ ZOOM_STEPS)
+    return min(ZOOM_MAX, max(ZOOM_MIN, z))
+
+class Camera:
+    """Centred on the rocket; the zoom eases toward a target, in log space."""
+    def __init__(self):
+        self.target= 1.0
+        self.zoom= 1.0
+
+    def zoom_by(self, factor):
+        self.target= min(ZOOM_MAX, max(ZOOM_MIN, self.target* factor))
+
+    def update(self, dt):
+        k= min(1.0, ZOOM_EASE* dt)
+        self.zoom*= (self.target/ self.zoom)** k
+
+    def view_zoom(self):
+        return snap_zoom(self.zoom)
+
+    def origin(self, x, y, zoom):
+        # world position of the view's top-left corner
+        return x- SCREEN_WIDTH/ (2*zoom), y- SCREEN_HEIGHT/ (2*zoom)
 
 ############################################################
 # DRAW
 ############################################################
 
-def draw_rocket(screen, rocket, forward_thrust_on, reverse_thrust_on, turn_left, turn_right):
-    rx= SCREEN_WIDTH/2
-    ry= SCREEN_HEIGHT/2
-    length= 30.0
+STAR_MIP_MIN = 0.5      # below this scale stars come from an aggregated mip
+IMPOSTOR_PX  = 3        # asteroids smaller than this (screen radius) are stamped
+SPOT_MIN_PX  = 5        # spots only on asteroids at least this big on screen
+
+def star_mip(stars, scale):
+    """
+    The stars to draw at `scale`: below STAR_MIP_MIN, one point per cell of
+    about a screen pixel with the brightness of the cell's stars summed,
+    built once per octave band and kept in the star dict.
+    """
+    if scale>= STAR_MIP_MIN:
+        return stars
+    band= int(math.floor(math.log2(1.0/ scale)))
+    mips= stars.setdefault('mips', {})
+    mip= mips.get(band)
+    if mip is None:
+        c= float(1 << band)
+        nx= int(WORLD_WIDTH// c)+ 1
+        cell= (stars['y']// c).astype(np.int64)* nx+ (stars['x']// c).astype(np.int64)
+        u, first, inv= np.unique(cell, return_index=True, return_inverse=True)
+        bri= np.minimum(np.bincount(inv, stars['bri'].astype(np.float64)), 255).astype(np.uint8)
+        # back in the stars' (random) order, so frac still thins evenly
+        order= np.argsort(first)
+        u= u[order]
+        mip= {'x': (u% nx+ 0.5)* c, 'y': (u// nx+ 0.5)* c, 'bri': bri[order]}
+        mips[band]= mip
+    return mip
+
+_DISCS= [np.array([(dx, dy) for dx in range(-r, r+1) for dy in range(-r, r+1) if dx*dx+ dy*dy<= r*r+ r])
+         for r in range(IMPOSTOR_PX)]
+
+def _stamp_discs(screen, sx, sy, rpx, grey):
+    # small filled discs straight into the pixel array, one radius at a time
+    w, h= screen.get_size()
+    r= np.minimum(rpx.astype(np.intp), IMPOSTOR_PX- 1)
+    px= pygame.surfarray.pixels3d(screen)
+    for k, off in enumerate(_DISCS):
+        sel= np.flatnonzero(r== k)
+        if not len(sel):
+            continue
+        x= (sx[sel].astype(np.intp)[:,None]+ off[:,0]).ravel()
+        y= (sy[sel].astype(np.intp)[:,None]+ off[:,1]).ravel()
+        g= np.repeat(grey[sel], len(off))
+        ok= (x>= 0) & (x< w) & (y>= 0) & (y< h)
+        px[x[ok], y[ok]]= g[ok][:,None]
+    del px
+
+def draw_rocket(screen, rocket, forward_thrust_on, reverse_thrust_on, turn_left, turn_right, center=None, scale=1.0):
+    if center is None:
+        rx= screen.get_width()/2
+        ry= screen.get_height()/2
+    else:
+        rx, ry= center
+    length= 30.0*scale
+    lw= max(1, int(round(3*scale)))
     rad= math.radians(rocket['heading'])
 
     nose_x= rx + length*math.cos(rad)
@@ -385,120 +2588,191 @@ def draw_rocket(screen, rocket, forward_thrust_on, reverse_thrust_on, turn_left,
 
     # forward thruster => red/orange
     if forward_thrust_on and not rocket['forcefield_on']:
-        flame_len=25
+        flame_len=25*scale
         flame_rad= rad+ math.pi
         fx= back_x+ random.uniform(0.8,1.2)* flame_len* math.cos(flame_rad)
         fy= back_y+ random.uniform(0.8,1.2)* flame_len* math.sin(flame_rad)
-        pygame.draw.line(screen,(255,165,0),(back_x,back_y),(fx,fy),3)
+        pygame.draw.line(screen,(255,165,0),(back_x,back_y),(fx,fy),lw)
 
     # reverse thruster => show from nose => blue
     if reverse_thrust_on and not rocket['forcefield_on']:
-        flame_len=25
+        flame_len=25*scale
         flame_rad= rad
         fx= nose_x+ random.uniform(0.8,1.2)* flame_len* math.cos(flame_rad)
         fy= nose_y+ random.uniform(0.8,1.2)* flame_len* math.sin(flame_rad)
-        pygame.draw.line(screen,(0,0,255),(nose_x,nose_y),(fx,fy),3)
+        pygame.draw.line(screen,(0,0,255),(nose_x,nose_y),(fx,fy),lw)
 
     if turn_left:
-        flame_len=15
+        flame_len=15*scale
         side_ang= rad- math.radians(90)
         sx, sy= right_x, right_y
         fx= sx+ flame_len* math.cos(side_ang)* random.uniform(0.8,1.2)
         fy= sy+ flame_len* math.sin(side_ang)* random.uniform(0.8,1.2)
-        pygame.draw.line(screen,(0,255,0),(sx,sy),(fx,fy),2)
+        pygame.draw.line(screen,(0,255,0),(sx,sy),(fx,fy),max(1, lw-1))
 
     if turn_right:
-        flame_len=15
+        flame_len=15*scale
         side_ang= rad+ math.radians(90)
         sx, sy= left_x, left_y
         fx= sx+ flame_len* math.cos(side_ang)* random.uniform(0.8,1.2)
         fy= sy+ flame_len* math.sin(side_ang)* random.uniform(0.8,1.2)
-        pygame.draw.line(screen,(0,255,0),(sx,sy),(fx,fy),2)
+        pygame.draw.line(screen,(0,255,0),(sx,sy),(fx,fy),max(1, lw-1))
 
     # Force field
     if rocket['forcefield_on']:
-        shield_rad=80
+        shield_rad=max(2, int(80*scale))
+        screen.blit(_shield_surface(shield_rad),(rx-shield_rad, ry-shield_rad))
+        # how far it pushes asteroids
+        pygame.draw.circle(screen,(0,120,0),(int(rx),int(ry)), max(2, int(FORCEFIELD_RADIUS*scale)),1)
+
+_SHIELDS= {}    # radius -> shield surface; zoom snaps, so only a few radii
+
+def _shield_surface(shield_rad):
+    srf= _SHIELDS.get(shield_rad)
+    if srf is None:
         srf= pygame.Surface((shield_rad*2, shield_rad*2), pygame.SRCALPHA)
         srf.fill((0,0,0,0))
         pygame.draw.circle(srf,(0,255,0,50),(shield_rad,shield_rad),shield_rad)
         pygame.draw.circle(srf,(0,255,0,150),(shield_rad,shield_rad),shield_rad,2)
-        screen.blit(srf,(rx-shield_rad, ry-shield_rad))
+        _SHIELDS[shield_rad]= srf
+    return srf
 
 
 def draw_object_tiled(screen, wx, wy, cam_x, cam_y, color, obj_type="circle", radius=1):
-    for dx in [-1,0,1]:
-        for dy in [-1,0,1]:
-            sx= (wx+ dx*WORLD_WIDTH)- cam_x
-            sy= (wy+ dy*WORLD_HEIGHT)- cam_y
-            if 0<=sx< screen.get_width() and 0<=sy< screen.get_height():
-                pygame.draw.circle(screen,color,(int(sx),int(sy)),radius)
-
-
-def draw_object_tiled_asteroid(screen, ast, cam_x, cam_y):
-    for dx in [-1,0,1]:
-        for dy in [-1,0,1]:
-            sx= (ast['x']+dx*WORLD_WIDTH)- cam_x
-            sy= (ast['y']+dy*WORLD_HEIGHT)- cam_y
-            if 0<=sx<screen.get_width() and 0<=sy<screen.get_height():
-                pygame.draw.circle(screen,ast['color'],(int(sx),int(sy)),int(ast['radius']))
-                for spot in ast['spots']:
-                    sxx= sx+ spot['ox']
-                    syy= sy+ spot['oy']
-                    pygame.draw.circle(screen,spot['c'],(int(sxx),int(syy)),int(spot['r']))
+    # the one wrapped copy that can be on screen, not all nine
+    sx= (wx- cam_x) % WORLD_WIDTH
+    sy= (wy- cam_y) % WORLD_HEIGHT
+    if sx< screen.get_width() and sy< screen.get_height():
+        pygame.draw.circle(screen,color,(int(sx),int(sy)),radius)
+
+
+def draw_stars(screen, stars, cam_x, cam_y, frac=1.0, scale=1.0):
+    """
+    Draws a star array as the 2x2 dots a radius-1 circle gives, written
+    straight into the pixel array instead of one draw call per star.
+    frac < 1 draws only a leading share; the stars are in random order,
+    so that is an even thinning.
+    """
+    w, h= screen.get_size()
+    stars= star_mip(stars, scale)
+    n= int(len(stars['x'])* frac)
+    if scale== 1.0:
+        sx= ((stars['x'][:n]- cam_x) % WORLD_WIDTH).astype(np.intp)
+        sy= ((stars['y'][:n]- cam_y) % WORLD_HEIGHT).astype(np.intp)
+    else:
+        sx= (((stars['x'][:n]- cam_x) % WORLD_WIDTH)* scale).astype(np.intp)
+        sy= (((stars['y'][:n]- cam_y) % WORLD_HEIGHT)* scale).astype(np.intp)
+    vis= (sx< w) & (sy< h)
+    sx= sx[vis]; sy= sy[vis]
+    bri= stars['bri'][:n][vis][:,None]
+    px= pygame.surfarray.pixels3d(screen)
+    # at half scale a single pixel upscales back to the 2x2 dot
+    dots= ((-1,-1),(0,-1),(-1,0),(0,0)) if scale> 0.5 else ((0,0),)
+    for ox, oy in dots:
+        x= sx+ ox
+        y= sy+ oy
+        ok= (x>= 0) & (y>= 0)
+        px[x[ok], y[ok]]= bri[ok]
+    del px
+
+
+def draw_asteroids(screen, field, cam_x, cam_y, idx=None, spots=True, scale=1.0):
+    # cull on the arrays, then draw only asteroids whose centre is on screen;
+    # ones a few pixels across are stamped in bulk, spots need SPOT_MIN_PX
+    w, h= screen.get_size()
+    if idx is None:
+        idx= np.arange(len(field))
+    sx= ((field.x[idx]- cam_x) % WORLD_WIDTH)* scale
+    sy= ((field.y[idx]- cam_y) % WORLD_HEIGHT)* scale
+    vis= np.flatnonzero((sx< w) & (sy< h))
+    rpx= field.radius[idx[vis]]* scale
+    small= rpx< IMPOSTOR_PX
+    if small.any():
+        k= vis[small]
+        _stamp_discs(screen, sx[k], sy[k], rpx[small], field.grey[idx[k]])
+        vis= vis[~small]
+        rpx= rpx[~small]
+    for k, r in zip(vis.tolist(), rpx.tolist()):
+        i= idx[k]
+        cx, cy= sx[k], sy[k]
+        g= int(field.grey[i])
+        pygame.draw.circle(screen,(g,g,g),(int(cx),int(cy)),max(1, int(r)))
+        if not spots or r< SPOT_MIN_PX:
+            continue
+        s0= int(field.spot_start[i])
+        for j in range(s0, s0+ int(field.spot_count[i])):
+            c= int(field.spot_c[j])
+            pygame.draw.circle(screen,(c,c,c),
+                               (int(cx+ field.spot_ox[j]*scale),int(cy+ field.spot_oy[j]*scale)),
+                               max(1, int(field.spot_r[j]*scale)))
 
 
 def draw_object_tiled_ring(screen,wx,wy,cam_x,cam_y,color,ring_radius):
-    for dx in [-1,0,1]:
-        for dy in [-1,0,1]:
-            sx= (wx+dx*WORLD_WIDTH)- cam_x
-            sy= (wy+dy*WORLD_HEIGHT)- cam_y
-            if 0<=sx<screen.get_width() and 0<=sy<screen.get_height():
-                pygame.draw.circle(screen,color,(int(sx),int(sy)),ring_radius,2)
+    sx= (wx- cam_x) % WORLD_WIDTH
+    sy= (wy- cam_y) % WORLD_HEIGHT
+    if sx< screen.get_width() and sy< screen.get_height():
+        pygame.draw.circle(screen,color,(int(sx),int(sy)),ring_radius,2)
 
 ############################################################
 # MAIN
 ############################################################
-def main():
+def main(level_name=None, quality="auto", render_scale=1.0, smooth_scale=False,
+         telemetry_path=None, telemetry_asteroids=False, belt_count=BELT_COUNT,
+         capture_path=None, capture_format="png"):
     pygame.init()
     screen= pygame.display.set_mode((SCREEN_WIDTH,SCREEN_HEIGHT))
     clock= pygame.time.Clock()
     font= pygame.font.SysFont("Arial",18)
 
-    level_name= run_level_menu(screen,font)
-    if level_name=="star":
-        lvl= LevelStar()
-        rocket_x= lvl.WORLD_WIDTH/2
-        rocket_y= lvl.WORLD_HEIGHT/2+2000
-    elif level_name=="hole":
-        lvl= LevelBlackHole()
-        rocket_x= lvl.WORLD_WIDTH/2
-        rocket_y= lvl.WORLD_HEIGHT/2+2000
+    if level_name is None:
+        # levels build in the background while the player chooses
+        preloader= LevelPreloader(screen, belt_count)
+        level_name= run_level_menu(screen, font, preloader)
+        lvl, minimap= preloader.get(level_name)
+        preloader.close()
     else:
-        lvl= LevelFlat()
-        rocket_x= lvl.WORLD_WIDTH/2
-        rocket_y= lvl.WORLD_HEIGHT/2
+        lvl= make_level(level_name, **level_options(level_name, belt_count))
+        minimap= Minimap(lvl)
 
     # We'll keep rocket in the same data structure as everything else
-    rocket={
-        'type':'rocket',
-        'x':rocket_x,'y':rocket_y,
-        'vx':0,'vy':0,
-        'radius':ROCKET_RAD,
-        'mass':10.0,  # rocket mass
-        'heading':0,
-        'angvel':0,
-        'forcefield_on':False,  # or shield_on
-        'shield_on':False,      # for collision logic
-    }
-
-    # Convert asteroids => type 'asteroid'
-    for ast in lvl.asteroids:
-        ast['type']='asteroid'
+    rocket= new_rocket(*lvl.spawn_point())
+    show_minimap= True
+    field_overlay= FieldOverlay()
+    show_field= False
+    predictor= TrajectoryPredictor()
+    show_prediction= True
+    show_trails= False
+    rocket_trail= Trails(1, color=(255,120,60))
+    field_trails= None     # built for the current asteroid field when shown
+    # "auto" adapts from the top tier; a tier name pins it
+    if quality== "auto":
+        qc= QualityController(1000.0/ FPS)
+    else:
+        qc= QualityController(1000.0/ FPS, tier_by_name(quality), auto=False)
+    lvl.set_quality(qc.tier)
+    show_stats= False
+    camera= Camera()
+    hud= Hud(font, HUD_LINES)
+    stats_hud= Hud(font, (('quality',""), ('budget',"")), width=520)
+    tool_index= 0
+    warp= 0        # index into WARP_FACTORS
+    warped= 0      # ticks the last frame ran
+    pilot= None    # Autopilot while it flies
+    draw_s= 0.0    # the last frame's time after the physics
+    warp_s= 0.0    # the last frame's time in warp ticks, left out of the quality budget
+    view= None     # offscreen world surface when rendering below native size
+    tel= None
+    if telemetry_path:
+        tel= telemetry.Telemetry(telemetry_path, len(lvl.asteroids) if telemetry_asteroids else 0)
+    cap= None
+    if capture_path:
+        cap= capture.FrameCapture(capture_path, screen.get_size(), capture_format, FPS)
+    tick= 0
 
     # We'll keep bullets, bombs, pulses in lists
     bullets=[]
     bombs=[]
-    lightpulses=[]
+    pulses= lightpulse.PulseField(lvl.light_tables(), lvl.WORLD_WIDTH, lvl.WORLD_HEIGHT)
 
     # We'll define a game_state
     game_state={
@@ -506,33 +2780,27 @@ def main():
     }
 
     def reset_game():
-        nonlocal rocket, bullets, bombs, lightpulses, game_state
+        nonlocal rocket, bullets, bombs, game_state, pilot
+        pilot= None
         game_state['game_over']=False
-        if level_name=="star":
-            newlvl= LevelStar()
-            rocket['x']= newlvl.WORLD_WIDTH/2
-            rocket['y']= newlvl.WORLD_HEIGHT/2+2000
-            lvl.asteroids= newlvl.asteroids
-        elif level_name=="hole":
-            newlvl= LevelBlackHole()
-            rocket['x']= newlvl.WORLD_WIDTH/2
-            rocket['y']= newlvl.WORLD_HEIGHT/2+2000
-            lvl.asteroids= newlvl.asteroids
-        else:
-            newlvl= LevelFlat()
-            rocket['x']= newlvl.WORLD_WIDTH/2
-            rocket['y']= newlvl.WORLD_HEIGHT/2
-            lvl.asteroids= newlvl.asteroids
+        rocket['x'], rocket['y']= lvl.spawn_point()
+        lvl.reset_asteroids()
         rocket['vx']=0; rocket['vy']=0; rocket['heading']=0; rocket['angvel']=0
         rocket['forcefield_on']=False
         rocket['shield_on']=False
+        rocket['cat']=CAT_ROCKET
         bullets.clear()
         bombs.clear()
-        lightpulses.clear()
+        pulses.clear()
+        rocket_trail.clear()
 
     running=True
     while running:
-        dt_real= clock.tick(FPS)/1000.0
+        frame_ms= clock.tick(FPS)
+        frame_t0= time.perf_counter()
+        dt_real= frame_ms/1000.0
+        if qc.record(frame_ms, clock.get_rawtime(), warp_s* 1000.0):
+            lvl.set_quality(qc.tier)
         for event in pygame.event.get():
             if event.type==pygame.QUIT:
                 running=False
@@ -540,124 +2808,252 @@ def main():
                 if event.key==pygame.K_ESCAPE:
                     running=False
                 elif event.key==pygame.K_q and not game_state['game_over']:
-                    pass # cycle tools if desired
-                    # we do indexing but let's do that
-                    # (the user can cycle if they want)
-                    # we'll do it:
-                    pass
+                    tool_index= (tool_index- 1) % len(TOOLS)
                 elif event.key==pygame.K_e and not game_state['game_over']:
-                    pass
+                    tool_index= (tool_index+ 1) % len(TOOLS)
+                elif event.key==pygame.K_m:
+                    show_minimap= not show_minimap
+                elif event.key==pygame.K_g:
+                    show_field= not show_field
+                elif event.key==pygame.K_t:
+                    show_prediction= not show_prediction
+                elif event.key==pygame.K_l:
+                    show_trails= not show_trails
+                    rocket_trail.clear()
+                    field_trails= None
+                elif event.key==pygame.K_F3:
+                    show_stats= not show_stats
+                elif event.key==pygame.K_F9 and cap:
+                    cap.paused= not cap.paused
+                elif event.key==pygame.K_0:
+                    camera.target= 1.0
+                elif event.key==pygame.K_PERIOD:
+                    warp= min(warp+ 1, len(WARP_FACTORS)- 1)
+                elif event.key==pygame.K_COMMA:
+                    warp= max(warp- 1, 0)
+                elif event.key==pygame.K_p and not game_state['game_over']:
+                    if pilot or not Autopilot.available(lvl):
+                        pilot= None
+                    else:
+                        pilot= Autopilot(lvl, lvl.AUTOPILOT_GOAL)
                 elif event.key==pygame.K_SPACE:
                     if game_state['game_over']:
                         reset_game()
                     else:
                         # use tool
-                        # we can do same logic as before
-                        tool_index=0 # hack, or store it somewhere
-                        # let's do direct:
-                        pass
+                        if TOOLS[tool_index]=="LightPulse":
+                            pulses.emit(rocket['x'], rocket['y'], math.radians(rocket['heading']))
+                        elif TOOLS[tool_index]=="ForceField":
+                            # thrusters are off while it's up (apply_input)
+                            rocket['forcefield_on']= not rocket['forcefield_on']
                 elif event.key==pygame.K_r:
                     if game_state['game_over']:
                         reset_game()
                     else:
                         reset_game()
+            elif event.type==pygame.MOUSEWHEEL:
+                camera.zoom_by(ZOOM_WHEEL** event.y)
         # handle keys
         keys= pygame.key.get_pressed()
-        turn_left=False
-        turn_right=False
-        forward_thrust=False
-        reverse_thrust=False
-        torque=50.0
-
-        if keys[pygame.K_a]:
-            rocket['angvel']-= torque*dt_real
-            turn_left=True
-        if keys[pygame.K_d]:
-            rocket['angvel']+= torque*dt_real
-            turn_right=True
-        if keys[pygame.K_w] and not rocket['forcefield_on']:
-            # forward thrust
-            h_rad= math.radians(rocket['heading'])
-            rocket['vx']+= 100.0* math.cos(h_rad)* dt_real
-            rocket['vy']+= 100.0* math.sin(h_rad)* dt_real
-            rocket['vx'], rocket['vy']= limit_speed(rocket['vx'], rocket['vy'])
-            forward_thrust=True
-        # user wants s => backward thrust
-        if keys[pygame.K_s] and not rocket['forcefield_on']:
-            h_rad= math.radians(rocket['heading'])
-            rocket['vx']-= 100.0* math.cos(h_rad)* dt_real
-            rocket['vy']-= 100.0* math.sin(h_rad)* dt_real
-            rocket['vx'], rocket['vy']= limit_speed(rocket['vx'], rocket['vy'])
-            reverse_thrust=True
-
-        rocket['shield_on']= rocket['forcefield_on'] # unify naming
-
-        # update rocket rotation & position
-        rocket['vx']+= lvl.force_func(rocket['x'],rocket['y'],rocket['vx'],rocket['vy'])[0]*BASE_DT
-        rocket['vy']+= lvl.force_func(rocket['x'],rocket['y'],rocket['vx'],rocket['vy'])[1]*BASE_DT
-        rocket['vx'], rocket['vy']= limit_speed(rocket['vx'], rocket['vy'])
-        rocket['heading']+= rocket['angvel']*BASE_DT
-        rocket['x']+= rocket['vx']*BASE_DT
-        rocket['y']+= rocket['vy']*BASE_DT
-        rocket['x'], rocket['y']= wrap_pos(rocket['x'], rocket['y'])
-
-        # lethal check rocket
-        if lvl.lethal_check(rocket['x'], rocket['y']):
+        bits= read_input_bits(keys)
+        if bits:
+            pilot= None    # the player takes over
+        elif pilot and not game_state['game_over']:
+            bits= pilot.update(lvl, rocket)
+        active= apply_input(rocket, bits, dt_real)
+        if keys[pygame.K_MINUS] or keys[pygame.K_KP_MINUS]:
+            camera.zoom_by(ZOOM_RATE** -dt_real)
+        if keys[pygame.K_EQUALS] or keys[pygame.K_KP_PLUS]:
+            camera.zoom_by(ZOOM_RATE** dt_real)
+        camera.update(dt_real)
+        if active:
+            warp= 0    # the ship is flown at 1x
+        turn_left= bool(active & IN_LEFT)
+        turn_right= bool(active & IN_RIGHT)
+        forward_thrust= bool(active & IN_FORWARD)
+        reverse_thrust= bool(active & IN_REVERSE)
+
+        # update rocket rotation & position, lethal check rocket
+        was_over= game_state['game_over']
+        if tel:
+            # the gravity integrate_rocket is about to apply
+            ax, ay= lvl.force_func(rocket['x'], rocket['y'], rocket['vx'], rocket['vy'])
+        if integrate_rocket(lvl, rocket):
             game_state['game_over']=True
+            if tel and not was_over:
+                tel.event(tick, telemetry.EV_LETHAL)
+        if lvl.DRIFT:
+            lvl.field_schedule().advance(lvl, [(rocket['x'], rocket['y'])], shields=shield_sources([rocket]))
+        pulses.step(BASE_DT)
 
         # we don't do bullet update here, but let's do so
         # eventually you'd handle bullets, bombs, pulses
         # or replicate logic from prior code
         # skip for brevity
 
-        # collisions => unify across rocket, bullets, asteroids, bombs
-        # let's build a single list of objects for collisions
-        # rocket, asteroids, bullets, bombs
-
-        all_objects=[]
-        # rocket
-        all_objects.append(rocket)
-        # asteroids
-        for a in lvl.asteroids:
-            all_objects.append(a)
-        # bullets
-        # bombs
+        # collisions => rocket against the asteroid field, then asteroid pairs
+        # bullets, bombs: none yet
         # skip pulses since they're area-based?
-        # or we can do if we want them to bounce?? Probably not
-
-        # next, pairwise collisions
-        for i in range(len(all_objects)):
-            for j in range(i+1,len(all_objects)):
-                handle_collision(all_objects[i],all_objects[j],rocket, game_state)
-                if game_state['game_over']:
-                    break
-            if game_state['game_over']:
-                break
-
-        # draw
-        screen.fill((0,0,0))
-        cam_x= rocket['x']- SCREEN_WIDTH/2
-        cam_y= rocket['y']- SCREEN_HEIGHT/2
-        lvl.draw_background(screen, rocket, cam_x, cam_y)
+        hits= collide_rocket_field(rocket, lvl.asteroids, game_state)
+        pairs= 0
+        if not game_state['game_over']:
+            pairs= lvl.field_schedule().collide(lvl) if lvl.DRIFT else collide_field(lvl.asteroids)
+        if tel:
+            for i in hits:
+                tel.event(tick, telemetry.EV_CRASH if game_state['game_over'] else telemetry.EV_BOUNCE, i)
+            if pairs:
+                tel.event(tick, telemetry.EV_PAIR, pairs)
+            flags= active | (FLAG_SHIELD if rocket['shield_on'] else 0) | (FLAG_DEAD if game_state['game_over'] else 0)
+            tel.record(tick, rocket, ax, ay, flags, lvl.asteroids)
+        tick+= 1
+        # time warp: the rest of this frame's ticks, undrawn and unrecorded
+        warped= 1
+        warp_s= 0.0
+        if warp and not game_state['game_over']:
+            t_warp= time.perf_counter()
+            ran, stopped= warp_ticks(lvl, rocket, game_state, WARP_FACTORS[warp]- 1,
+                                     frame_t0+ WARP_FILL/ FPS- draw_s)
+            if ran:
+                pulses.advance(BASE_DT* ran, BASE_DT)
+            warp_s= time.perf_counter()- t_warp
+            tick+= ran
+            warped+= ran
+            if stopped:
+                warp= 0
+        t_draw= time.perf_counter()
+        if show_trails:
+            rocket_trail.push(rocket['x'], rocket['y'], lvl.WORLD_WIDTH, lvl.WORLD_HEIGHT)
+            # only drifting asteroids leave trails; a reset brings a new field
+            f= lvl.asteroids
+            if lvl.DRIFT and (field_trails is None or field_trails[0] is not f):
+                field_trails= (f, Trails(len(f)))
+            if field_trails:
+                field_trails[1].push(f.x, f.y, lvl.WORLD_WIDTH, lvl.WORLD_HEIGHT)
+
+        if show_prediction and not game_state['game_over']:
+            predictor.update(lvl, rocket, dirty=bool(active & (IN_FORWARD|IN_REVERSE)))
+
+        # draw: the world goes into `view` at the render scale and is
+        # upscaled in one pass; minimap and text stay at native resolution.
+        # draw_background covers the whole target, so no fill first.
+        # scale: render scale times the (snapped) camera zoom
+        zoom= camera.view_zoom()
+        scale= min(render_scale, qc.tier['render_scale'])
+        if scale< 1.0:
+            size= (int(SCREEN_WIDTH*scale), int(SCREEN_HEIGHT*scale))
+            if view is None or view.get_size()!= size:
+                view= pygame.Surface(size).convert()
+            target= view
+        else:
+            target= screen
+        cam_x, cam_y= camera.origin(rocket['x'], rocket['y'], zoom)
+        wscale= scale* zoom
+        lvl.draw_background(target, rocket, cam_x, cam_y, wscale, zoom)
+        if show_field:
+            field_overlay.draw(target, lvl, cam_x, cam_y, wscale)
+        if show_trails:
+            if field_trails:
+                field_trails[1].draw(target, cam_x, cam_y, lvl.WORLD_WIDTH, lvl.WORLD_HEIGHT, wscale)
+            rocket_trail.draw(target, cam_x, cam_y, lvl.WORLD_WIDTH, lvl.WORLD_HEIGHT, wscale)
+        pulses.draw(target, cam_x, cam_y, wscale)
+        draw_asteroids(target, lvl.asteroids, cam_x, cam_y, spots=qc.tier['spots'], scale=wscale)
+        if show_prediction and not game_state['game_over']:
+            predictor.draw(target, cam_x, cam_y, lvl.WORLD_WIDTH, lvl.WORLD_HEIGHT, scale=wscale)
         # rocket
-        draw_rocket(screen, rocket, forward_thrust, reverse_thrust, turn_left, turn_right)
+        draw_rocket(target, rocket, forward_thrust, reverse_thrust, turn_left, turn_right,
+                    scale=scale* max(zoom, ROCKET_MIN_ZOOM))
+        if target is not screen:
+            # nearest-neighbour is ~1-2.5 ms at this size, smoothscale ~8 ms
+            upscale= pygame.transform.smoothscale if smooth_scale else pygame.transform.scale
+            upscale(view, (SCREEN_WIDTH,SCREEN_HEIGHT), screen)
+        if show_minimap:
+            minimap.draw(screen, lvl, rocket, cam_x, cam_y, zoom)
+        hud.update(hud_values(lvl, rocket, tool_index, clock.get_fps(), warp, warped, pilot))
+        hud.draw(screen)
+        if show_stats:
+            st= qc.stats()
+            stats_hud.update({
+                'quality': "quality %s%s  scale %.2f  zoom %.2f  changes %d" % (
+                    st['tier'], " (auto)" if st['auto'] else "", scale, zoom, st['changes']),
+                'budget': "busy %.1f/%.1f ms (p95 %.1f)  frame %.1f ms" % (
+                    st['busy_mean_ms'], st['budget_ms'], st['busy_p95_ms'], st['frame_mean_ms']),
+            })
+            stats_hud.draw(screen, (10, 10))
 
         # handle game_over?
         if game_state['game_over']:
-            msg= "GAME OVER! Press SPACE to restart"
-            t_s= font.render(msg, True, (255,0,0))
+            t_s= hud.cache.text("GAME OVER! Press SPACE to restart", (255,0,0))
             screen.blit(t_s,(SCREEN_WIDTH/2-100, SCREEN_HEIGHT/2))
+        if cap:
+            cap.grab(screen, tick)
+        draw_s= time.perf_counter()- t_draw
         pygame.display.flip()
 
+    if cap:
+        cap.close()
+        st= cap.stats()
+        print("capture: %d frames to %s, %d dropped, %d skipped, %.2f ms/frame in the loop"
+              % (st['frames'], capture_path, st['dropped'], st['skipped'], st['grab_ms']))
+    if tel:
+        tel.close()
+        st= tel.stats()
+        print("telemetry: %d ticks to %s, %d dropped (%d events), %.1f us/tick in the loop (%.3f%% of wall time)"
+              % (st['rows'], telemetry_path, st['dropped'], st['events_dropped'],
+                 st['record_us_per_tick'], st['overhead_pct']))
     pygame.quit()
 
-def run_level_menu(screen, font):
-    menu_options= ["Flat","Star","Hole"]
+class LevelPreloader:
+    """
+    Builds levels on a worker thread while the menu is up: the level with
+    its assets, its render caches (prewarm), its light tables and its minimap. Built levels
+    are kept, so going back to one is free; a queued build that hasn't
+    started is dropped when another level is highlighted.
+    """
+    def __init__(self, screen, belt_count=BELT_COUNT):
+        self.screen= screen
+        self.belt_count= belt_count
+        self._pool= ThreadPoolExecutor(1, thread_name_prefix="preload")
+        self._jobs= {}       # level name -> future of (level, minimap)
+
+    def _build(self, name):
+        lvl= make_level(name, **level_options(name, self.belt_count))
+        lvl.prewarm(self.screen)
+        # LightPulse tables: seconds to build cold, so not when the level starts
+        lvl.light_tables()
+        return lvl, Minimap(lvl)
+
+    def request(self, name):
+        for other, fut in list(self._jobs.items()):
+            if other!= name and fut.cancel():
+                del self._jobs[other]
+        if name not in self._jobs:
+            self._jobs[name]= self._pool.submit(self._build, name)
+
+    def ready(self, name):
+        fut= self._jobs.get(name)
+        return fut is not None and fut.done()
+
+    def get(self, name):
+        """(level, minimap), waiting for the build if it is still running."""
+        self.request(name)
+        return self._jobs[name].result()
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+MENU_POLL_MS= 100    # menu wakes this often to notice a finished preload
+
+def run_level_menu(screen, font, preloader=None):
+    menu_options= ["Flat","Star","Hole","Belt","System"]
     idx=0
-    clock= pygame.time.Clock()
+    dirty= True
+    shown_ready= None
+    if preloader:
+        preloader.request(menu_options[idx].lower())
     while True:
-        dt= clock.tick(60)
-        for event in pygame.event.get():
+        # sleep until something happens instead of redrawing at 60 FPS
+        for event in [pygame.event.wait(MENU_POLL_MS)]+ pygame.event.get():
             if event.type==pygame.QUIT:
                 pygame.quit()
                 sys.exit(0)
@@ -667,10 +3063,24 @@ def run_level_menu(screen, font):
                     sys.exit(0)
                 elif event.key in [pygame.K_LEFT, pygame.K_a]:
                     idx= (idx-1)% len(menu_options)
+                    dirty= True
                 elif event.key in [pygame.K_RIGHT, pygame.K_d]:
                     idx= (idx+1)% len(menu_options)
+                    dirty= True
                 elif event.key==pygame.K_RETURN:
                     return menu_options[idx].lower()
+            elif event.type==pygame.VIDEOEXPOSE:
+                dirty= True
+        name= menu_options[idx].lower()
+        if preloader:
+            preloader.request(name)
+            ready= preloader.ready(name)
+            if ready!= shown_ready:
+                shown_ready= ready
+                dirty= True
+        if not dirty:
+            continue
+        dirty= False
         screen.fill((20,20,30))
         title= "SPACE-FORCE: SELECT LEVEL"
         t_surf= font.render(title,True,(255,255,255))
@@ -679,10 +3089,427 @@ def run_level_menu(screen, font):
             color= (200,200,100) if i==idx else (200,200,200)
             txt= font.render(opt,True,color)
             screen.blit(txt,(SCREEN_WIDTH//2-50+ i*150, 300))
+        if preloader:
+            status= "ready" if shown_ready else "loading..."
+            s_s= font.render(status,True,(120,200,120) if shown_ready else (150,150,150))
+            screen.blit(s_s,(SCREEN_WIDTH//2-50+ idx*150, 330))
         instruct= "Use Left/Right, Enter=confirm, Esc=quit"
         i_s= font.render(instruct,True,(200,200,200))
         screen.blit(i_s,(SCREEN_WIDTH//2-200,SCREEN_HEIGHT-100))
         pygame.display.flip()
 
+def hud_values(lvl, rocket, tool_index, fps, warp=0, warped=1, pilot=None):
+    """The HUD lines as text, rounded to what is shown so they change rarely."""
+    spd= math.hypot(rocket['vx'], rocket['vy'])
+    near= None
+    for (cx, cy, _gm, _rng, _lethal) in lvl.attractors():
+        # nearest wrapped image of the source
+        dx= (cx- rocket['x']+ lvl.WORLD_WIDTH/2) % lvl.WORLD_WIDTH- lvl.WORLD_WIDTH/2
+        dy= (cy- rocket['y']+ lvl.WORLD_HEIGHT/2) % lvl.WORLD_HEIGHT- lvl.WORLD_HEIGHT/2
+        d= math.hypot(dx, dy)
+        near= d if near is None else min(near, d)
+    return {
+        'speed':   "%.1f  (%.5f c)" % (spd, spd/ C_LIGHT),
+        'heading': "%d deg" % (int(round(rocket['heading'])) % 360),
+        'tool':    TOOLS[tool_index],
+        'shield':  "ON" if rocket['forcefield_on'] else "off",
+        'gravity': "none" if near is None else "%d away" % int(near),
+        'fps':     "%d" % int(round(fps)),
+        # set factor, and ticks actually run when that falls short
+        'warp':    "%dx" % WARP_FACTORS[warp]+ ("" if warped>= WARP_FACTORS[warp] else "  (%dx)" % warped),
+        'pilot':   pilot.goal if pilot else "off",
+    }
+
+HUD_LINES= (('speed',"speed"), ('heading',"heading"), ('tool',"tool"),
+            ('shield',"shield"), ('gravity',"gravity"), ('fps',"fps"), ('warp',"warp"),
+            ('pilot',"autopilot"))
+
+############################################################
+# HEADLESS
+############################################################
+
+def _headless_world(level_name, seed=None, belt_count=BELT_COUNT):
+    lvl= make_level(level_name, seed, **level_options(level_name, belt_count))
+    rocket= new_rocket(*lvl.spawn_point())
+    rocket['forcefield_on']= rocket['shield_on']= True
+    rocket['cat']= CAT_SHIELD
+    return lvl, rocket, {'game_over':False}
+
+def _headless_tick(lvl, rocket, gs, multirate=True):
+    # returns the asteroid pairs that touched
+    if integrate_rocket(lvl, rocket):
+        rocket['x'], rocket['y']= lvl.spawn_point()
+        rocket['vx']= rocket['vy']= 0
+        gs['respawns']= gs.get('respawns', 0)+ 1
+    sched= lvl.field_schedule() if lvl.DRIFT and multirate else None
+    if sched:
+        sched.advance(lvl, [(rocket['x'], rocket['y'])], shields=shield_sources([rocket]))
+    elif lvl.DRIFT:
+        advance_field(lvl, lvl.asteroids, shields=shield_sources([rocket]))
+    collide_rocket_field(rocket, lvl.asteroids, gs)
+    return sched.collide(lvl) if sched else collide_field(lvl.asteroids)
+
+def run_headless(level_name, ticks, seed=None, belt_count=BELT_COUNT, multirate=True, autopilot=None):
+    """
+    Runs the per-tick physics of main() with no window: gravity and the
+    rocket, drifting asteroids, rocket and asteroid collisions. The rocket
+    coasts with its shield up; a lethal hit respawns it. Prints tick times.
+    multirate=False steps every asteroid every tick instead of FieldSchedule.
+    autopilot: a goal in AUTOPILOT_GOALS; an Autopilot flies the rocket,
+    shield down, and its planning time and where it got to are printed too.
+    """
+    lvl, rocket, gs= _headless_world(level_name, seed, belt_count)
+    pilot= None
+    if autopilot:
+        if not Autopilot.available(lvl):
+            print("%s: no attractor to fly to" % level_name)
+            return
+        pilot= Autopilot(lvl, autopilot)
+        plan_t= np.empty(ticks)
+        rocket['forcefield_on']= rocket['shield_on']= False
+        rocket['cat']= CAT_ROCKET
+    times= np.empty(ticks)
+    pairs= 0
+    hits= 0
+    for t in range(ticks):
+        if pilot:
+            apply_input(rocket, pilot.update(lvl, rocket), 1.0/ FPS)
+            plan_t[t]= pilot.plan_s
+        t0= time.perf_counter()
+        pairs+= _headless_tick(lvl, rocket, gs, multirate)
+        times[t]= time.perf_counter()- t0
+        if gs['game_over']:
+            hits+= 1
+            gs['game_over']= False
+    times*= 1000.0
+    print("%s: %d asteroids, %d ticks, %s kernels%s  tick mean %.2f ms  p50 %.2f  p95 %.2f  max %.2f  (%.1f pairs/tick)"
+          % (level_name, len(lvl.asteroids), ticks, kernels.BACKEND, "" if multirate else ", full rate",
+             times.mean(), np.percentile(times, 50), np.percentile(times, 95), times.max(), pairs/ max(1, ticks)))
+    if pilot:
+        plan_t*= 1000.0
+        cx, cy= pilot.center
+        dx= rocket['x']- cx; dy= rocket['y']- cy
+        r= max(math.hypot(dx, dy), 1e-3)
+        print("autopilot %s: plan mean %.2f ms/frame  p99 %.2f  r %.0f (goal %.0f)  radial %.2f  tangential %.2f (circular %.2f)"
+              "  %d lethal respawns, %d asteroid hits"
+              % (pilot.goal, plan_t.mean(), np.percentile(plan_t, 99), r, pilot.radius,
+                 (dx*rocket['vx']+ dy*rocket['vy'])/ r, abs(dx*rocket['vy']- dy*rocket['vx'])/ r,
+                 pilot.v_circ, gs.get('respawns', 0), hits))
+
+def check_rates(level_name, ticks, seed=None, belt_count=BELT_COUNT):
+    """
+    Runs the same world at full rate and multi-rate side by side and
+    prints the tick times of each and how far the asteroids were apart:
+    tick by tick, those kicked every tick so far (the first tier) that
+    have touched neither another body nor the rocket; at the end, those
+    in a slower tier throughout that never touched anything nor came in
+    reach of the rocket's force field, and the rest. Returns False if one
+    of the first is ever not exactly where full rate put it, or there
+    never was one, or one of the slow ones ends more than RATE_ERR away.
+    The rocket starts beside an asteroid where they are thickest, moving
+    with it.
+    """
+    full, rocket_f, gs_f= _headless_world(level_name, seed, belt_count)
+    multi, rocket_m, gs_m= _headless_world(level_name, seed, belt_count)
+    fa, ma= full.asteroids, multi.asteroids
+    w, h= full.WORLD_WIDTH, full.WORLD_HEIGHT
+    sched= multi.field_schedule()
+    if len(ma):
+        # the rocket beside an asteroid in the most crowded cell the size of
+        # the first tier, moving with it, so there are bodies to compare
+        nx= max(1, int(w// RATE_TIERS[0][0])); ny= max(1, int(h// RATE_TIERS[0][0]))
+        key= (ma.x* nx// w).astype(int)% nx* ny+ (ma.y* ny// h).astype(int)% ny
+        i= int(np.argmax(np.bincount(key)[key]))
+        for r in (rocket_f, rocket_m):
+            r['x']= (ma.x[i]+ ma.radius[i]+ r['radius']+ FORCEFIELD_RADIUS)% w
+            r['y']= float(ma.y[i])
+            r['vx']= float(ma.vx[i]); r['vy']= float(ma.vy[i])
+    near= np.ones(len(ma), bool)      # in the first tier every tick
+    far= np.ones(len(ma), bool)       # in a slower tier every tick
+    tainted= np.zeros(len(ma), bool)  # touched the rocket or another body
+    touched= np.zeros(len(ma), bool)  # touched anything, or was in reach of the force field
+    compared= 0                       # body-ticks of near, untainted bodies checked
+    worst= 0.0
+    t_full= t_multi= 0.0
+    for _ in range(ticks):
+        t0= time.perf_counter()
+        _headless_tick(full, rocket_f, gs_f, multirate=False)
+        t1= time.perf_counter()
+        _headless_tick(multi, rocket_m, gs_m)
+        t2= time.perf_counter()
+        t_full+= t1- t0; t_multi+= t2- t1
+        near&= sched.period== 1
+        far&= sched.period> 1
+        # once the rockets part (a bounce off a body that moved differently)
+        # their force fields push different bodies
+        apart= any(rocket_m[k]!= rocket_f[k] for k in ('x', 'y', 'vx', 'vy'))
+        for a, r in ((ma, rocket_m), (fa, rocket_f)):
+            # any contact: the two runs find different pairs, and a body in
+            # more than one is resolved in their order
+            i, j= field_pairs(a, w, h)
+            tainted[i]= True; tainted[j]= True
+            dx= (a.x- r['x']+ w/2)% w- w/2
+            dy= (a.y- r['y']+ h/2)% h- h/2
+            d= np.hypot(dx, dy)
+            tainted|= d<= a.radius+ (FORCEFIELD_RADIUS if apart else r['radius'])
+            touched|= tainted
+            touched|= d<= a.radius+ FORCEFIELD_RADIUS
+        clean= np.flatnonzero(near & ~tainted)
+        if len(clean):
+            dx= (ma.x[clean]- fa.x[clean]+ w/2)% w- w/2
+            dy= (ma.y[clean]- fa.y[clean]+ h/2)% h- h/2
+            worst= max(worst, float(np.hypot(dx, dy).max()))
+            compared+= len(clean)
+    dx= (ma.x- fa.x+ w/2)% w- w/2
+    dy= (ma.y- fa.y+ h/2)% h- h/2
+    err= np.hypot(dx, dy)
+    slow= far & ~touched
+    print("%s: %d asteroids, %d ticks  tick full %.2f ms  multi-rate %.2f ms  (%.1fx)"
+          % (level_name, len(ma), ticks, 1000.0* t_full/ ticks, 1000.0* t_multi/ ticks, t_full/ max(t_multi, 1e-9)))
+    if compared:
+        print("  %-16s %5d body-ticks  max %.3g world units from full rate"
+              % ("near, untouched", compared, worst))
+    for name, sel in (("near, touched", near & tainted), ("far, untouched", slow), ("rest", ~near & ~slow)):
+        if sel.any():
+            print("  %-16s %5d bodies  max %.3g  median %.3g world units from full rate"
+                  % (name, sel.sum(), err[sel].max(), np.median(err[sel])))
+    ok= True
+    if len(ma) and not compared:
+        print("FAIL: no body in the first tier untouched, nothing to compare")
+        ok= False
+    elif worst!= 0.0:
+        print("FAIL: near bodies moved differently from full rate")
+        ok= False
+    if slow.any() and err[slow].max()> RATE_ERR:
+        print("FAIL: far bodies more than %g world units from full rate" % RATE_ERR)
+        ok= False
+    return ok
+
+ALLOC_WARMUP   = 50       # ticks before measuring, so scratch buffers have grown
+ALLOC_BASE     = 32768    # bytes a tick may allocate at peak, whatever the body count
+ALLOC_LEAK     = 64       # bytes per tick the live total may grow by
+
+def check_allocs(level_name, ticks, seed=None, belt_count=BELT_COUNT, budget=None):
+    """
+    Runs `ticks` headless ticks under tracemalloc after ALLOC_WARMUP and
+    prints, per tick, the peak bytes allocated above what was live at its
+    start, the growth of the live total, and the garbage collector's runs
+    and pauses. A kernels.scratch buffer growing (a tick with more pairs or
+    near bodies than any before) is counted apart: once grown it is reused,
+    so it is neither a tick's allocation nor a leak. Returns False when the
+    worst tick goes over `budget` bytes (ALLOC_BASE by default) or the live
+    total grows by more than ALLOC_LEAK a tick.
+    """
+    import gc, tracemalloc
+    lvl, rocket, gs= _headless_world(level_name, seed, belt_count)
+    if budget is None:
+        budget= ALLOC_BASE
+    for _ in range(ALLOC_WARMUP):
+        _headless_tick(lvl, rocket, gs)
+    peaks= np.zeros(ticks, np.int64)
+    runs= [0, 0, 0]
+    pauses= []
+    t_gc= [0.0]
+
+    def on_gc(phase, info):
+        if phase== "start":
+            t_gc[0]= time.perf_counter()
+        else:
+            runs[info['generation']]+= 1
+            pauses.append(time.perf_counter()- t_gc[0])
+
+    gc.callbacks.append(on_gc)
+    tracemalloc.start()
+    try:
+        base= tracemalloc.get_traced_memory()[0]
+        held0= kernels.scratch_bytes()[0]
+        for t in range(ticks):
+            tracemalloc.reset_peak()
+            cur= tracemalloc.get_traced_memory()[0]
+            grown= kernels.scratch_bytes()[1]
+            _headless_tick(lvl, rocket, gs)
+            peaks[t]= tracemalloc.get_traced_memory()[1]- cur- (kernels.scratch_bytes()[1]- grown)
+        held= kernels.scratch_bytes()[0]- held0
+        growth= (tracemalloc.get_traced_memory()[0]- base- held)/ max(1, ticks)
+    finally:
+        tracemalloc.stop()
+        gc.callbacks.remove(on_gc)
+    pauses= np.array(pauses)* 1000.0
+    print("%s: %d asteroids, %d ticks  alloc/tick p50 %d B  p99 %d  max %d  (budget %d)  live growth %.1f B/tick"
+          "  scratch grew %d B"
+          % (level_name, len(lvl.asteroids), ticks, np.percentile(peaks, 50), np.percentile(peaks, 99),
+             peaks.max(), budget, growth, held))
+    print("gc: %d/%d/%d runs (gen 0/1/2)  pause total %.2f ms  max %.2f ms"
+          % (runs[0], runs[1], runs[2], pauses.sum(), pauses.max() if len(pauses) else 0.0))
+    ok= True
+    if peaks.max()> budget:
+        print("FAIL: a tick allocated %d bytes, over the budget of %d" % (peaks.max(), budget))
+        ok= False
+    if growth> ALLOC_LEAK:
+        print("FAIL: live memory grew %.1f bytes a tick" % growth)
+        ok= False
+    return ok
+
+############################################################
+# NETWORK MODES
+############################################################
+
+async def run_server(level_name, seed, host, port, tick_rate, belt_count=BELT_COUNT):
+    world= MultiplayerWorld(level_name, seed, belt_count)
+    transport, server= await net.start_server(world, host, port, tick_rate)
+    print("serving '%s' (seed %d) on %s:%d at %d Hz" % (level_name, seed, host, port, tick_rate))
+    ticker= asyncio.ensure_future(server.run())
+    try:
+        while True:
+            await asyncio.sleep(5.0)
+            st= server.stats
+            print("clients=%d  tick=%.2f ms  snapshot=%.0f B/client"
+                  % (st['clients'], st['tick_ms'], st['bytes_per_client']))
+    finally:
+        ticker.cancel()
+        transport.close()
+
+
+async def run_client(host, port):
+    client= await net.open_client(host, port)
+    info= client.welcome
+    lvl= make_level(info['level_name'], info['seed'], **level_options(info['level_name'], info['count']))
+    me= info['entity_id']
+
+    pygame.init()
+    screen= pygame.display.set_mode((SCREEN_WIDTH,SCREEN_HEIGHT))
+    font= pygame.font.SysFont("Arial",18)
+    minimap= Minimap(lvl)
+    show_minimap= True
+    # snapshot each asteroid was last sent in: the rest are out of our
+    # interest radius, and their positions go stale
+    sent_at= np.full(len(lvl.asteroids), -STALE_SNAPSHOTS- 1, np.int64)
+    frame= 1.0/ FPS
+    running=True
+    try:
+        while running:
+            t0= time.monotonic()
+            for event in pygame.event.get():
+                if event.type==pygame.QUIT:
+                    running=False
+                elif event.type==pygame.KEYDOWN:
+                    if event.key==pygame.K_ESCAPE:
+                        running=False
+                    elif event.key==pygame.K_m:
+                        show_minimap= not show_minimap
+            client.send_input(read_input_bits(pygame.key.get_pressed()))
+
+            states= client.states()
+            own= states.get(me)
+            screen.fill((0,0,0))
+            if own is not None:
+                cam_x= own[0]- SCREEN_WIDTH/2
+                cam_y= own[1]- SCREEN_HEIGHT/2
+                lvl.draw_background(screen, None, cam_x, cam_y)
+                # asteroids: the level supplies shape and colour, the
+                # snapshot the position; draw only the ones we were sent
+                field= lvl.asteroids
+                seen=[]
+                for eid, st in states.items():
+                    idx= eid- ASTEROID_ID_BASE
+                    if 0<= idx< len(field):
+                        field.x[idx]= st[0]
+                        field.y[idx]= st[1]
+                        seen.append(idx)
+                seen= np.array(seen, np.intp)
+                sent_at[seen]= client.latest
+                draw_asteroids(screen, field, cam_x, cam_y, seen)
+                for eid, st in states.items():
+                    if eid>= ASTEROID_ID_BASE:
+                        continue
+                    if not st[5] & FLAG_DEAD:
+                        rocket= {'heading': st[4], 'forcefield_on': bool(st[5] & FLAG_SHIELD)}
+                        sx= (st[0]- cam_x) % lvl.WORLD_WIDTH
+                        sy= (st[1]- cam_y) % lvl.WORLD_HEIGHT
+                        draw_rocket(screen, rocket,
+                                    st[5] & IN_FORWARD, st[5] & IN_REVERSE,
+                                    st[5] & IN_LEFT, st[5] & IN_RIGHT, center=(sx, sy))
+                if show_minimap:
+                    minimap.draw(screen, lvl, {'x': own[0], 'y': own[1]}, cam_x, cam_y,
+                                 shown=sent_at>= client.latest- STALE_SNAPSHOTS)
+                if own[5] & FLAG_DEAD:
+                    t_s= font.render("DESTROYED - respawning", True, (255,0,0))
+                    screen.blit(t_s,(SCREEN_WIDTH/2-100, SCREEN_HEIGHT/2))
+            else:
+                t_s= font.render("waiting for server...", True, (200,200,200))
+                screen.blit(t_s,(SCREEN_WIDTH/2-100, SCREEN_HEIGHT/2))
+            pygame.display.flip()
+            await asyncio.sleep(max(0.0, frame- (time.monotonic()- t0)))
+    finally:
+        client.close()
+        pygame.quit()
+
+
+def belt_count(text):
+    # argparse type for --belt-count
+    n= int(text)
+    if not BELT_MIN<= n<= BELT_MAX:
+        raise argparse.ArgumentTypeError("%d asteroids, not in %d-%d" % (n, BELT_MIN, BELT_MAX))
+    return n
+
+
+def parse_args(argv=None):
+    p= argparse.ArgumentParser(description="Space-Force")
+    p.add_argument("--level", choices=sorted(LEVELS), help="skip the level menu")
+    p.add_argument("--server", action="store_true", help="run an authoritative multiplayer server")
+    p.add_argument("--connect", metavar="HOST[:PORT]", help="join a multiplayer server")
+    p.add_argument("--host", default=net.DEFAULT_HOST, help="server bind address (loopback by default)")
+    p.add_argument("--port", type=int, default=net.DEFAULT_PORT)
+    p.add_argument("--tick-rate", type=int, default=net.TICK_RATE)
+    p.add_argument("--seed", type=int, default=None)
+    p.add_argument("--bench-envs", type=int, metavar="N", help="time N vectorized envs of --level and exit")
+    p.add_argument("--headless", type=int, metavar="TICKS", help="run TICKS physics ticks of --level without a window")
+    p.add_argument("--alloc-check", type=int, metavar="TICKS",
+                   help="run TICKS headless ticks of --level under tracemalloc; exit 1 over the allocation budget")
+    p.add_argument("--alloc-budget", type=int, metavar="BYTES", help="peak bytes a tick may allocate (--alloc-check)")
+    p.add_argument("--full-rate", action="store_true", help="step every asteroid every tick (--headless)")
+    p.add_argument("--autopilot", choices=AUTOPILOT_GOALS, help="let the autopilot fly to this goal (--headless)")
+    p.add_argument("--rate-check", type=int, metavar="TICKS",
+                   help="run TICKS headless ticks of --level at full rate and multi-rate; exit 1 if near bodies differ")
+    p.add_argument("--belt-count", type=belt_count, default=BELT_COUNT,
+                   help="asteroids in the belt level (%d-%d)" % (BELT_MIN, BELT_MAX))
+    p.add_argument("--kernels", choices=kernels.BACKENDS, help="physics kernel backend (numba when installed)")
+    p.add_argument("--quality", default="auto", choices=["auto"]+ [t['name'] for t in QUALITY_TIERS],
+                   help="render quality tier; auto holds the frame budget (F3 shows stats)")
+    p.add_argument("--render-scale", type=float, default=1.0, choices=[0.5, 0.75, 1.0],
+                   help="draw the world at this fraction of the window size and upscale it")
+    p.add_argument("--smooth-scale", action="store_true", help="smoothscale the upscale instead of nearest")
+    p.add_argument("--telemetry", metavar="FILE", help="log per-tick flight state to FILE (see telemetry.py)")
+    p.add_argument("--telemetry-asteroids", action="store_true", help="also log every asteroid's state")
+    p.add_argument("--capture", metavar="PATH", help="record frames: a PNG directory, or a file with --capture-format raw (F9 pauses)")
+    p.add_argument("--capture-format", default="png", choices=["png", "raw"])
+    return p.parse_args(argv)
+
 if __name__=="__main__":
-    main()
+    args= parse_args()
+    if args.kernels:
+        kernels.use(args.kernels)
+    if args.bench_envs:
+        rate= bench_vecenv(args.level or "star", args.bench_envs)
+        print("%d envs: %.0f env steps/s" % (args.bench_envs, rate))
+    elif args.headless:
+        run_headless(args.level or "belt", args.headless, args.seed, args.belt_count, not args.full_rate, args.autopilot)
+    elif args.alloc_check:
+        if not check_allocs(args.level or "belt", args.alloc_check, args.seed, args.belt_count, args.alloc_budget):
+            sys.exit(1)
+    elif args.rate_check:
+        if not check_rates(args.level or "belt", args.rate_check, args.seed, args.belt_count):
+            sys.exit(1)
+    elif args.server:
+        seed= args.seed if args.seed is not None else random.randrange(1 << 31)
+        try:
+            asyncio.run(run_server(args.level or "star", seed, args.host, args.port, args.tick_rate, args.belt_count))
+        except KeyboardInterrupt:
+            pass
+    elif args.connect:
+        host, _, port= args.connect.partition(":")
+        asyncio.run(run_client(host or net.DEFAULT_HOST, int(port) if port else args.port))
+    else:
+        main(args.level, args.quality, args.render_scale, args.smooth_scale,
+             args.telemetry, args.telemetry_asteroids, args.belt_count,
+             args.capture, args.capture_format)
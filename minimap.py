@@ -0,0 +1,218 @@
+"""
+Minimap panel for the wrap-around world.
+
+The stars and the gravity source never move, so they are baked once into a
+static layer. Asteroids are drawn over a copy of it, the panel, which keeps a
+per-pixel body count and only rewrites the pixels of bodies that crossed into
+a different minimap pixel. Each frame re-maps only the next REFRESH_BODIES
+bodies, taking turns round the field, so the cost does not grow with it: of
+5000 belt asteroids each is re-mapped every 5 frames, in which it drifts
+well under a minimap pixel (50 world units on a 10000 world). Each frame is
+then one 200x200 blit plus a few markers. Bodies the caller marks as not
+shown (a network client's asteroids it has no fresh snapshot of) are
+counted in a spare slot that is never drawn.
+
+    python minimap.py check    # frame time on a drifting belt, and the panel
+"""
+import sys, time
+import numpy as np
+import pygame
+
+MINIMAP_SIZE   = 200
+MINIMAP_MARGIN = 10
+BG_COLOR       = (10,10,20)
+BORDER_COLOR   = (90,90,110)
+ASTEROID_COLOR = (170,170,170)
+ROCKET_COLOR   = (255,60,60)
+VIEW_COLOR     = (80,120,80)
+REFRESH_BODIES = 1024     # bodies re-mapped per frame, taking turns round the field
+BUDGET_MS      = 0.2      # median draw time check() allows
+
+
+def level_stars(lvl):
+    """The star array a level shows on the map: its far stars, or its nearest layer."""
+    if hasattr(lvl, 'star_list'):
+        return lvl.star_list
+    layers= getattr(lvl, 'star_layers', None)
+    if layers:
+        return layers[-1]['stars']
+    return None
+
+
+def gravity_sources(lvl):
+    """(x, y, lethal radius, gravity range, colour) for each attractor of a level."""
+    color= getattr(lvl, 'MAP_COLOR', (255,200,120))
+    return [(cx, cy, lethal, rng, color) for (cx, cy, _gm, rng, lethal) in lvl.attractors()]
+
+
+class Minimap:
+    def __init__(self, lvl, size=MINIMAP_SIZE):
+        self.size= size
+        self.world_w= lvl.WORLD_WIDTH
+        self.world_h= lvl.WORLD_HEIGHT
+        self.static= self._bake(lvl)
+        if pygame.display.get_surface() is not None:
+            self.static= self.static.convert()
+        self.panel= self.static.copy()
+        # pixels are indexed row by row, y*size+ x, as the surface stores them
+        self._static_px= pygame.surfarray.array2d(self.static).T.ravel()
+        self._ast_color= self.panel.map_rgb(ASTEROID_COLOR)
+        self._field= None
+        self._px= None            # last minimap pixel of each body (flat index)
+        self._count= np.zeros(size*size+ 1, np.int32)   # last slot: hidden bodies
+        self._next= 0             # first body of the next frame's refresh
+        self._one= np.ones(REFRESH_BODIES, np.int32)
+        self._fbuf= None          # scratch for the coordinate transform
+        self._ibuf= None
+        self._flat= None
+        self.last_ms= 0.0
+
+    def _to_px(self, x, y):
+        s= self.size
+        px= np.minimum((np.asarray(x)* (s/ self.world_w)).astype(np.intp) % s, s-1)
+        py= np.minimum((np.asarray(y)* (s/ self.world_h)).astype(np.intp) % s, s-1)
+        return px, py
+
+    def _bake(self, lvl):
+        s= self.size
+        srf= pygame.Surface((s, s), 0, 32)
+        srf.fill(BG_COLOR)
+        stars= level_stars(lvl)
+        if stars is not None and len(stars['x']):
+            # brightest star per pixel, dimmed so bodies stand out
+            px, py= self._to_px(stars['x'], stars['y'])
+            lum= np.zeros((s, s), np.uint8)
+            np.maximum.at(lum, (px, py), (stars['bri']// 3).astype(np.uint8))
+            rgb= pygame.surfarray.pixels3d(srf)
+            lit= lum> 0
+            rgb[lit]= np.maximum(rgb[lit], lum[lit][:,None])
+            del rgb
+        sx= s/ self.world_w
+        sy= s/ self.world_h
+        for (cx, cy, lethal, rng, color) in gravity_sources(lvl):
+            c= (int(cx*sx), int(cy*sy))
+            pygame.draw.circle(srf, tuple(v//3 for v in color), c, max(1, int(rng*sx)), 1)
+            pygame.draw.circle(srf, color, c, max(1, int(lethal*sx)))
+        pygame.draw.rect(srf, BORDER_COLOR, srf.get_rect(), 1)
+        return srf
+
+    def _flat_px(self, x, y, shown=None):
+        # flat minimap pixel of each body, computed into reused buffers;
+        # positions are already wrapped into the world
+        n= len(x)
+        if self._fbuf is None or len(self._fbuf)< n:
+            self._fbuf= np.empty(n)
+            self._ibuf= np.empty(n, np.intp)
+            self._flat= np.empty(n, np.intp)
+        s= self.size
+        f, i, flat= self._fbuf[:n], self._ibuf[:n], self._flat[:n]
+        np.multiply(y, s/ self.world_h, out=f)
+        flat[:]= f
+        np.minimum(flat, s-1, out=flat)
+        flat*= s
+        np.multiply(x, s/ self.world_w, out=f)
+        i[:]= f
+        np.minimum(i, s-1, out=i)
+        flat+= i
+        if shown is not None:
+            np.copyto(flat, s*s, where=np.logical_not(shown))
+        return flat
+
+    def _sync_bodies(self, field, shown=None):
+        n= len(field)
+        if field is not self._field or self._px is None or len(self._px)!= n:
+            # new asteroid set (level reset): rebuild the panel once
+            flat= self._flat_px(field.x, field.y, shown)
+            self._field= field
+            self._next= 0
+            self._count[:]= 0
+            np.add.at(self._count, flat, 1)
+            self.panel.blit(self.static, (0,0))
+            touched= np.flatnonzero(self._count)
+            self._px= flat.copy()
+        else:
+            # the next REFRESH_BODIES bodies, round the field
+            lo= self._next
+            hi= min(lo+ REFRESH_BODIES, n)
+            self._next= hi % n
+            flat= self._flat_px(field.x[lo:hi], field.y[lo:hi], None if shown is None else shown[lo:hi])
+            px= self._px[lo:hi]
+            moved= np.flatnonzero(flat!= px)
+            if not len(moved):
+                return
+            old= px[moved]
+            new= flat[moved]
+            # an array of ones: ufunc.at with a scalar takes a slow path
+            one= self._one[:len(moved)]
+            np.subtract.at(self._count, old, one)
+            np.add.at(self._count, new, one)
+            touched= np.concatenate((old, new))
+            px[moved]= new
+        touched= touched[touched< self.size* self.size]
+        pix= pygame.surfarray.pixels2d(self.panel)
+        # pixels2d is indexed [x, y]; its transpose is the surface's rows
+        np.put(pix.T.reshape(-1), touched, np.where(self._count[touched]> 0, self._ast_color, self._static_px[touched]))
+        del pix
+
+    def draw(self, screen, lvl, rocket, cam_x, cam_y, zoom=1.0, shown=None):
+        # shown: bool per asteroid, those to put on the map (default all)
+        t0= time.perf_counter()
+        field= lvl.asteroids
+        if len(field) or self._field is not None:
+            self._sync_bodies(field, shown)
+        s= self.size
+        ox= screen.get_width()- s- MINIMAP_MARGIN
+        oy= MINIMAP_MARGIN
+        screen.blit(self.panel, (ox, oy))
+        sx= s/ self.world_w
+        sy= s/ self.world_h
+        # the view rectangle grows as the camera zooms out
+        vw= max(1, int(screen.get_width()/ zoom*sx))
+        vh= max(1, int(screen.get_height()/ zoom*sy))
+        pygame.draw.rect(screen, VIEW_COLOR,
+                         (ox+ int((cam_x % self.world_w)*sx), oy+ int((cam_y % self.world_h)*sy), vw, vh), 1)
+        if rocket is not None:
+            rx= ox+ int((rocket['x'] % self.world_w)*sx)
+            ry= oy+ int((rocket['y'] % self.world_h)*sy)
+            pygame.draw.circle(screen, ROCKET_COLOR, (rx, ry), 2)
+        self.last_ms= (time.perf_counter()- t0)*1000.0
+
+
+def check(n=5000, frames=300, seed=0):
+    """
+    Draws the minimap over `frames` ticks of a drifting belt of n asteroids
+    and returns the median and 95th percentile draw time in ms. Raises
+    AssertionError when the median is over BUDGET_MS, or when, once every
+    body has had its turn, the panel differs from one mapped from scratch.
+    """
+    import main
+    lvl, rocket, gs= main._headless_world("belt", seed, n)
+    screen= pygame.Surface((1800, 1000), 0, 32)
+    mm= Minimap(lvl)
+    times= np.empty(frames)
+    for k in range(frames):
+        main._headless_tick(lvl, rocket, gs)
+        t0= time.perf_counter()
+        mm.draw(screen, lvl, rocket, 0, 0)
+        times[k]= time.perf_counter()- t0
+    times*= 1000.0
+    med= float(np.median(times))
+    assert med<= BUDGET_MS, "minimap draw %.3f ms (median), over %.2f" % (med, BUDGET_MS)
+    for _ in range(-(-n// REFRESH_BODIES)):
+        mm.draw(screen, lvl, rocket, 0, 0)
+    fresh= Minimap(lvl)
+    fresh.draw(screen, lvl, rocket, 0, 0)
+    same= np.array_equal(pygame.surfarray.array2d(mm.panel), pygame.surfarray.array2d(fresh.panel))
+    assert same, "minimap panel differs from a full re-map"
+    return med, float(np.percentile(times, 95))
+
+
+if __name__=="__main__":
+    if len(sys.argv)>= 2 and sys.argv[1]== "check":
+        n= int(sys.argv[2]) if len(sys.argv)> 2 else 5000
+        med, p95= check(n)
+        print("%d asteroids: minimap draw %.3f ms (median), %.3f (p95), budget %.2f; panel matches a full re-map"
+              % (n, med, p95, BUDGET_MS))
+    else:
+        print("usage: minimap.py check [N]")
+        sys.exit(2)
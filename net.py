@@ -0,0 +1,617 @@
+"""
+Multiplayer networking: an authoritative asyncio UDP server that steps the
+world at a fixed tick rate, and the matching client connection.
+
+Snapshots are quantized to 16 bits per coordinate across the world size and
+delta-compressed against the last snapshot each client acknowledged. Each
+client only receives the entities near its own rocket (capped), so bandwidth
+per client does not grow with the number of players.
+
+    python net.py check    # a server and a client over loopback
+"""
+import asyncio, random, struct, sys, time
+import numpy as np
+
+############################################################
+# CONSTANTS
+############################################################
+DEFAULT_HOST          = "127.0.0.1"
+DEFAULT_PORT          = 40404
+TICK_RATE             = 30
+
+SNAPSHOT_HISTORY      = 32     # sent snapshots kept per client as baselines
+INTEREST_RADIUS       = 3000   # world units around a client's rocket
+MAX_SNAPSHOT_ENTITIES = 64
+CLIENT_TIMEOUT        = 5.0
+HELLO_RETRY           = 0.5
+INTERP_DELAY          = 0.1    # seconds the client renders behind the server
+
+VEL_SCALE             = 10.0   # velocity quantum = 0.1 units/s
+
+MSG_HELLO, MSG_WELCOME, MSG_INPUT, MSG_SNAPSHOT, MSG_BYE = range(5)
+
+# quantized entity state: x, y, vx, vy, heading, flags
+FIELD_FORMATS = ("H", "H", "h", "h", "H", "B")
+FULL_MASK     = (1 << len(FIELD_FORMATS)) - 1
+
+HEADER        = struct.Struct("<BIIHH")   # type, seq, baseline, n_changed, n_removed
+INPUT_PACKET  = struct.Struct("<BIIB")    # type, input seq, acked snapshot, bits
+WELCOME_HEAD  = struct.Struct("<BHBIIII") # type, entity id, tick rate, seed, w, h, count
+ENTITY_ID     = struct.Struct("<H")
+ENTITY_ID_MAX = 0xFFFF                    # ids past this don't fit ENTITY_ID
+
+# one Struct per delta mask, built on first use
+_record_structs = {}
+
+def _record_struct(mask):
+    st= _record_structs.get(mask)
+    if st is None:
+        fmt= "<HB" + "".join(f for i,f in enumerate(FIELD_FORMATS) if mask & (1 << i))
+        st= struct.Struct(fmt)
+        _record_structs[mask]= st
+    return st
+
+############################################################
+# QUANTIZATION
+############################################################
+
+class Quantizer:
+    """
+    Maps float entity state onto the fixed-width integers sent on the wire.
+    Positions span the wrap-around world, so 16 bits cover it exactly.
+    """
+    def __init__(self, world_w, world_h):
+        self.world_w= world_w
+        self.world_h= world_h
+        self.sx= 65536.0/ world_w
+        self.sy= 65536.0/ world_h
+
+    def pack(self, x, y, vx, vy, heading, flags):
+        qvx= max(-32768, min(32767, int(round(vx*VEL_SCALE))))
+        qvy= max(-32768, min(32767, int(round(vy*VEL_SCALE))))
+        return (
+            int(x*self.sx) & 0xFFFF,
+            int(y*self.sy) & 0xFFFF,
+            qvx, qvy,
+            int((heading % 360.0)*(65536.0/360.0)) & 0xFFFF,
+            flags & 0xFF
+        )
+
+    def pack_arrays(self, x, y, vx, vy, heading, flags):
+        """pack() for arrays of entities at once: row i of the (n, 6) result is pack() of entity i."""
+        q= np.empty((len(x), 6), np.int64)
+        q[:,0]= np.multiply(x, self.sx).astype(np.int64)
+        q[:,1]= np.multiply(y, self.sy).astype(np.int64)
+        q[:,:2]&= 0xFFFF
+        q[:,2]= np.clip(np.rint(np.multiply(vx, VEL_SCALE)), -32768, 32767)
+        q[:,3]= np.clip(np.rint(np.multiply(vy, VEL_SCALE)), -32768, 32767)
+        q[:,4]= (np.remainder(heading, 360.0)* (65536.0/360.0)).astype(np.int64)
+        q[:,4]&= 0xFFFF
+        q[:,5]= flags
+        q[:,5]&= 0xFF
+        return q
+
+    def unpack(self, q):
+        return (
+            q[0]/ self.sx,
+            q[1]/ self.sy,
+            q[2]/ VEL_SCALE,
+            q[3]/ VEL_SCALE,
+            q[4]*(360.0/65536.0),
+            q[5]
+        )
+
+############################################################
+# SNAPSHOT CODEC
+############################################################
+
+def encode_snapshot(seq, table, baseline_seq=0, base_table=None):
+    """
+    table maps entity id -> quantized state tuple. Only fields that differ
+    from base_table are written; entities missing from table are listed as
+    removed. baseline_seq=0 means a full snapshot.
+    """
+    records=[]
+    if base_table is None:
+        base_table= {}
+        baseline_seq= 0
+    for eid, q in table.items():
+        b= base_table.get(eid)
+        if b is None:
+            mask= FULL_MASK
+        else:
+            mask= 0
+            for i in range(len(q)):
+                if q[i]!= b[i]:
+                    mask|= 1 << i
+            if not mask:
+                continue
+        vals= [q[i] for i in range(len(q)) if mask & (1 << i)]
+        records.append(_record_struct(mask).pack(eid, mask, *vals))
+    removed= [eid for eid in base_table if eid not in table]
+    out= [HEADER.pack(MSG_SNAPSHOT, seq, baseline_seq, len(records), len(removed))]
+    out.extend(records)
+    out.extend(ENTITY_ID.pack(eid) for eid in removed)
+    return b"".join(out)
+
+
+def decode_snapshot(data, history):
+    """
+    Rebuilds the full table of a snapshot packet. history maps seq -> table
+    of snapshots already decoded; returns (seq, table) or None when the
+    baseline is no longer known.
+    """
+    _t, seq, baseline_seq, n_changed, n_removed= HEADER.unpack_from(data, 0)
+    if baseline_seq:
+        base= history.get(baseline_seq)
+        if base is None:
+            return None
+        table= dict(base)
+    else:
+        table= {}
+    off= HEADER.size
+    for _ in range(n_changed):
+        eid, mask= struct.unpack_from("<HB", data, off)
+        st= _record_struct(mask)
+        vals= st.unpack_from(data, off)[2:]
+        off+= st.size
+        old= table.get(eid)
+        if mask== FULL_MASK or old is None:
+            table[eid]= tuple(vals)
+        else:
+            q= list(old)
+            k= 0
+            for i in range(len(q)):
+                if mask & (1 << i):
+                    q[i]= vals[k]
+                    k+= 1
+            table[eid]= tuple(q)
+    for _ in range(n_removed):
+        (eid,)= ENTITY_ID.unpack_from(data, off)
+        off+= ENTITY_ID.size
+        table.pop(eid, None)
+    return seq, table
+
+############################################################
+# SERVER
+############################################################
+
+class _ClientSlot:
+    def __init__(self, addr, entity_id, now):
+        self.addr= addr
+        self.entity_id= entity_id
+        self.acked= 0
+        self.last_input_seq= 0
+        self.last_seen= now
+        self.sent= {}          # seq -> table, baselines for delta encoding
+        self.bytes_sent= 0
+
+
+class GameServer(asyncio.DatagramProtocol):
+    """
+    Runs `world` at a fixed tick rate and streams snapshots to clients.
+
+    world must provide:
+      add_player() -> entity id (or None when full)
+      remove_player(entity_id)
+      set_input(entity_id, bits)
+      step(dt)
+      entity_arrays() -> arrays (ids, x, y, vx, vy, heading, flags), one
+          entry per entity
+      seed, level_name, count (the level's asteroid count), WORLD_WIDTH,
+      WORLD_HEIGHT
+
+    A tick quantizes every entity in one NumPy pass and buckets them by a
+    sort on their cells; Python tuples are only built for the entities each
+    client is sent (at most MAX_SNAPSHOT_ENTITIES).
+    """
+    def __init__(self, world, tick_rate=TICK_RATE):
+        self.world= world
+        self.tick_rate= tick_rate
+        self.quant= Quantizer(world.WORLD_WIDTH, world.WORLD_HEIGHT)
+        self.clients= {}       # addr -> _ClientSlot
+        self.transport= None
+        self.seq= 0
+        self.stats= {'tick_ms': 0.0, 'bytes_per_client': 0.0, 'clients': 0}
+
+    def connection_made(self, transport):
+        self.transport= transport
+
+    def datagram_received(self, data, addr):
+        if not data:
+            return
+        now= time.monotonic()
+        kind= data[0]
+        slot= self.clients.get(addr)
+        if kind== MSG_HELLO:
+            if slot is None:
+                eid= self.world.add_player()
+                if eid is None:
+                    return
+                slot= _ClientSlot(addr, eid, now)
+                self.clients[addr]= slot
+            slot.last_seen= now
+            name= self.world.level_name.encode("utf-8")
+            self.transport.sendto(WELCOME_HEAD.pack(
+                MSG_WELCOME, slot.entity_id, self.tick_rate, self.world.seed,
+                self.world.WORLD_WIDTH, self.world.WORLD_HEIGHT, self.world.count) + name, addr)
+        elif slot is None:
+            return
+        elif kind== MSG_INPUT and len(data)== INPUT_PACKET.size:
+            _t, in_seq, acked, bits= INPUT_PACKET.unpack(data)
+            slot.last_seen= now
+            if acked in slot.sent and acked> slot.acked:
+                slot.acked= acked
+            if in_seq> slot.last_input_seq:
+                slot.last_input_seq= in_seq
+                self.world.set_input(slot.entity_id, bits)
+        elif kind== MSG_BYE:
+            self._drop(addr)
+
+    def _drop(self, addr):
+        slot= self.clients.pop(addr, None)
+        if slot is not None:
+            self.world.remove_player(slot.entity_id)
+
+    def _bucket(self, x, y):
+        # one sort of all entities by cell per tick; each client then only
+        # looks at the 3x3 cells around its rocket. Cell c holds
+        # order[ends[c]:ends[c+1]], in entity order
+        cell= INTEREST_RADIUS
+        ncx= max(1, int(self.world.WORLD_WIDTH// cell))
+        ncy= max(1, int(self.world.WORLD_HEIGHT// cell))
+        key= np.floor_divide(x, cell).astype(np.intp) % ncx* ncy
+        key+= np.floor_divide(y, cell).astype(np.intp) % ncy
+        order= np.argsort(key, kind='stable')
+        ends= np.zeros(ncx*ncy+ 1, np.intp)
+        np.cumsum(np.bincount(key, minlength=ncx*ncy), out=ends[1:])
+        return order, ends, ncx, ncy
+
+    def _visible(self, slot, ids, x, y, grid):
+        # indices of the entities sent to slot: those within INTEREST_RADIUS
+        # of its rocket, nearest first (then by id) when over the cap
+        own= np.flatnonzero(ids== slot.entity_id)
+        if not len(own):
+            return own
+        o= own[0]
+        ox, oy= float(x[o]), float(y[o])
+        order, ends, ncx, ncy= grid
+        w= self.world.WORLD_WIDTH
+        h= self.world.WORLD_HEIGHT
+        cx= int(ox// INTEREST_RADIUS)
+        cy= int(oy// INTEREST_RADIUS)
+        keys=[]
+        for i in (-1,0,1):
+            for j in (-1,0,1):
+                key= (cx+i) % ncx* ncy+ (cy+j) % ncy
+                if key not in keys:
+                    keys.append(key)
+        cand= np.concatenate([order[ends[k]:ends[k+1]] for k in keys])
+        dx= np.abs(x[cand]- ox); np.minimum(dx, w- dx, out=dx)
+        dy= np.abs(y[cand]- oy); np.minimum(dy, h- dy, out=dy)
+        d2= dx*dx+ dy*dy
+        keep= (d2<= INTEREST_RADIUS*INTEREST_RADIUS) | (cand== o)
+        cand= cand[keep]
+        if len(cand)> MAX_SNAPSHOT_ENTITIES:
+            cand= cand[np.lexsort((ids[cand], d2[keep]))[:MAX_SNAPSHOT_ENTITIES]]
+        return cand
+
+    def tick(self, dt):
+        t0= time.perf_counter()
+        now= time.monotonic()
+        for addr in [a for a,s in self.clients.items() if now- s.last_seen> CLIENT_TIMEOUT]:
+            self._drop(addr)
+
+        self.world.step(dt)
+        self.seq+= 1
+        ids, x, y, vx, vy, heading, flags= self.world.entity_arrays()
+        top= int(ids.max()) if len(ids) else 0
+        assert top<= ENTITY_ID_MAX, "entity id %d does not fit the wire's 16 bits" % top
+        quant= self.quant.pack_arrays(x, y, vx, vy, heading, flags)
+        grid= self._bucket(x, y)
+
+        total= 0
+        for slot in self.clients.values():
+            sel= self._visible(slot, ids, x, y, grid)
+            table= dict(zip(ids[sel].tolist(), map(tuple, quant[sel].tolist())))
+            base= slot.sent.get(slot.acked)
+            pkt= encode_snapshot(self.seq, table, slot.acked if base is not None else 0, base)
+            slot.sent[self.seq]= table
+            stale= self.seq- SNAPSHOT_HISTORY
+            for s in [s for s in slot.sent if s<= stale]:
+                del slot.sent[s]
+            self.transport.sendto(pkt, slot.addr)
+            slot.bytes_sent+= len(pkt)
+            total+= len(pkt)
+
+        n= len(self.clients)
+        self.stats['clients']= n
+        self.stats['bytes_per_client']= total/ n if n else 0.0
+        self.stats['tick_ms']= (time.perf_counter()- t0)*1000.0
+
+    async def run(self):
+        loop= asyncio.get_running_loop()
+        dt= 1.0/ self.tick_rate
+        next_t= loop.time()
+        while True:
+            self.tick(dt)
+            next_t+= dt
+            delay= next_t- loop.time()
+            if delay< -1.0:
+                # far behind (e.g. suspended): resync instead of spiralling
+                next_t= loop.time()
+                delay= 0
+            await asyncio.sleep(max(0.0, delay))
+
+
+async def start_server(world, host=DEFAULT_HOST, port=DEFAULT_PORT, tick_rate=TICK_RATE):
+    loop= asyncio.get_running_loop()
+    transport, server= await loop.create_datagram_endpoint(
+        lambda: GameServer(world, tick_rate), local_addr=(host, port))
+    return transport, server
+
+############################################################
+# CLIENT
+############################################################
+
+def _lerp_wrap(a, b, t, span):
+    d= b- a
+    if d> span/2:
+        d-= span
+    elif d< -span/2:
+        d+= span
+    return (a+ d*t) % span
+
+
+class NetClient(asyncio.DatagramProtocol):
+    """
+    Client end of the connection. Decodes snapshots into a short buffer and
+    serves interpolated entity states INTERP_DELAY behind the server.
+    """
+    def __init__(self):
+        self.transport= None
+        self.welcome= None
+        self.entity_id= None
+        self.quant= None
+        self.tick_rate= TICK_RATE
+        self.history= {}       # seq -> table
+        self.buffer= []        # (seq, table), ascending
+        self.latest= 0
+        self.input_seq= 0
+        self.clock_offset= None
+        self.bytes_received= 0
+        self.welcomed= asyncio.get_running_loop().create_future()
+
+    def connection_made(self, transport):
+        self.transport= transport
+        transport.sendto(bytes([MSG_HELLO]))
+
+    def datagram_received(self, data, addr):
+        if not data:
+            return
+        self.bytes_received+= len(data)
+        kind= data[0]
+        if kind== MSG_WELCOME and self.welcome is None:
+            _t, eid, rate, seed, w, h, count= WELCOME_HEAD.unpack_from(data, 0)
+            self.entity_id= eid
+            self.tick_rate= rate
+            self.quant= Quantizer(w, h)
+            self.welcome= {
+                'entity_id': eid, 'tick_rate': rate, 'seed': seed,
+                'WORLD_WIDTH': w, 'WORLD_HEIGHT': h, 'count': count,
+                'level_name': data[WELCOME_HEAD.size:].decode("utf-8"),
+            }
+            if not self.welcomed.done():
+                self.welcomed.set_result(self.welcome)
+        elif kind== MSG_SNAPSHOT and self.quant is not None:
+            res= decode_snapshot(data, self.history)
+            if res is None:
+                return
+            seq, table= res
+            if seq<= self.latest:
+                return
+            self.latest= seq
+            self.history[seq]= table
+            for s in [s for s in self.history if s<= seq- SNAPSHOT_HISTORY]:
+                del self.history[s]
+            self.buffer.append((seq, table))
+            if len(self.buffer)> 8:
+                del self.buffer[0]
+            # server time of seq is seq/tick_rate; keep the smallest
+            # observed offset, i.e. the least delayed packet
+            off= time.monotonic()- seq/ self.tick_rate
+            if self.clock_offset is None or off< self.clock_offset:
+                self.clock_offset= off
+
+    def send_input(self, bits):
+        if self.transport is None:
+            return
+        self.input_seq+= 1
+        self.transport.sendto(INPUT_PACKET.pack(MSG_INPUT, self.input_seq, self.latest, bits))
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.sendto(bytes([MSG_BYE]))
+            self.transport.close()
+
+    def states(self, now=None):
+        """
+        Entity id -> (x, y, vx, vy, heading, flags), interpolated between the
+        two buffered snapshots around the render time.
+        """
+        if not self.buffer:
+            return {}
+        if now is None:
+            now= time.monotonic()
+        t= (now- self.clock_offset- INTERP_DELAY)* self.tick_rate
+        older= self.buffer[0]
+        newer= None
+        for snap in self.buffer:
+            if snap[0]<= t:
+                older= snap
+            else:
+                newer= snap
+                break
+        q= self.quant
+        if newer is None or newer[0]== older[0]:
+            return {eid: q.unpack(v) for eid, v in older[1].items()}
+        frac= max(0.0, min(1.0, (t- older[0])/ (newer[0]- older[0])))
+        out={}
+        for eid, v1 in newer[1].items():
+            b= q.unpack(v1)
+            v0= older[1].get(eid)
+            if v0 is None:
+                out[eid]= b
+                continue
+            a= q.unpack(v0)
+            dh= (b[4]- a[4]+ 180.0) % 360.0- 180.0
+            out[eid]= (
+                _lerp_wrap(a[0], b[0], frac, q.world_w),
+                _lerp_wrap(a[1], b[1], frac, q.world_h),
+                a[2]+ (b[2]- a[2])*frac,
+                a[3]+ (b[3]- a[3])*frac,
+                (a[4]+ dh*frac) % 360.0,
+                b[5]
+            )
+        return out
+
+
+async def open_client(host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=5.0):
+    loop= asyncio.get_running_loop()
+    transport, client= await loop.create_datagram_endpoint(
+        NetClient, remote_addr=(host, port))
+    deadline= loop.time()+ timeout
+    while not client.welcomed.done():
+        if loop.time()> deadline:
+            transport.close()
+            raise ConnectionError("no reply from server at %s:%d" % (host, port))
+        try:
+            await asyncio.wait_for(asyncio.shield(client.welcomed), HELLO_RETRY)
+        except asyncio.TimeoutError:
+            transport.sendto(bytes([MSG_HELLO]))
+    return client
+
+
+############################################################
+# CHECK
+############################################################
+
+class _CheckWorld:
+    """
+    A stand-in for the game's world in check(): one player and n bodies
+    around it on straight lines, some out of the player's interest radius.
+    """
+    WORLD_WIDTH = 20000
+    WORLD_HEIGHT= 20000
+    level_name  = "check"
+
+    def __init__(self, n, seed):
+        rng= random.Random(seed)
+        self.seed= seed
+        self.count= n
+        self.bits= None
+        self.player= None
+        w, h= self.WORLD_WIDTH, self.WORLD_HEIGHT
+        # ids as the game numbers them: players first, bodies from 1024
+        self.bodies= {1024+ i: [(w/2+ rng.uniform(-2, 2)* INTEREST_RADIUS) % w,
+                                (h/2+ rng.uniform(-2, 2)* INTEREST_RADIUS) % h,
+                                rng.uniform(-300, 300), rng.uniform(-300, 300),
+                                rng.uniform(0, 360)] for i in range(n)}
+
+    def add_player(self):
+        if self.player is not None:
+            return None
+        self.player= [self.WORLD_WIDTH/2, self.WORLD_HEIGHT/2, 50.0, -20.0, 90.0]
+        return 0
+
+    def remove_player(self, eid):
+        self.player= None
+
+    def set_input(self, eid, bits):
+        self.bits= bits
+
+    def step(self, dt):
+        for b in list(self.bodies.values())+ ([self.player] if self.player else []):
+            b[0]= (b[0]+ b[2]* dt) % self.WORLD_WIDTH
+            b[1]= (b[1]+ b[3]* dt) % self.WORLD_HEIGHT
+            b[4]= (b[4]+ 45.0* dt) % 360.0
+
+    def entity_states(self):
+        if self.player:
+            yield (0,)+ tuple(self.player)+ (self.bits or 0,)
+        for eid, b in self.bodies.items():
+            yield (eid,)+ tuple(b)+ (0,)
+
+    def entity_arrays(self):
+        st= np.array(list(self.entity_states()), float).reshape(-1, 7)
+        ids= st[:,0].astype(np.int64)
+        return (ids,)+ tuple(st[:,1:6].T)+ (st[:,6].astype(np.int64),)
+
+
+async def _check(n, ticks, seed):
+    world= _CheckWorld(n, seed)
+    transport, server= await start_server(world, DEFAULT_HOST, 0)
+    port= transport.get_extra_info('sockname')[1]
+    client= await open_client(DEFAULT_HOST, port)
+    loop= asyncio.get_running_loop()
+    q= client.quant
+    step= (world.WORLD_WIDTH/ 65536.0, world.WORLD_HEIGHT/ 65536.0, 0.5/ VEL_SCALE, 0.5/ VEL_SCALE, 360.0/ 65536.0)
+    worst= [0.0]* len(step)
+    compared= 0
+    try:
+        for t in range(ticks):
+            # the client's input, acking the last snapshot: later ones are deltas
+            client.send_input(t & 0xFF)
+            deadline= loop.time()+ 1.0
+            while world.bits!= t & 0xFF:
+                assert loop.time()< deadline, "server never got input %d" % t
+                await asyncio.sleep(0.001)
+            server.tick(1.0/ server.tick_rate)
+            deadline= loop.time()+ 1.0
+            while client.latest< server.seq:
+                assert loop.time()< deadline, "no snapshot %d at the client" % server.seq
+                await asyncio.sleep(0.001)
+            table= client.history[server.seq]
+            assert 0 in table, "the player's own entity is missing"
+            states= {st[0]: st[1:] for st in world.entity_states()}
+            for eid, v in table.items():
+                got= q.unpack(v)
+                want= states[eid]
+                for k, (a, b) in enumerate(zip(got[:5], want[:5])):
+                    d= abs(a- b)
+                    if k in (0, 1):
+                        span= (world.WORLD_WIDTH, world.WORLD_HEIGHT)[k]
+                        d= min(d, span- d)
+                    elif k== 4:
+                        d= min(d, 360.0- d)
+                    worst[k]= max(worst[k], d)
+                    assert d<= step[k]* 1.000001, "entity %d field %d off by %g" % (eid, k, d)
+                assert got[5]== want[5], "entity %d flags %d, sent %d" % (eid, got[5], want[5])
+            compared+= len(table)
+        sent= server.stats['bytes_per_client']
+    finally:
+        client.close()
+        transport.close()
+    return {'entities': compared, 'ticks': ticks, 'bytes_last_tick': sent,
+            'pos_err': max(worst[0], worst[1]), 'pos_step': max(step[0], step[1])}
+
+def check(n=300, ticks=30, seed=0):
+    """
+    Runs a GameServer and a NetClient over loopback for `ticks` ticks of a
+    stand-in world of n bodies and returns how many entity states were
+    compared and the worst position error. Raises AssertionError when a
+    decoded state is off by more than one quantization step, or a packet
+    never arrives.
+    """
+    return asyncio.run(_check(n, ticks, seed))
+
+
+if __name__=="__main__":
+    if len(sys.argv)>= 2 and sys.argv[1]== "check":
+        r= check()
+        print("%d entity states over %d ticks, position error max %.3f (quantum %.3f), last snapshot %d B"
+              % (r['entities'], r['ticks'], r['pos_err'], r['pos_step'], r['bytes_last_tick']))
+        print("ok")
+    else:
+        print("usage: net.py check")
+        sys.exit(2)
@@ -0,0 +1,114 @@
+"""
+Adaptive quality: watches frame times and steps through quality tiers to
+hold the frame budget.
+
+The controller works on windows of frames. A window whose mean busy time
+(less any time warp, which fills what is left of a frame) is over DOWN_FRAC
+of the budget drops one tier. Raising a tier needs UP_WINDOWS consecutive
+windows under UP_FRAC of the budget. If a raise is undone soon after, the
+wait before the next raise doubles, so tiers don't flicker.
+"""
+import collections
+
+# knobs read by the levels and the draw code; index 0 is the best
+QUALITY_TIERS= [
+    {'name':'high',    'star_layers':4, 'star_frac':1.0,  'spots':True,  'corona':600, 'lensing':True,  'render_scale':1.0},
+    {'name':'medium',  'star_layers':3, 'star_frac':0.6,  'spots':True,  'corona':600, 'lensing':True,  'render_scale':1.0},
+    {'name':'low',     'star_layers':2, 'star_frac':0.4,  'spots':False, 'corona':400, 'lensing':False, 'render_scale':0.75},
+    {'name':'minimal', 'star_layers':1, 'star_frac':0.25, 'spots':False, 'corona':0,   'lensing':False, 'render_scale':0.5},
+]
+
+WINDOW       = 30      # frames per decision
+DOWN_FRAC    = 0.95    # drop a tier above this share of the budget
+UP_FRAC      = 0.60    # consider raising below this share
+UP_WINDOWS   = 3       # calm windows needed before a raise
+REVERT_WINDOWS = 4     # a drop this soon after a raise counts as a revert
+MAX_HOLD     = 64      # cap on the raise back-off, in windows
+
+
+def tier_by_name(name):
+    for i, t in enumerate(QUALITY_TIERS):
+        if t['name']== name:
+            return i
+    raise ValueError("unknown quality tier %r" % name)
+
+
+class QualityController:
+    def __init__(self, budget_ms, tier=0, auto=True, tiers=QUALITY_TIERS):
+        self.budget_ms= budget_ms
+        self.tiers= tiers
+        self.index= tier
+        self.auto= auto
+        self.busy= collections.deque(maxlen=WINDOW)
+        self.frame= collections.deque(maxlen=WINDOW)
+        self._calm= 0
+        self._hold= UP_WINDOWS       # calm windows required for the next raise
+        self._since_raise= None      # windows since the last raise
+        self.changes= 0
+        self.last_mean_ms= 0.0
+        self.last_p95_ms= 0.0
+
+    @property
+    def tier(self):
+        return self.tiers[self.index]
+
+    def record(self, frame_ms, busy_ms, filler_ms=0.0):
+        """
+        frame_ms: what clock.tick returned; busy_ms: clock.get_rawtime(),
+        the same frame without the delay tick adds to cap the rate.
+        filler_ms: the part of busy_ms spent on work that stretches to fill
+        whatever the frame leaves (time warp's ticks); it is left out, or a
+        warping frame would never look calm enough to raise a tier.
+        Returns True when the tier changed.
+        """
+        busy_ms= max(0.0, busy_ms- filler_ms)
+        self.frame.append(frame_ms)
+        self.busy.append(busy_ms)
+        if len(self.busy)< WINDOW:
+            return False
+        window= sorted(self.busy)
+        self.last_mean_ms= sum(window)/ len(window)
+        self.last_p95_ms= window[int(0.95*(len(window)-1))]
+        self.busy.clear()
+        if not self.auto:
+            return False
+        if self._since_raise is not None:
+            self._since_raise+= 1
+
+        if self.last_mean_ms> DOWN_FRAC* self.budget_ms:
+            self._calm= 0
+            if self._since_raise is not None and self._since_raise<= REVERT_WINDOWS:
+                self._hold= min(MAX_HOLD, self._hold*2)
+            self._since_raise= None
+            if self.index< len(self.tiers)-1:
+                self.index+= 1
+                self.changes+= 1
+                return True
+            return False
+
+        if self.last_mean_ms< UP_FRAC* self.budget_ms:
+            self._calm+= 1
+        else:
+            self._calm= 0
+        if self._calm>= self._hold and self.index> 0:
+            self.index-= 1
+            self.changes+= 1
+            self._calm= 0
+            self._since_raise= 0
+            return True
+        return False
+
+    def stats(self):
+        fr= list(self.frame)
+        return {
+            'tier': self.tier['name'],
+            'index': self.index,
+            'auto': self.auto,
+            'budget_ms': self.budget_ms,
+            'busy_mean_ms': self.last_mean_ms,
+            'busy_p95_ms': self.last_p95_ms,
+            'frame_mean_ms': sum(fr)/ len(fr) if fr else 0.0,
+            'headroom_ms': self.budget_ms- self.last_mean_ms,
+            'changes': self.changes,
+            'raise_hold': self._hold,
+        }
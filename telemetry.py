@@ -0,0 +1,231 @@
+"""
+Per-tick flight telemetry, written off the game loop.
+
+record() stores one tick into preallocated column arrays (a chunk). A full
+chunk goes to a writer thread and recording carries on in a spare one; if
+the writer is so far behind that no spare is free, the chunk is dropped and
+counted rather than stalling the frame.
+
+File format: MAGIC, then blocks. Each block is a 4-byte kind, a uint32
+header length, a JSON header {"rows": n, "cols": [[name, dtype, shape]]}
+and then each column's raw bytes in that order. Kinds: ROWS (rocket per
+tick), EVTS (collision events), ASTS (asteroid state per tick, optional).
+
+    python telemetry.py summary run.sft
+    python telemetry.py export run.sft run.jsonl
+"""
+import json, queue, struct, sys, threading, time
+import numpy as np
+
+MAGIC  = b"SFTEL001"
+_BLOCK = struct.Struct("<4sI")
+CHUNK  = 4096        # ticks per chunk, ~68 s at 60 FPS
+SPARES = 3           # chunks that can be queued for the writer at once
+
+ROW_COLS= [
+    ('tick','<u4'), ('x','<f8'), ('y','<f8'), ('vx','<f4'), ('vy','<f4'),
+    ('heading','<f4'), ('angvel','<f4'), ('ax','<f4'), ('ay','<f4'), ('flags','<u1'),
+]
+EVENT_COLS= [('tick','<u4'), ('kind','<u1'), ('other','<i4')]
+
+# event kinds
+EV_BOUNCE = 1    # shielded rocket bounced off asteroid `other`
+EV_CRASH  = 2    # unshielded rocket hit asteroid `other`
+EV_LETHAL = 3    # rocket entered a lethal region
+EV_PAIR   = 4    # asteroid-asteroid bounces this tick; `other` is the count
+
+
+class _Chunk:
+    def __init__(self, cap, n_ast):
+        self.rows= {k: np.empty(cap, dt) for k, dt in ROW_COLS}
+        self.events= {k: np.empty(cap, dt) for k, dt in EVENT_COLS}
+        self.ast= None
+        if n_ast:
+            self.ast= {k: np.empty((cap, n_ast), '<f4') for k in ('x','y','vx','vy')}
+        self.n= 0
+        self.ne= 0
+
+
+def _write_block(f, kind, cols, n):
+    header= json.dumps({'rows': n, 'cols': [[k, a.dtype.str, list(a.shape[1:])] for k, a in cols.items()]})
+    header= header.encode("utf-8")
+    f.write(_BLOCK.pack(kind, len(header)))
+    f.write(header)
+    for a in cols.values():
+        f.write(a[:n].tobytes())
+
+
+class Telemetry:
+    def __init__(self, path, n_asteroids=0, cap=CHUNK):
+        self.path= path
+        self.cap= cap
+        self.n_ast= n_asteroids
+        self._free= queue.SimpleQueue()
+        for _ in range(SPARES):
+            self._free.put(_Chunk(cap, n_asteroids))
+        self._cur= _Chunk(cap, n_asteroids)
+        self._todo= queue.SimpleQueue()
+        self._file= open(path, "wb")
+        self._file.write(MAGIC)
+        self._thread= threading.Thread(target=self._writer, name="telemetry", daemon=True)
+        self._thread.start()
+        self.rows= 0
+        self.dropped= 0         # ticks lost with dropped chunks
+        self.events_dropped= 0  # and their events
+        self.record_s= 0.0      # time spent in record()/event(), the loop's cost
+        self.write_s= 0.0       # time the writer thread spent on disk I/O
+        self._t0= time.perf_counter()
+
+    # hot path
+
+    def record(self, tick, rocket, ax, ay, flags, field=None):
+        t0= time.perf_counter()
+        c= self._cur
+        i= c.n
+        r= c.rows
+        r['tick'][i]= tick
+        r['x'][i]= rocket['x']; r['y'][i]= rocket['y']
+        r['vx'][i]= rocket['vx']; r['vy'][i]= rocket['vy']
+        r['heading'][i]= rocket['heading']; r['angvel'][i]= rocket['angvel']
+        r['ax'][i]= ax; r['ay'][i]= ay
+        r['flags'][i]= flags
+        if c.ast is not None and field is not None and len(field)== self.n_ast:
+            a= c.ast
+            a['x'][i]= field.x; a['y'][i]= field.y
+            a['vx'][i]= field.vx; a['vy'][i]= field.vy
+        c.n= i+ 1
+        if c.n== self.cap:
+            self._hand_off()
+        self.record_s+= time.perf_counter()- t0
+
+    def event(self, tick, kind, other=-1):
+        t0= time.perf_counter()
+        c= self._cur
+        if c.ne== self.cap:
+            self._hand_off()
+            c= self._cur
+        e= c.events
+        e['tick'][c.ne]= tick; e['kind'][c.ne]= kind; e['other'][c.ne]= other
+        c.ne+= 1
+        self.record_s+= time.perf_counter()- t0
+
+    def _hand_off(self):
+        c= self._cur
+        try:
+            spare= self._free.get_nowait()
+        except queue.Empty:
+            # writer is behind: lose this chunk rather than wait for it
+            self.dropped+= c.n
+            self.events_dropped+= c.ne
+            c.n= c.ne= 0
+            return
+        self.rows+= c.n
+        self._todo.put(c)
+        self._cur= spare
+
+    # writer thread
+
+    def _writer(self):
+        f= self._file
+        while True:
+            c= self._todo.get()
+            if c is None:
+                break
+            t0= time.perf_counter()
+            if c.n:
+                _write_block(f, b"ROWS", c.rows, c.n)
+                if c.ast is not None:
+                    _write_block(f, b"ASTS", c.ast, c.n)
+            if c.ne:
+                _write_block(f, b"EVTS", c.events, c.ne)
+            self.write_s+= time.perf_counter()- t0
+            c.n= c.ne= 0
+            self._free.put(c)
+        f.close()
+
+    def close(self):
+        if self._thread is None:
+            return
+        c= self._cur
+        if c.n or c.ne:
+            self.rows+= c.n
+            self._todo.put(c)
+        self._todo.put(None)
+        self._thread.join()
+        self._thread= None
+
+    def stats(self):
+        wall= time.perf_counter()- self._t0
+        ticks= self.rows+ self._cur.n+ self.dropped
+        return {
+            'rows': ticks- self.dropped,
+            'dropped': self.dropped,
+            'events_dropped': self.events_dropped,
+            'record_us_per_tick': 1e6* self.record_s/ max(1, ticks),
+            'overhead_pct': 100.0* self.record_s/ max(wall, 1e-9),
+            'write_ms': 1000.0* self.write_s,
+        }
+
+
+def read_telemetry(path):
+    """Returns {'rows': cols, 'events': cols, 'asteroids': cols or None}, each column concatenated."""
+    parts= {b"ROWS": [], b"EVTS": [], b"ASTS": []}
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC))!= MAGIC:
+            raise ValueError("%s is not a telemetry file" % path)
+        while True:
+            head= f.read(_BLOCK.size)
+            if len(head)< _BLOCK.size:
+                break
+            kind, hlen= _BLOCK.unpack(head)
+            header= json.loads(f.read(hlen).decode("utf-8"))
+            n= header['rows']
+            block= {}
+            for name, dt, shape in header['cols']:
+                dt= np.dtype(dt)
+                count= n* int(np.prod(shape, dtype=np.int64))
+                block[name]= np.frombuffer(f.read(count* dt.itemsize), dt).reshape([n]+ shape)
+            parts[kind].append(block)
+
+    def cat(blocks, cols):
+        if not blocks:
+            return None if cols is None else {k: np.empty(0, dt) for k, dt in cols}
+        return {k: np.concatenate([b[k] for b in blocks]) for k in blocks[0]}
+    return {'rows': cat(parts[b"ROWS"], ROW_COLS),
+            'events': cat(parts[b"EVTS"], EVENT_COLS),
+            'asteroids': cat(parts[b"ASTS"], None)}
+
+
+def export_jsonl(path, out_path):
+    """One JSON object per tick, with that tick's events (and asteroids if logged)."""
+    data= read_telemetry(path)
+    rows= data['rows']
+    ev= data['events']
+    ast= data['asteroids']
+    order= np.argsort(ev['tick'], kind='stable')
+    ev_tick= ev['tick'][order]
+    with open(out_path, "w") as f:
+        for i in range(len(rows['tick'])):
+            rec= {k: rows[k][i].item() for k in rows}
+            lo, hi= np.searchsorted(ev_tick, [rec['tick'], rec['tick']+ 1])
+            if hi> lo:
+                rec['events']= [{'kind': int(ev['kind'][j]), 'other': int(ev['other'][j])} for j in order[lo:hi]]
+            if ast is not None and i< len(ast['x']):
+                rec['asteroids']= {k: ast[k][i].tolist() for k in ast}
+            f.write(json.dumps(rec)+ "\n")
+
+
+if __name__=="__main__":
+    if len(sys.argv)>= 3 and sys.argv[1]== "summary":
+        d= read_telemetry(sys.argv[2])
+        r= d['rows']
+        print("ticks %d  events %d  asteroids %s" % (
+            len(r['tick']), len(d['events']['tick']),
+            "no" if d['asteroids'] is None else d['asteroids']['x'].shape[1]))
+        for k in sorted(set(d['events']['kind'].tolist())):
+            print("  kind %d: %d" % (k, int((d['events']['kind']== k).sum())))
+    elif len(sys.argv)>= 4 and sys.argv[1]== "export":
+        export_jsonl(sys.argv[2], sys.argv[3])
+    else:
+        print("usage: telemetry.py summary FILE | export FILE OUT.jsonl")
+        sys.exit(2)
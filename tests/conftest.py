@@ -0,0 +1,5 @@
+import os, sys
+
+# the game modules live at the repo root; no display in the tests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
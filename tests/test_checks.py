@@ -0,0 +1,11 @@
+import main
+
+
+def test_alloc_check_belt():
+    # what --alloc-check 300 --level belt runs
+    assert main.check_allocs("belt", 300, seed=0)
+
+
+def test_rate_check_belt():
+    # what --rate-check 300 --level belt --seed 0 runs
+    assert main.check_rates("belt", 300, 0)
@@ -0,0 +1,26 @@
+import os, subprocess, sys
+import pytest
+
+import kernels
+
+
+@pytest.mark.parametrize("backend", kernels.BACKENDS)
+def test_check(backend):
+    kernels.use(backend)
+    try:
+        # the loop kernels run as plain Python without Numba: keep n small
+        worst= kernels.check(2000 if kernels.numba is not None else 300)
+    finally:
+        kernels.use()
+    assert max(worst.values())<= kernels.CHECK_TOL
+
+
+@pytest.mark.skipif(kernels.numba is not None, reason="Numba is installed")
+def test_numba_env_without_numba():
+    env= dict(os.environ, SPACE_KERNELS="numba")
+    root= os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out= subprocess.run([sys.executable, "-c", "import main, kernels; print(kernels.BACKEND)"],
+                        cwd=root, env=env, capture_output=True, text=True)
+    assert out.returncode== 0, out.stderr
+    assert out.stdout.split()[-1]== "numpy"
+    assert "Numba is not installed" in out.stderr
@@ -0,0 +1,129 @@
+"""
+Fading motion trails for the wrap-around world.
+
+Each trailed body keeps its last `length` positions in a ring buffer: two
+(length, n) arrays allocated once, with one shared head row, so a push is a
+copy into that row and nothing else. A sample is taken every `every` ticks.
+
+Drawing is one batched pass over every visible trail. Bodies whose newest
+point is further off screen than the longest trail reaches are culled.
+The rest are rebuilt back from their newest point by summing minimum-image
+steps, so a trail that crossed the world edge stays one line behind its
+body instead of streaking across the view. Segments are sampled about a pixel apart and written into the
+pixel array, oldest first, dimmer with age. Zoomed out below LOD_SCALE
+only every 2nd, 4th, ... sample is drawn.
+
+TRAIL_POINTS caps the points over all bodies: a big field gets shorter
+trails, and past MIN_LENGTH only its first bodies are trailed.
+"""
+import math
+import numpy as np
+import pygame
+
+TRAIL_LENGTH = 32          # samples per body
+TRAIL_EVERY  = 3           # ticks between samples
+TRAIL_POINTS = 64000       # points over all bodies of one Trails
+MIN_LENGTH   = 8
+MAX_STEPS    = 16          # samples along one segment when drawing
+LOD_SCALE    = 0.5         # below this draw scale, trails skip samples
+
+
+class Trails:
+    def __init__(self, n, length=TRAIL_LENGTH, every=TRAIL_EVERY, cap=TRAIL_POINTS, color=(90,110,150)):
+        length= max(MIN_LENGTH, min(length, cap// max(1, n)))
+        self.n= min(n, cap// length)
+        self.length= length
+        self.every= every
+        self.color= np.array(color, np.float32)
+        self.x= np.zeros((length, self.n), np.float32)
+        self.y= np.zeros((length, self.n), np.float32)
+        self.head= 0
+        self.reach= 0.0           # world units the longest trail spans, for culling
+        self._ticks= 0
+        self._empty= True
+        # brightness per segment, oldest first
+        self._fade= np.linspace(0.15, 1.0, length- 1, dtype=np.float32)
+        self._mapped= None
+
+    def __len__(self):
+        return self.n
+
+    def clear(self):
+        self._empty= True
+
+    def push(self, x, y, w, h):
+        """x, y: positions of at least n bodies (arrays or scalars for n == 1)."""
+        self._ticks+= 1
+        if self._empty:
+            # a fresh trail starts collapsed on the bodies
+            self.x[:]= x if np.ndim(x)== 0 else x[:self.n]
+            self.y[:]= y if np.ndim(y)== 0 else y[:self.n]
+            self._empty= False
+            self.reach= 0.0
+            return
+        if self._ticks% self.every:
+            return
+        self.head= (self.head+ 1)% self.length
+        self.x[self.head]= x if np.ndim(x)== 0 else x[:self.n]
+        self.y[self.head]= y if np.ndim(y)== 0 else y[:self.n]
+        if self.head== 0:
+            # once per lap: how far the oldest point can be from the newest
+            tail= (self.head+ 1)% self.length
+            dx= np.abs(self.x[self.head]- self.x[tail])
+            dy= np.abs(self.y[self.head]- self.y[tail])
+            np.minimum(dx, w- dx, out=dx)
+            np.minimum(dy, h- dy, out=dy)
+            self.reach= 2.0* float(max(dx.max(initial=0.0), dy.max(initial=0.0)))
+
+    def draw(self, screen, cam_x, cam_y, w, h, scale=1.0):
+        if self._empty or not self.n:
+            return
+        sw, sh= screen.get_size()
+        m= self.reach+ 1.0
+        # cull on the newest point, measured from `m` before the view corner
+        hx= ((self.x[self.head]- (cam_x- m))% w- m)* scale
+        hy= ((self.y[self.head]- (cam_y- m))% h- m)* scale
+        mp= m* scale
+        sel= np.flatnonzero((hx> -mp) & (hx< sw+ mp) & (hy> -mp) & (hy< sh+ mp))
+        if not len(sel):
+            return
+        # zoomed out, every r-th sample is plenty (the newest always kept)
+        r= 1 if scale>= LOD_SCALE else 1 << int(math.ceil(math.log2(LOD_SCALE/ scale)))
+        pick= np.arange(self.length- 1, -1, -r)[::-1]
+        order= (pick+ self.head+ 1)% self.length
+        X= self.x[order[:,None], sel]
+        Y= self.y[order[:,None], sel]
+        # minimum-image steps, summed back from the newest point: a trail is
+        # one unbroken line behind its body even where it crossed the seam
+        dx= np.diff(X, axis=0)
+        dy= np.diff(Y, axis=0)
+        dx+= w/2; dx%= w; dx-= w/2
+        dy+= h/2; dy%= h; dy-= h/2
+        dx*= scale; dy*= scale
+        x0= hx[sel]- np.cumsum(dx[::-1], axis=0)[::-1]
+        y0= hy[sel]- np.cumsum(dy[::-1], axis=0)[::-1]
+        # about one sample per pixel of each segment, oldest segments first
+        dx= dx.ravel(); dy= dy.ravel()
+        k= np.maximum(np.abs(dx), np.abs(dy))
+        np.ceil(k, out=k)
+        k= np.clip(k, 1, MAX_STEPS).astype(np.intp)
+        seg= np.repeat(np.arange(len(k)), k)
+        t= np.arange(len(seg), dtype=np.float32)
+        t-= np.repeat(np.cumsum(k)- k, k)
+        t/= k[seg]
+        px= (x0.ravel()[seg]+ t* dx[seg]).astype(np.intp)
+        py= (y0.ravel()[seg]+ t* dy[seg]).astype(np.intp)
+        ok= (px>= 0) & (px< sw) & (py>= 0) & (py< sh)
+        c= np.repeat(self._colors(screen)[pick[1:]- 1], len(sel))[seg[ok]]
+        pix= pygame.surfarray.pixels2d(screen)
+        # newest last, so it wins where trails overlap
+        pix[px[ok], py[ok]]= c
+        del pix
+
+    def _colors(self, screen):
+        # mapped pixel value per segment age, for the screen's format
+        key= (screen.get_bitsize(), screen.get_shifts())
+        if self._mapped is None or self._mapped[0]!= key:
+            rgb= (self._fade[:,None]* self.color).astype(np.uint8)
+            self._mapped= (key, np.array([screen.map_rgb(tuple(c)) for c in rgb.tolist()], np.uint32))
+        return self._mapped[1]